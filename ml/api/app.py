@@ -1,33 +1,179 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
-from datetime import datetime
-import joblib
 import os
+import sys
 import logging
-import traceback
+import threading
+import time
+
+# The feature spec is shared with the training pipeline in the parent directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from logging_config import configure_logging, debug_enabled, start_request_sampling
+from metrics import registry as metrics_registry, StageTimer, STAGE_LATENCY, REQUEST_LATENCY, REQUESTS, ERRORS
+from prediction_cache import PredictionCache
+from serving_model import load_serving_model
+from model_registry import manifest_version, read_manifest
+from route_rules import load_route_rules
+from request_schema import decode_ride
+from json_provider import FastJSONProvider
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson when installed
 CORS(app)  # Enable CORS for all routes
 
-# Load the trained model
-try:
-    model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'ride_time_estimator.joblib')
-    logger.info(f"Loading model from: {model_path}")
-    model = joblib.load(model_path)
-    logger.info("Model loaded successfully")
-    
-    # Log expected feature count
-    if hasattr(model, 'n_features_in_'):
-        logger.info(f"Model expects {model.n_features_in_} features")
-except Exception as e:
-    logger.error(f"Error loading model: {str(e)}")
-    model = None
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(os.path.dirname(__file__), '..', 'models'))
+
+# Maximum number of rides accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+
+# Maximum number of origin-destination pairs (N x M) accepted by /predict/matrix
+MAX_MATRIX_SIZE = int(os.environ.get('MAX_MATRIX_SIZE', 40000))
+
+# Corridor-specific ETA clamps and routeInfo messages
+ROUTE_RULES_PATH = os.environ.get('ROUTE_RULES_PATH', os.path.join(os.path.dirname(__file__), 'route_rules.json'))
+route_rules = load_route_rules(ROUTE_RULES_PATH)
+
+# Prediction cache settings; a size of 0 disables the cache
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 300))
+PREDICTION_CACHE_PRECISION = int(os.environ.get('PREDICTION_CACHE_PRECISION', 7))
+
+prediction_cache = PredictionCache(
+    max_size=PREDICTION_CACHE_SIZE,
+    ttl_seconds=PREDICTION_CACHE_TTL,
+    precision=PREDICTION_CACHE_PRECISION
+) if PREDICTION_CACHE_SIZE > 0 else None
+
+# Use the exported tree ensemble instead of model.predict when one is available
+USE_NATIVE_TREES = os.environ.get('USE_NATIVE_TREES', '1') == '1'
+
+# Memory-map large model arrays so forked workers share the same pages
+MODEL_MMAP_MODE = 'r' if os.environ.get('MODEL_MMAP', '1') == '1' else None
+
+# Seconds between checks of MODEL_DIR for a newly published model version; 0 disables hot reload
+MODEL_POLL_SECONDS = float(os.environ.get('MODEL_POLL_SECONDS', 10))
+
+# The model is loaded on first use (or by warmup()) rather than at import
+_serving_model = None
+_serving_model_lock = threading.Lock()
+
+def get_serving_model():
+    """Return the loaded model and artifacts, loading them on first use."""
+    global _serving_model
+    if _serving_model is None:
+        with _serving_model_lock:
+            if _serving_model is None:
+                _serving_model = load_serving_model(MODEL_DIR, USE_NATIVE_TREES, MODEL_MMAP_MODE)
+    return _serving_model
+
+# Versions that failed to load, so they are not retried on every poll
+_failed_versions = set()
+
+def reload_model_if_changed():
+    """
+    Load, warm up and activate a newly published model version
+    Returns:
+        True if the serving model was replaced
+    """
+    global _serving_model
+    current = get_serving_model()
+    version = manifest_version(read_manifest(MODEL_DIR))
+    if version is None or version == current.version or version in _failed_versions:
+        return False
+
+    logger.info("Loading model version %s", version)
+    candidate = load_serving_model(MODEL_DIR, USE_NATIVE_TREES, MODEL_MMAP_MODE)
+    if not candidate.loaded:
+        logger.error("Model version %s failed to load, keeping version %s", version, current.version)
+        _failed_versions.add(version)
+        return False
+
+    # Run the new model once before it takes traffic so its first real
+    # requests don't pay for lazy initialization
+    predict_batch(WARMUP_RIDES, candidate)
+    candidate.predict(process_input_data(WARMUP_RIDES[0], candidate.feature_spec))
+
+    # A single reference assignment: requests already running finish with the
+    # model they started with, new requests get the new one
+    _serving_model = candidate
+    if prediction_cache is not None:
+        prediction_cache.clear()
+    logger.info("Now serving model version %s (loaded in %.3fs)", candidate.version, candidate.load_seconds)
+    return True
+
+def _watch_model_registry():
+    while True:
+        time.sleep(MODEL_POLL_SECONDS)
+        try:
+            reload_model_if_changed()
+        except Exception as e:
+            logger.exception("Error reloading model: %s", e)
+
+# Process the reloader thread was started in; threads don't survive a fork,
+# so each gunicorn worker starts its own
+_reloader_pid = None
+_reloader_lock = threading.Lock()
+
+def start_model_reloader():
+    """Start the background thread that hot-reloads new model versions, once per process."""
+    global _reloader_pid
+    if MODEL_POLL_SECONDS <= 0 or _reloader_pid == os.getpid():
+        return
+    with _reloader_lock:
+        if _reloader_pid != os.getpid():
+            _reloader_pid = os.getpid()
+            threading.Thread(target=_watch_model_registry, name='model-reloader', daemon=True).start()
+
+# WSGI environ key marking warmup()'s synthetic requests
+WARMUP_ENVIRON_KEY = 'ride_time.warmup'
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter_ns()
+    start_request_sampling()
+    # Warmup may run in the gunicorn master before workers fork; a reloader
+    # thread there would be forked mid-flight and reload models nobody serves
+    if not request.environ.get(WARMUP_ENVIRON_KEY):
+        start_model_reloader()
+
+@app.after_request
+def record_request_metrics(response):
+    started = getattr(g, 'request_started', None)
+    endpoint = request.endpoint or 'unknown'
+    if started is not None:
+        REQUEST_LATENCY.observe((time.perf_counter_ns() - started) / 1e9, endpoint)
+    status = str(response.status_code)
+    REQUESTS.inc(endpoint, status)
+    if response.status_code >= 400:
+        ERRORS.inc(endpoint, status)
+    return response
+
+# Per-thread feature buffer reused by single-ride predictions
+_feature_buffers = threading.local()
+
+def get_feature_buffer(feature_spec):
+    """Return this thread's preallocated single-row feature buffer."""
+    buffer = getattr(_feature_buffers, 'buffer', None)
+    if buffer is None or buffer.shape[1] != feature_spec.n_features:
+        buffer = _feature_buffers.buffer = feature_spec.empty(1)
+    return buffer
+
+def get_memory_usage():
+    """Return this process's resident and shared memory in megabytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            _, resident, shared = (int(value) for value in f.read().split()[:3])
+        page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        return {'rss_mb': resident * page_mb, 'shared_mb': shared * page_mb}
+    except (OSError, ValueError):
+        # Not on Linux: fall back to the peak RSS reported by getrusage
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return {'rss_mb': max_rss / scale, 'shared_mb': None}
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """Calculate the Haversine distance between two points."""
@@ -39,94 +185,17 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     c = 2 * np.arcsin(np.sqrt(a))
     return R * c
 
-def process_input_data(data):
-    """Process input data for prediction."""
-    try:
-        logger.debug(f"Processing input data: {data}")
-        
-        # Calculate distance
-        distance = haversine_distance(
-            data['source']['latitude'],
-            data['source']['longitude'],
-            data['destination']['latitude'],
-            data['destination']['longitude']
-        )
-        logger.debug(f"Calculated distance: {distance} km")
-        
-        # Extract time features
-        pickup_time = datetime.fromisoformat(data['pickupTime'].replace('Z', '+00:00'))
-        hour = pickup_time.hour
-        day_of_week = pickup_time.weekday()
-        month = pickup_time.month
-        logger.debug(f"Extracted time features - hour: {hour}, day_of_week: {day_of_week}, month: {month}")
-        
-        # Create feature array with exactly 44 features as expected by the model
-        features = np.zeros(44)  # Initialize array with zeros
-        
-        # Basic features
-        features[0] = distance  # distance_km
-        features[1] = hour  # hour
-        features[2] = day_of_week  # day_of_week
-        features[3] = month  # month
-        
-        # One-hot encode day of week (features 4-10)
-        if 0 <= day_of_week < 7:
-            features[4 + day_of_week] = 1
-        
-        # One-hot encode hour (features 11-34)
-        if 0 <= hour < 24:
-            features[11 + hour] = 1
-        
-        # One-hot encode month (features 35-46)
-        if 1 <= month <= 12:
-            features[35 + (month - 1)] = 1
-        
-        logger.debug(f"Created features array with shape: {features.shape}")
-        return features.reshape(1, -1)  # Reshape to 2D array for prediction
-        
-    except Exception as e:
-        logger.error(f"Error in process_input_data: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise
-
-def validate_input(data):
-    """Validate input data."""
-    try:
-        logger.debug(f"Validating input data: {data}")
-        required_fields = ['source', 'destination', 'pickupTime', 'rideType', 'numberOfRiders']
-        for field in required_fields:
-            if field not in data:
-                return False, f"Missing required field: {field}"
-        
-        # Validate coordinates
-        for point in ['source', 'destination']:
-            if not isinstance(data[point], dict):
-                return False, f"Invalid {point} format"
-            if 'latitude' not in data[point] or 'longitude' not in data[point]:
-                return False, f"Missing coordinates in {point}"
-            if not (-90 <= data[point]['latitude'] <= 90):
-                return False, f"Invalid {point} latitude"
-            if not (-180 <= data[point]['longitude'] <= 180):
-                return False, f"Invalid {point} longitude"
-        
-        # Validate pickup time format
-        try:
-            datetime.fromisoformat(data['pickupTime'].replace('Z', '+00:00'))
-        except ValueError:
-            return False, "Invalid pickup time format"
-        
-        # Validate ride type
-        if data['rideType'] not in ['private', 'shared']:
-            return False, "Invalid ride type"
-        
-        # Validate number of riders
-        if not isinstance(data['numberOfRiders'], int) or data['numberOfRiders'] < 1:
-            return False, "Invalid number of riders"
-        
-        return True, ""
-    except Exception as e:
-        logger.error(f"Error in validate_input: {str(e)}")
-        return False, f"Validation error: {str(e)}"
+def process_input_data(ride, feature_spec):
+    """Build the model features of a decoded RideRequest in this thread's feature buffer."""
+    features = feature_spec.transform(
+        ride.source_lat, ride.source_lng, ride.dest_lat, ride.dest_lng,
+        ride.distance, ride.hour, ride.day_of_week, ride.month,
+        ride.is_shared, ride.num_riders,
+        out=get_feature_buffer(feature_spec)
+    )
+    if debug_enabled(logger):
+        logger.debug("Created features for %s with shape: %s", ride, features.shape)
+    return features
 
 def calculate_realistic_time_estimate(distance_km, hour, day_of_week, ride_type):
     """
@@ -185,110 +254,435 @@ def calculate_realistic_time_estimate(distance_km, hour, day_of_week, ride_type)
     # Ensure minimum time
     return max(time_minutes, 7)  # At least 7 minutes for any ride
 
+def calculate_realistic_time_estimates(distance_km, hour, day_of_week, is_shared):
+    """
+    Vectorized version of calculate_realistic_time_estimate
+    Args:
+        distance_km: Array of distances in kilometers
+        hour: Array of hours of the day (0-23)
+        day_of_week: Array of days of the week (0=Monday, 6=Sunday)
+        is_shared: Boolean array, True for shared rides
+    Returns:
+        Array of estimated times in minutes
+    """
+    distance_km = np.asarray(distance_km, dtype=float)
+    hour = np.asarray(hour)
+    day_of_week = np.asarray(day_of_week)
+    
+    # Base speed in km/h depending on distance
+    base_speed = np.select([distance_km < 5, distance_km < 10], [18.0, 22.0], 28.0)
+    
+    # Time of day adjustments, using the same bands as the scalar version
+    late_night = (hour >= 22) | (hour < 6)
+    weekend_factor = np.select(
+        [((hour >= 10) & (hour < 13)) | ((hour >= 16) & (hour < 20)),
+         (hour >= 13) & (hour < 16),
+         late_night],
+        [0.75, 0.85, 1.2], 1.0
+    )
+    weekday_factor = np.select(
+        [(hour >= 8) & (hour < 10),
+         (hour >= 17) & (hour < 20),
+         (hour >= 10) & (hour < 17),
+         (hour >= 20) & (hour < 22),
+         late_night],
+        [0.6, 0.55, 0.8, 0.9, 1.2], 1.0
+    )
+    base_speed = base_speed * np.where(day_of_week >= 5, weekend_factor, weekday_factor)
+    
+    # Adjust for ride type
+    base_speed = np.where(is_shared, base_speed * 0.85, base_speed)
+    
+    # Travel time plus pickup buffer, with a 7 minute minimum
+    time_minutes = (distance_km / base_speed) * 60
+    time_minutes = time_minutes + np.minimum(5, 2 + distance_km * 0.2)
+    return np.maximum(time_minutes, 7)
+
+def blend_predictions(ml_prediction, realistic_prediction):
+    """Blend ML predictions with realistic estimates using the /predict rules."""
+    ml_prediction = np.asarray(ml_prediction, dtype=float)
+    realistic_prediction = np.asarray(realistic_prediction, dtype=float)
+    
+    significantly_off = ((ml_prediction < realistic_prediction * 0.6) |
+                         (ml_prediction > realistic_prediction * 1.8))
+    moderately_off = ((ml_prediction < realistic_prediction * 0.75) |
+                      (ml_prediction > realistic_prediction * 1.5))
+    return np.select(
+        [significantly_off, moderately_off],
+        [(realistic_prediction * 0.8) + (ml_prediction * 0.2),
+         (realistic_prediction * 0.6) + (ml_prediction * 0.4)],
+        (ml_prediction * 0.85) + (realistic_prediction * 0.15)
+    )
+
+def score_arrays(source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week, month,
+                 is_shared, num_riders, serving_model):
+    """
+    Score rides given as arrays with one feature matrix build and a single model call
+    Args:
+        source_lat, source_lng, dest_lat, dest_lng: Coordinate arrays in degrees
+        hour, day_of_week: Arrays with one entry per ride
+        month, is_shared, num_riders: Arrays, or scalars shared by all rides
+        serving_model: ServingModel to use
+    Returns:
+        Dict of arrays: predictedTime, distance, mlPrediction, realisticEstimate,
+        and routeRule, the ID of the route rule applied to each ride (-1 for none)
+    """
+    distance = haversine_distance(source_lat, source_lng, dest_lat, dest_lng)
+    features = serving_model.feature_spec.transform(
+        source_lat, source_lng, dest_lat, dest_lng, distance,
+        hour, day_of_week, month, is_shared, num_riders
+    )
+    
+    ml_prediction = serving_model.predict(features)
+    realistic_prediction = calculate_realistic_time_estimates(distance, hour, day_of_week, is_shared)
+    final_prediction = blend_predictions(ml_prediction, realistic_prediction)
+    
+    # Corridor-specific clamps from the route rule table
+    route_rule = route_rules.match_arrays(source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week)
+    final_prediction = route_rules.clamp_arrays(final_prediction, route_rule)
+    return {
+        'predictedTime': final_prediction,
+        'distance': distance,
+        'mlPrediction': ml_prediction,
+        'realisticEstimate': realistic_prediction,
+        'routeRule': route_rule
+    }
+
+def predict_batch(rides, serving_model=None):
+    """
+    Predict ride times for a list of decoded ride requests in one vectorized pass
+    Args:
+        rides: List of RideRequest objects from decode_ride
+        serving_model: ServingModel to use; defaults to the loaded model
+    Returns:
+        List of prediction dicts in the /predict response format
+    """
+    serving_model = serving_model or get_serving_model()
+    scores = score_arrays(
+        np.array([ride.source_lat for ride in rides], dtype=float),
+        np.array([ride.source_lng for ride in rides], dtype=float),
+        np.array([ride.dest_lat for ride in rides], dtype=float),
+        np.array([ride.dest_lng for ride in rides], dtype=float),
+        np.array([ride.hour for ride in rides]),
+        np.array([ride.day_of_week for ride in rides]),
+        np.array([ride.month for ride in rides]),
+        np.array([ride.is_shared for ride in rides]),
+        np.array([ride.num_riders for ride in rides]),
+        serving_model
+    )
+    
+    predictions = []
+    for i in range(len(rides)):
+        predictions.append({
+            'predictedTime': float(scores['predictedTime'][i]),
+            'distance': float(scores['distance'][i]),
+            'mlPrediction': float(scores['mlPrediction'][i]),
+            'realisticEstimate': float(scores['realisticEstimate'][i]),
+            'routeInfo': route_rules.message(scores['routeRule'][i])
+        })
+    return predictions
+
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        if model is None:
+        serving_model = get_serving_model()
+        if not serving_model.loaded:
             return jsonify({'error': 'Model not loaded'}), 500
-            
+        
+        stage_timer = StageTimer(STAGE_LATENCY)
         data = request.get_json()
-        logger.debug(f"Received prediction request: {data}")
+        stage_timer.lap('parse')
+        debug = debug_enabled(logger)
+        if debug:
+            logger.debug("Received prediction request: %s", data)
         
-        # Validate input
-        is_valid, error_message = validate_input(data)
-        if not is_valid:
-            logger.warning(f"Invalid input: {error_message}")
+        # Validate and decode the request once; later stages read the
+        # decoded pickup time fields and distance from the RideRequest
+        ride, error_message = decode_ride(data)
+        stage_timer.lap('validate')
+        if ride is None:
+            logger.warning("Invalid input: %s", error_message)
             return jsonify({'error': error_message}), 400
         
-        # Calculate distance for both prediction methods
-        distance = haversine_distance(
-            data['source']['latitude'],
-            data['source']['longitude'],
-            data['destination']['latitude'],
-            data['destination']['longitude']
-        )
-        
-        # Extract time features for realistic estimate
-        pickup_time = datetime.fromisoformat(data['pickupTime'].replace('Z', '+00:00'))
-        hour = pickup_time.hour
-        day_of_week = pickup_time.weekday()
+        # Known location pairs are answered from the precomputed OD table
+        ml_prediction = None
+        if serving_model.od_table is not None:
+            ml_prediction = serving_model.od_table.lookup(
+                ride.source_lat, ride.source_lng, ride.dest_lat, ride.dest_lng,
+                ride.hour, ride.day_of_week, ride.month, ride.ride_type, ride.num_riders
+            )
         
-        # Process input data for ML prediction
-        features = process_input_data(data)
+        # Reuse a cached ML prediction for the same quantized route and time slot
+        cache_key = None
+        if ml_prediction is None and prediction_cache is not None:
+            # The model version is part of the key so a request that started
+            # before a model swap can't cache an old prediction for the new model
+            cache_key = (serving_model.version, *prediction_cache.make_key(
+                ride.source_lat, ride.source_lng, ride.dest_lat, ride.dest_lng,
+                ride.hour, ride.day_of_week, ride.month, ride.ride_type, ride.num_riders
+            ))
+            ml_prediction = prediction_cache.get(cache_key)
+        stage_timer.lap('lookup')
         
-        # Check if number of features matches what model expects
-        expected_feature_count = model.n_features_in_ if hasattr(model, 'n_features_in_') else None
-        if expected_feature_count and features.shape[1] != expected_feature_count:
-            error_msg = f"Feature count mismatch: expected {expected_feature_count}, got {features.shape[1]}"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg}), 500
-        
-        # Make ML prediction
-        ml_prediction = model.predict(features)[0]
-        logger.debug(f"ML prediction: {ml_prediction} minutes")
+        if ml_prediction is None:
+            # Process input data for ML prediction
+            features = process_input_data(ride, serving_model.feature_spec)
+            stage_timer.lap('features')
+            
+            # Check if number of features matches what model expects
+            model = serving_model.model
+            expected_feature_count = model.n_features_in_ if hasattr(model, 'n_features_in_') else None
+            if expected_feature_count and features.shape[1] != expected_feature_count:
+                error_msg = f"Feature count mismatch: expected {expected_feature_count}, got {features.shape[1]}"
+                logger.error(error_msg)
+                return jsonify({'error': error_msg}), 500
+            
+            # Make ML prediction
+            ml_prediction = serving_model.predict(features)[0]
+            stage_timer.lap('model')
+            if cache_key is not None:
+                prediction_cache.put(cache_key, ml_prediction)
+        if debug:
+            logger.debug("ML prediction: %s minutes", ml_prediction)
         
         # Calculate realistic estimate based on distance and conditions
         realistic_prediction = calculate_realistic_time_estimate(
-            distance, hour, day_of_week, data['rideType']
+            ride.distance, ride.hour, ride.day_of_week, ride.ride_type
         )
-        logger.debug(f"Realistic prediction: {realistic_prediction} minutes")
+        if debug:
+            logger.debug("Realistic prediction: %s minutes", realistic_prediction)
         
         # Adjust ML prediction based on realistic estimate
         # If ML prediction is way off, use a weighted average that favors the realistic estimate
         if ml_prediction < realistic_prediction * 0.6 or ml_prediction > realistic_prediction * 1.8:
             # ML prediction is too far off, use mostly the realistic prediction
             final_prediction = (realistic_prediction * 0.8) + (ml_prediction * 0.2)
-            logger.warning(f"ML prediction significantly off ({ml_prediction} min), using weighted estimate")
+            logger.warning("ML prediction significantly off (%s min), using weighted estimate", ml_prediction)
         elif ml_prediction < realistic_prediction * 0.75 or ml_prediction > realistic_prediction * 1.5:
             # ML prediction is somewhat off, blend with realistic prediction
             final_prediction = (realistic_prediction * 0.6) + (ml_prediction * 0.4)
-            logger.warning(f"ML prediction moderately off ({ml_prediction} min), blending with realistic estimate")
+            logger.warning("ML prediction moderately off (%s min), blending with realistic estimate", ml_prediction)
         else:
             # ML prediction seems reasonable, use it with a small influence from the realistic prediction
             final_prediction = (ml_prediction * 0.85) + (realistic_prediction * 0.15)
-            logger.debug(f"ML prediction reasonable, using with minor adjustment")
+            if debug:
+                logger.debug("ML prediction reasonable, using with minor adjustment")
         
-        logger.debug(f"Final prediction: {final_prediction} minutes")
+        if debug:
+            logger.debug("Final prediction: %s minutes", final_prediction)
+        stage_timer.lap('blend')
         
-        # Include route-specific information based on common landmarks
+        # Corridor-specific clamps and guidance from the route rule table
         route_info = None
+        route_rule = route_rules.match(
+            ride.source_lat, ride.source_lng, ride.dest_lat, ride.dest_lng, ride.hour, ride.day_of_week
+        )
+        if route_rule is not None:
+            route_info = route_rule['message']
+            final_prediction = route_rules.clamp(final_prediction, route_rule)
+        stage_timer.lap('route')
         
-        # Check for known routes and provide more specific guidance
-        source_lat = data['source']['latitude']
-        source_lng = data['source']['longitude']
-        dest_lat = data['destination']['latitude']
-        dest_lng = data['destination']['longitude']
-        
-        # Jaypee Institute to IIT Delhi special case
-        if (28.52 < source_lat < 28.53 and 77.36 < source_lng < 77.37 and
-            28.54 < dest_lat < 28.55 and 77.19 < dest_lng < 77.20):
-            hour = pickup_time.hour
-            if 8 <= hour < 10 or 17 <= hour < 20:
-                route_info = "This route often experiences heavy traffic during rush hour. Consider adding extra buffer time."
-                final_prediction = max(final_prediction, 35)  # Minimum 35 minutes during rush hours
-            else:
-                route_info = "Traffic on this route is usually moderate outside rush hours."
-                final_prediction = max(final_prediction, 26)  # Minimum 26 minutes during normal hours
-        
-        return jsonify({
+        response = jsonify({
             'predictedTime': float(final_prediction),
-            'distance': float(distance),
+            'distance': ride.distance,
             'mlPrediction': float(ml_prediction),
             'realisticEstimate': float(realistic_prediction),
             'routeInfo': route_info
         })
+        stage_timer.lap('response')
+        return response
+        
+    except Exception as e:
+        logger.exception("Error in predict endpoint: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch_endpoint():
+    try:
+        serving_model = get_serving_model()
+        if not serving_model.loaded:
+            return jsonify({'error': 'Model not loaded'}), 500
+        
+        data = request.get_json()
+        rides = data.get('rides') if isinstance(data, dict) else None
+        if not isinstance(rides, list) or not rides:
+            return jsonify({'error': 'Missing required field: rides'}), 400
+        if len(rides) > MAX_BATCH_SIZE:
+            return jsonify({'error': f"Batch too large: at most {MAX_BATCH_SIZE} rides allowed"}), 400
+        if debug_enabled(logger):
+            logger.debug("Received batch prediction request with %s rides", len(rides))
+        
+        # Validate every ride up front so the batch is scored in a single pass
+        errors = []
+        decoded = []
+        for index, ride in enumerate(rides):
+            ride, error_message = decode_ride(ride) if isinstance(ride, dict) else (None, "Invalid ride format")
+            if ride is None:
+                errors.append({'index': index, 'error': error_message})
+            decoded.append(ride)
+        if errors:
+            logger.warning("Invalid rides in batch: %s", errors)
+            return jsonify({'error': 'Invalid rides in batch', 'errors': errors}), 400
+        
+        return jsonify({'predictions': predict_batch(decoded, serving_model)})
         
     except Exception as e:
-        logger.error(f"Error in predict endpoint: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Error in predict batch endpoint: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def validate_points(points, name):
+    """Validate a non-empty list of {latitude, longitude} points; returns (is_valid, error_message)."""
+    if not isinstance(points, list) or not points:
+        return False, f"Missing required field: {name}"
+    for index, point in enumerate(points):
+        if not isinstance(point, dict) or 'latitude' not in point or 'longitude' not in point:
+            return False, f"Missing coordinates in {name}[{index}]"
+        latitude, longitude = point['latitude'], point['longitude']
+        if not isinstance(latitude, (int, float)) or not (-90 <= latitude <= 90):
+            return False, f"Invalid {name}[{index}] latitude"
+        if not isinstance(longitude, (int, float)) or not (-180 <= longitude <= 180):
+            return False, f"Invalid {name}[{index}] longitude"
+    return True, ""
+
+def predict_matrix(origins, destinations, pickup_time, ride_type, num_riders, serving_model=None):
+    """
+    Predict ride times from every origin to every destination
+    Args:
+        origins, destinations: Lists of validated {latitude, longitude} points
+        pickup_time: Pickup datetime shared by all pairs
+        ride_type: 'private' or 'shared'
+        num_riders: Number of riders
+        serving_model: ServingModel to use; defaults to the loaded model
+    Returns:
+        Dict of N x M nested lists: predictedTimes and distances
+    """
+    serving_model = serving_model or get_serving_model()
+    n, m = len(origins), len(destinations)
+    
+    # Broadcast origins down the rows and destinations across the columns,
+    # then flatten so the whole matrix is scored as one batch
+    source_lat = np.array([point['latitude'] for point in origins], dtype=float)
+    source_lng = np.array([point['longitude'] for point in origins], dtype=float)
+    dest_lat = np.array([point['latitude'] for point in destinations], dtype=float)
+    dest_lng = np.array([point['longitude'] for point in destinations], dtype=float)
+    scores = score_arrays(
+        np.repeat(source_lat, m), np.repeat(source_lng, m), np.tile(dest_lat, n), np.tile(dest_lng, n),
+        np.full(n * m, pickup_time.hour), np.full(n * m, pickup_time.weekday()), pickup_time.month,
+        ride_type == 'shared', num_riders, serving_model
+    )
+    return {
+        'predictedTimes': scores['predictedTime'].reshape(n, m).tolist(),
+        'distances': scores['distance'].reshape(n, m).tolist()
+    }
+
+@app.route('/predict/matrix', methods=['POST'])
+def predict_matrix_endpoint():
+    try:
+        serving_model = get_serving_model()
+        if not serving_model.loaded:
+            return jsonify({'error': 'Model not loaded'}), 500
+        
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid request format'}), 400
+        for name in ['origins', 'destinations']:
+            is_valid, error_message = validate_points(data.get(name), name)
+            if not is_valid:
+                return jsonify({'error': error_message}), 400
+        origins, destinations = data['origins'], data['destinations']
+        if len(origins) * len(destinations) > MAX_MATRIX_SIZE:
+            return jsonify({'error': f"Matrix too large: at most {MAX_MATRIX_SIZE} origin-destination pairs allowed"}), 400
+        
+        # The shared fields are decoded like a /predict request
+        template = {'source': origins[0], 'destination': destinations[0], 'numberOfRiders': 1}
+        template.update({field: data[field] for field in ['pickupTime', 'rideType', 'numberOfRiders'] if field in data})
+        ride, error_message = decode_ride(template)
+        if ride is None:
+            return jsonify({'error': error_message}), 400
+        if debug_enabled(logger):
+            logger.debug("Received matrix prediction request: %s x %s", len(origins), len(destinations))
+        
+        return jsonify(predict_matrix(origins, destinations, ride.pickup_time, ride.ride_type,
+                                      ride.num_riders, serving_model))
+        
+    except Exception as e:
+        logger.exception("Error in predict matrix endpoint: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    serving_model = get_serving_model()
     return jsonify({
         'status': 'ok',
-        'model_loaded': model is not None
+        'model_loaded': serving_model.loaded,
+        'model_version': serving_model.version,
+        'od_table_loaded': serving_model.od_table is not None,
+        'native_trees': serving_model.tree_ensemble is not None,
+        'model_load_seconds': serving_model.load_seconds,
+        'worker': {'pid': os.getpid(), **get_memory_usage()},
+        'cache': prediction_cache.stats() if prediction_cache is not None else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+# Synthetic requests used to warm up the prediction path
+WARMUP_REQUESTS = [
+    {
+        'source': {'latitude': 28.5244, 'longitude': 77.3656},
+        'destination': {'latitude': 28.5456, 'longitude': 77.1924},
+        'pickupTime': '2023-03-15T09:00:00Z',
+        'rideType': 'private',
+        'numberOfRiders': 1
+    },
+    {
+        'source': {'latitude': 28.6315, 'longitude': 77.2167},
+        'destination': {'latitude': 28.6891, 'longitude': 77.2087},
+        'pickupTime': '2023-07-08T18:30:00Z',
+        'rideType': 'shared',
+        'numberOfRiders': 3
+    },
+    {
+        'source': {'latitude': 28.6001, 'longitude': 77.3002},
+        'destination': {'latitude': 28.4702, 'longitude': 77.5103},
+        'pickupTime': '2023-11-21T23:15:00Z',
+        'rideType': 'private',
+        'numberOfRiders': 1
+    }
+]
+
+WARMUP_RIDES = [decode_ride(payload)[0] for payload in WARMUP_REQUESTS]
+
+def warmup():
+    """Load the model and run synthetic predictions so the first real request is warm."""
+    serving_model = get_serving_model()
+    if not serving_model.loaded:
+        logger.error("Warmup skipped: model not loaded")
+        return False
+    
+    # Go through the full request path so Flask, validation, feature building
+    # and the model (and native tree evaluator) are all exercised
+    with app.test_client() as client:
+        client.environ_base[WARMUP_ENVIRON_KEY] = True
+        for payload in WARMUP_REQUESTS:
+            client.post('/predict', json=payload)
+        client.post('/predict/batch', json={'rides': WARMUP_REQUESTS})
+    
+    # Don't let synthetic requests count towards cache statistics
+    if prediction_cache is not None:
+        prediction_cache.clear()
+    logger.info("Warmup complete")
+    return True
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Run the ride time prediction API')
+    parser.add_argument('--warmup', action='store_true',
+                        help='Load the model and run synthetic predictions before serving')
+    args = parser.parse_args()
+    
+    configure_logging(os.environ.get('LOG_LEVEL', 'DEBUG'))
+    if args.warmup:
+        warmup()
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,188 @@
+"""
+ASGI serving mode with request micro-batching.
+
+Concurrent /predict calls are queued and scored together: the batcher waits
+for up to MICROBATCH_MAX_WAIT_MS after the first queued request (or until
+MICROBATCH_MAX_SIZE requests are waiting) and runs one vectorized
+predict_batch call for the whole group.
+
+Run with:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import traceback
+
+import json_provider
+from app import get_serving_model, predict_batch, start_model_reloader, warmup
+from request_schema import decode_ride
+
+logger = logging.getLogger(__name__)
+
+MICROBATCH_MAX_SIZE = int(os.environ.get('MICROBATCH_MAX_SIZE', 64))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 2))
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for a vectorized predict function."""
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # A single worker thread keeps batches in order while the event loop
+        # goes on collecting the next one
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='microbatch')
+        self._queue = None
+        self._worker = None
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, item):
+        """Queue an item and wait for its prediction."""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.predict_fn, items)
+            except Exception as e:
+                logger.error("Error in micro-batch of %s requests: %s", len(items), e)
+                logger.error(traceback.format_exc())
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        """Return batching counters for health reporting."""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'requests': self.requests,
+            'average_batch_size': self.requests / self.batches if self.batches else 0.0
+        }
+
+batcher = MicroBatcher(predict_batch, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+
+async def _read_body(receive):
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    return body
+
+async def _send_json(send, status, payload):
+    body = json_provider.dumps(payload)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*')
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _handle_predict(receive, send):
+    if not get_serving_model().loaded:
+        return await _send_json(send, 500, {'error': 'Model not loaded'})
+    try:
+        data = json_provider.loads(await _read_body(receive))
+    except ValueError:
+        return await _send_json(send, 400, {'error': 'Invalid JSON body'})
+    if not isinstance(data, dict):
+        return await _send_json(send, 400, {'error': 'Invalid request format'})
+
+    ride, error_message = decode_ride(data)
+    if ride is None:
+        return await _send_json(send, 400, {'error': error_message})
+
+    try:
+        prediction = await batcher.submit(ride)
+    except Exception as e:
+        return await _send_json(send, 500, {'error': str(e)})
+    await _send_json(send, 200, prediction)
+
+async def application(scope, receive, send):
+    """ASGI entry point serving /predict and /health."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Load (and optionally warm) the model before accepting traffic
+                # so the first request doesn't block the event loop
+                loop = asyncio.get_running_loop()
+                if os.environ.get('WARMUP', '1') == '1':
+                    await loop.run_in_executor(None, warmup)
+                else:
+                    await loop.run_in_executor(None, get_serving_model)
+                start_model_reloader()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    if method == 'OPTIONS':
+        await send({
+            'type': 'http.response.start',
+            'status': 204,
+            'headers': [
+                (b'access-control-allow-origin', b'*'),
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', b'content-type')
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+    elif path == '/predict' and method == 'POST':
+        await _handle_predict(receive, send)
+    elif path == '/health' and method == 'GET':
+        serving_model = get_serving_model()
+        await _send_json(send, 200, {
+            'status': 'ok',
+            'model_loaded': serving_model.loaded,
+            'model_version': serving_model.version,
+            'model_load_seconds': serving_model.load_seconds,
+            'batching': batcher.stats()
+        })
+    else:
+        await _send_json(send, 404, {'error': 'Not found'})
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5000)
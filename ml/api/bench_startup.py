@@ -0,0 +1,65 @@
+"""
+Startup-time benchmark for the prediction service.
+
+Each run starts a fresh interpreter and separately times importing the app,
+loading the model, the first prediction and a steady-state prediction, so
+cold-start regressions show up in the stage that caused them.
+
+Usage:
+    python bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Executed in a fresh interpreter for every run
+_PROBE = '''
+import json, time, warnings
+warnings.filterwarnings("ignore")
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.get_serving_model()
+loaded = time.perf_counter()
+client = app.app.test_client()
+payload = app.WARMUP_REQUESTS[2]
+client.post("/predict", json=payload)
+first = time.perf_counter()
+client.post("/predict", json=payload)
+second = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "load": loaded - imported,
+    "first_predict": first - loaded,
+    "steady_predict": second - first
+}))
+'''
+
+def run_once(env):
+    """Run the probe in a new interpreter and return its stage timings."""
+    result = subprocess.run(
+        [sys.executable, '-c', _PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark prediction service startup')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh-process runs')
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL='WARNING', PREDICTION_CACHE_SIZE='0')
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"Startup timings over {args.runs} runs (ms):")
+    print(f"{'stage':<16}{'median':>10}{'min':>10}{'max':>10}")
+    for stage in ['import', 'load', 'first_predict', 'steady_predict']:
+        values = [run[stage] * 1000 for run in runs]
+        print(f"{stage:<16}{statistics.median(values):>10.2f}{min(values):>10.2f}{max(values):>10.2f}")
+
+if __name__ == '__main__':
+    main()
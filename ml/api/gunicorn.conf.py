@@ -0,0 +1,38 @@
+"""
+Production gunicorn settings for the prediction API.
+
+Usage (from ml/api):
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master before workers fork, so the model is
+loaded a single time. Large model arrays are memory-mapped (MODEL_MMAP=1),
+which keeps them in shared, file-backed pages across all workers.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# One worker per core unless overridden
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+# Load the app (and the model) in the master before forking workers
+preload_app = True
+
+# Recycle workers periodically to bound memory growth from fragmentation
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+
+def when_ready(server):
+    """Configure logging and warm up the preloaded app before workers fork."""
+    from app import configure_logging, warmup
+    configure_logging()
+    if os.environ.get('WARMUP', '1') == '1':
+        warmup()
+
+def post_fork(server, worker):
+    """Start the model hot-reload thread in each worker; it must not run in the master."""
+    from app import start_model_reloader
+    start_model_reloader()
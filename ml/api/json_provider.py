@@ -0,0 +1,48 @@
+"""
+JSON encoding for API requests and responses.
+
+orjson is used when it is installed; it encodes responses several times
+faster than the standard library. Without it everything falls back to the
+json module, so orjson stays an optional dependency.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes with sorted keys."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=DefaultJSONProvider.default, separators=(',', ':'), sort_keys=True).encode()
+
+def loads(data):
+    """Decode JSON from bytes or str; raises ValueError on invalid JSON."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, or by the default provider when orjson is missing."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,263 @@
+"""
+Load generator and replay harness for the prediction service.
+
+Requests are built from generate_ride_data output. Rides are resampled so
+that a few location pairs are far more popular than others (Zipf-distributed
+pair ranks). Pickup hours are weighted by get_time_factor, so rush hours get
+more traffic than quiet hours. The simulated week is compressed onto the
+test duration, which turns those weights into arrival-rate peaks.
+
+Two replay modes are supported:
+    open    - requests are sent at their scheduled arrival times whether or
+              not earlier ones have finished; latency is measured from the
+              scheduled time, so queueing delay is included
+    closed  - a fixed number of clients each send their next request as
+              soon as the previous response arrives
+
+Usage (from ml/api):
+    python load_test.py --start-server gunicorn --mode open --rps 500 --requests 15000
+    python load_test.py --url http://localhost:5000 --mode closed --concurrency 32
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from generate_ride_data import ALL_LOCATIONS, generate_ride_data, get_time_factor
+
+HOURS_PER_WEEK = 7 * 24
+
+# Commands used by --start-server, run from this directory
+SERVER_COMMANDS = {
+    'gunicorn': ['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+    'uvicorn': ['uvicorn', 'asgi:application'],
+    'flask': [sys.executable, '-c', 'import app; app.app.run(host="{host}", port={port}, threaded=True)']
+}
+
+def rides_to_requests(df):
+    """Convert generate_ride_data rows to /predict request bodies."""
+    pickup_times = df['pickup_time'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return [
+        {
+            'source': {'latitude': float(source_lat), 'longitude': float(source_lng)},
+            'destination': {'latitude': float(dest_lat), 'longitude': float(dest_lng)},
+            'pickupTime': pickup_time,
+            'rideType': ride_type,
+            'numberOfRiders': int(num_riders)
+        }
+        for source_lat, source_lng, dest_lat, dest_lng, pickup_time, ride_type, num_riders in zip(
+            df['source_lat'], df['source_lng'], df['dest_lat'], df['dest_lng'],
+            pickup_times, df['ride_type'], df['num_riders']
+        )
+    ]
+
+def build_request_stream(num_requests, duration, pool_size=20000, zipf_exponent=1.1, seed=42):
+    """
+    Build a skewed, time-shaped request stream
+    Args:
+        num_requests: Number of requests in the stream
+        duration: Seconds the simulated week is compressed onto
+        pool_size: Number of rides generated to sample requests from
+        zipf_exponent: Skew of location pair popularity; 0 gives uniform pairs
+        seed: Random seed for the resampling and arrival times
+    Returns:
+        (requests, arrival offsets in seconds sorted ascending)
+    """
+    rng = np.random.default_rng(seed)
+    df = generate_ride_data(num_samples=pool_size, seed=seed)
+
+    # Rank every ordered location pair at random and weight by 1 / rank^s
+    names = list(ALL_LOCATIONS)
+    pair_rank = rng.permutation(len(names) * (len(names) - 1)) + 1
+    pair_index = {}
+    for source in names:
+        for dest in names:
+            if source != dest:
+                pair_index[(source, dest)] = len(pair_index)
+    ride_pairs = np.array([pair_index[pair] for pair in zip(df['source_name'], df['dest_name'])])
+    pair_weight = 1.0 / pair_rank[ride_pairs] ** zipf_exponent
+    # generate_ride_data draws pairs uniformly, so divide by how often each pair
+    # occurs to make the resampled popularity follow the Zipf weights alone
+    pair_weight /= np.bincount(ride_pairs, minlength=len(pair_index))[ride_pairs]
+
+    # More traffic during the hours get_time_factor marks as busy
+    hour_of_week = df['day_of_week'].to_numpy() * 24 + df['hour'].to_numpy()
+    time_weight = np.array([get_time_factor(h % 24, h // 24) for h in range(HOURS_PER_WEEK)])
+    hour_counts = np.bincount(hour_of_week, minlength=HOURS_PER_WEEK)
+    ride_weight = pair_weight * time_weight[hour_of_week] / hour_counts[hour_of_week]
+    ride_weight /= ride_weight.sum()
+
+    chosen = rng.choice(len(df), size=num_requests, p=ride_weight)
+    requests = rides_to_requests(df.iloc[chosen])
+
+    # Each hour of the simulated week gets an equal slice of the duration;
+    # requests arrive uniformly at random within the slice for their hour
+    slot = duration / HOURS_PER_WEEK
+    offsets = (hour_of_week[chosen] + rng.random(num_requests)) * slot
+    order = np.argsort(offsets)
+    return [requests[i] for i in order], offsets[order]
+
+class Client:
+    """Sends /predict requests over one persistent connection per thread."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        return connection
+
+    def post(self, path, body):
+        """Send a request and return its status code, or None on a connection error."""
+        connection = self._connection()
+        try:
+            connection.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            return None
+
+def run_open_loop(client, bodies, offsets, max_in_flight):
+    """Send each request at its scheduled time; return (latencies, statuses, seconds)."""
+    latencies = np.zeros(len(bodies))
+    statuses = [None] * len(bodies)
+
+    def send(i, scheduled):
+        statuses[i] = client.post('/predict', bodies[i])
+        latencies[i] = time.perf_counter() - scheduled
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for i, offset in enumerate(offsets):
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i, scheduled)
+    return latencies, statuses, time.perf_counter() - started
+
+def run_closed_loop(client, bodies, concurrency):
+    """Send requests from a fixed number of clients; return (latencies, statuses, seconds)."""
+    latencies = np.zeros(len(bodies))
+    statuses = [None] * len(bodies)
+
+    def worker(start):
+        for i in range(start, len(bodies), concurrency):
+            sent = time.perf_counter()
+            statuses[i] = client.post('/predict', bodies[i])
+            latencies[i] = time.perf_counter() - sent
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+def summarize(latencies, statuses, seconds):
+    """Return throughput, error counts and latency percentiles in milliseconds."""
+    ok = np.array([status == 200 for status in statuses])
+    summary = {
+        'requests': len(statuses),
+        'errors': int((~ok).sum()),
+        'seconds': seconds,
+        'throughput_rps': len(statuses) / seconds
+    }
+    if ok.any():
+        for name, q in [('p50', 50), ('p95', 95), ('p99', 99), ('p99.9', 99.9)]:
+            summary[f'{name}_ms'] = float(np.percentile(latencies[ok], q) * 1000)
+        summary['max_ms'] = float(latencies[ok].max() * 1000)
+    return summary
+
+def start_server(kind, url, startup_timeout=60):
+    """Start the API in a subprocess and wait until /health responds."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    command = [part.format(host=host, port=port) for part in SERVER_COMMANDS[kind]]
+    if kind == 'uvicorn':
+        command += ['--host', host, '--port', str(port), '--log-level', 'warning']
+    env = dict(os.environ, BIND=f'{host}:{port}', LOG_LEVEL=os.environ.get('LOG_LEVEL', 'WARNING'))
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not become healthy within {startup_timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate realistic load against the prediction API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of the API')
+    parser.add_argument('--start-server', choices=sorted(SERVER_COMMANDS),
+                        help='Start the API locally on --url before running')
+    parser.add_argument('--mode', choices=['open', 'closed'], default='open')
+    parser.add_argument('--requests', type=int, default=5000, help='Number of requests to send')
+    parser.add_argument('--rps', type=float, default=200,
+                        help='Average arrival rate in open-loop mode; rush hours run above it')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Clients in closed-loop mode, maximum in-flight requests in open-loop mode')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Skew of location pair popularity')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    duration = args.requests / args.rps
+    print(f"Building {args.requests} requests...")
+    requests, offsets = build_request_stream(args.requests, duration, zipf_exponent=args.zipf, seed=args.seed)
+    bodies = [json.dumps(body) for body in requests]
+
+    server = start_server(args.start_server, args.url) if args.start_server else None
+    try:
+        client = Client(args.url)
+        if args.mode == 'open':
+            factors = [get_time_factor(h % 24, h // 24) for h in range(HOURS_PER_WEEK)]
+            peak = args.rps * max(factors) / np.mean(factors)
+            print(f"Open loop: {args.rps:.0f} req/s average, ~{peak:.0f} req/s at rush hour, {duration:.1f}s")
+            latencies, statuses, seconds = run_open_loop(client, bodies, offsets, max(args.concurrency, 64))
+        else:
+            print(f"Closed loop: {args.concurrency} clients")
+            latencies, statuses, seconds = run_closed_loop(client, bodies, args.concurrency)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(latencies, statuses, seconds)
+    summary['mode'] = args.mode
+    print(f"\nRequests: {summary['requests']}  errors: {summary['errors']}  "
+          f"throughput: {summary['throughput_rps']:.1f} req/s")
+    if 'p50_ms' in summary:
+        print("Latency (ms): " + "  ".join(
+            f"{name} {summary[f'{name}_ms']:.2f}" for name in ['p50', 'p95', 'p99', 'p99.9', 'max']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+if __name__ == '__main__':
+    main()
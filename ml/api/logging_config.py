@@ -0,0 +1,123 @@
+"""
+Logging setup for the prediction service.
+
+Two modes are supported through LOG_MODE:
+    sync   - standard synchronous logging to stderr (default)
+    async  - records are put on a queue and written as JSON lines by a
+             background listener thread, so I/O and formatting stay off the
+             request thread. Threads don't survive fork, so each process
+             (e.g. every gunicorn worker forked from a preloaded master)
+             starts its own queue and listener the first time it logs.
+
+Per-request debug detail is sampled at LOG_SAMPLE_RATE (0.0 - 1.0). Code on
+the request path checks debug_enabled() before building debug messages, so
+nothing is formatted when the level is disabled or the request was not sampled.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+# Whether the current request was picked for debug logging; code running
+# outside a request (scripts, warmup) logs normally
+_request_sampled = contextvars.ContextVar('request_sampled', default=True)
+
+_sample_rate = 1.0
+
+# Attributes present on every LogRecord; anything else was passed via extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class ProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that runs a listener thread in whichever process it logs from.
+
+    A listener started before a fork only exists in the parent, so records
+    put on the inherited queue by a child would never be written. The queue
+    and listener are created on the first record in each process instead.
+    """
+
+    def __init__(self, *handlers):
+        super().__init__(None)
+        self.targets = handlers
+        self.listener = None
+        self._pid = None
+
+    def emit(self, record):
+        # Handler.handle holds self.lock here, and logging reinitializes
+        # handler locks after fork, so only one thread starts the listener
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        self._pid = os.getpid()
+        self.queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out queued records and stop this process's listener."""
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+def configure_logging(level=None, mode=None, sample_rate=None):
+    """
+    Configure root logging for the service
+    Args:
+        level: Log level name; defaults to LOG_LEVEL or INFO
+        mode: 'sync' or 'async'; defaults to LOG_MODE or sync
+        sample_rate: Fraction of requests that emit debug detail; defaults to LOG_SAMPLE_RATE or 1.0
+    """
+    global _sample_rate
+    level = level or os.environ.get('LOG_LEVEL', 'INFO')
+    mode = mode or os.environ.get('LOG_MODE', 'sync')
+    _sample_rate = float(sample_rate if sample_rate is not None else os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    if mode != 'async':
+        logging.basicConfig()
+        return
+
+    # Replace existing handlers with a queue handler; the listener thread
+    # does the JSON formatting and the actual writes
+    for handler in list(root.handlers):
+        if isinstance(handler, ProcessQueueHandler):
+            handler.stop()
+        root.removeHandler(handler)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+    root.addHandler(ProcessQueueHandler(stream_handler))
+
+def start_request_sampling():
+    """Decide whether the current request emits debug detail."""
+    _request_sampled.set(_sample_rate >= 1.0 or random.random() < _sample_rate)
+
+def debug_enabled(logger):
+    """True if debug messages should be built for the current request."""
+    return logger.isEnabledFor(logging.DEBUG) and _request_sampled.get()
@@ -0,0 +1,95 @@
+"""
+Shared ride matching service.
+
+Holds waiting shared rides in an in-memory RideMatcher index so the backend
+can find a ride to share without scanning the rides collection. The index
+lives in this process, so run it with a single worker (threads are fine):
+    gunicorn -w 1 --threads 8 -b 0.0.0.0:5001 matching_service:app
+    python matching_service.py
+"""
+from flask import Flask, request, jsonify
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from ride_matcher import RideMatcher, to_timestamp
+
+app = Flask(__name__)
+
+# Largest distance between destinations, and pickup time difference, for two rides to match
+MATCH_MAX_DISTANCE_KM = float(os.environ.get('MATCH_MAX_DISTANCE_KM', 0.5))
+MATCH_TIME_WINDOW_MINUTES = float(os.environ.get('MATCH_TIME_WINDOW_MINUTES', 15))
+
+matcher = RideMatcher(MATCH_MAX_DISTANCE_KM, MATCH_TIME_WINDOW_MINUTES)
+
+def parse_ride(data):
+    """
+    Validate a ride in the matching request format
+    Returns:
+        ((latitude, longitude, pickup time), None), or (None, error message)
+    """
+    if not isinstance(data, dict):
+        return None, "Invalid request format"
+    destination = data.get('destination')
+    if not isinstance(destination, dict):
+        return None, "Missing destination"
+    try:
+        latitude = float(destination['latitude'])
+        longitude = float(destination['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None, "Invalid destination coordinates"
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, "Invalid destination coordinates"
+    pickup_time = data.get('pickupTime')
+    if not isinstance(pickup_time, str):
+        return None, "Missing pickupTime"
+    try:
+        timestamp = to_timestamp(pickup_time)
+    except ValueError:
+        return None, "Invalid pickupTime format"
+    return (latitude, longitude, timestamp), None
+
+@app.route('/rides/waiting', methods=['POST'])
+def add_waiting_ride():
+    """Index a shared ride that is waiting for a match."""
+    data = request.get_json(silent=True)
+    ride, error = parse_ride(data)
+    if error is None and not data.get('rideId'):
+        error = "Missing rideId"
+    if error is not None:
+        return jsonify({'error': error}), 400
+    matcher.insert(str(data['rideId']), *ride, user_id=data.get('userId'))
+    return jsonify({'rideId': str(data['rideId']), 'waiting': len(matcher)}), 201
+
+@app.route('/rides/waiting/<ride_id>', methods=['DELETE'])
+def remove_waiting_ride(ride_id):
+    """Remove a ride once it is confirmed, made private or cancelled."""
+    if not matcher.remove(ride_id):
+        return jsonify({'error': 'Ride not found'}), 404
+    return jsonify({'rideId': ride_id, 'waiting': len(matcher)})
+
+@app.route('/rides/match', methods=['POST'])
+def match_ride():
+    """Return the nearest waiting ride compatible with the requested destination and pickup time."""
+    data = request.get_json(silent=True)
+    ride, error = parse_ride(data)
+    if error is not None:
+        return jsonify({'error': error}), 400
+    matcher.expire()
+    match = matcher.find_match(*ride, exclude_user=data.get('userId'))
+    if match is None:
+        return jsonify({'match': None})
+    ride_id, distance_km, time_diff = match
+    return jsonify({'match': {
+        'rideId': ride_id,
+        'destinationDistanceKm': distance_km,
+        'pickupMinutesApart': time_diff / 60
+    }})
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({'status': 'ok', 'matcher': matcher.stats()})
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5001))
+    app.run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,147 @@
+"""
+Low-overhead request metrics rendered in the Prometheus text format.
+
+Histograms use fixed bucket bounds, so recording a value is a bisect and two
+additions under a lock. Metrics are per process; with several gunicorn
+workers each worker reports its own counts.
+"""
+from bisect import bisect_left
+import threading
+import time
+
+# Latency bucket upper bounds in seconds (10us .. 1s)
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f'{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}'
+            for labels, value in values
+        ]
+
+class Histogram:
+    """Histogram with fixed bucket bounds and optional labels."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        # One slot per bucket plus the +Inf overflow slot; cumulative counts
+        # are only computed when rendering
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = ('le', bound if bound == '+Inf' else repr(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {repr(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics exposed together at /metrics."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.metric_type}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class StageTimer:
+    """Records the time between successive lap() calls as named stages."""
+
+    __slots__ = ('histogram', 'last')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.last = time.perf_counter_ns()
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.histogram.observe((now - self.last) / 1e9, stage)
+        self.last = now
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter(
+    'prediction_requests_total', 'HTTP requests handled, by endpoint and status code',
+    ('endpoint', 'status')
+)
+ERRORS = registry.counter(
+    'prediction_errors_total', 'HTTP requests that returned an error status, by endpoint and status code',
+    ('endpoint', 'status')
+)
+REQUEST_LATENCY = registry.histogram(
+    'prediction_request_duration_seconds', 'End-to-end request handling time by endpoint',
+    ('endpoint',)
+)
+STAGE_LATENCY = registry.histogram(
+    'prediction_stage_duration_seconds', 'Time spent in each stage of the /predict hot path',
+    ('stage',)
+)
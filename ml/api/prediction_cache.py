@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import threading
+import time
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash_encode(latitude, longitude, precision=7):
+    """Encode a coordinate as a geohash string of the given precision."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even_bit = True
+    while len(geohash) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        if even_bit:
+            value, value_range = longitude, lng_range
+        else:
+            value, value_range = latitude, lat_range
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits = bits << 1
+            value_range[1] = mid
+        even_bit = not even_bit
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache for model predictions with a per-entry TTL.
+
+    Keys quantize the source and destination to a geohash cell, so nearby
+    requests for the same route and time slot share one model call.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=300, precision=7):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, source_lat, source_lng, dest_lat, dest_lng,
+                 hour, day_of_week, month, ride_type, num_riders):
+        """Build a cache key from quantized endpoints and time/ride attributes."""
+        return (
+            geohash_encode(source_lat, source_lng, self.precision),
+            geohash_encode(dest_lat, dest_lng, self.precision),
+            hour, day_of_week, month, ride_type, num_riders
+        )
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        """Return cache counters for health reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'precision': self.precision,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
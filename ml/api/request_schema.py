@@ -0,0 +1,128 @@
+"""
+Compiled schema for ride requests.
+
+A request is validated and decoded in one pass into a RideRequest, which
+carries the coordinates, the parsed pickup time fields and the haversine
+distance. Later stages read its attributes instead of walking the payload
+dict or parsing the pickup time again.
+"""
+from datetime import datetime
+import math
+
+RIDE_TYPES = ('private', 'shared')
+
+class SchemaError(ValueError):
+    """A field failed validation; the message is returned to the client."""
+
+class RideRequest:
+    """Decoded /predict request."""
+
+    __slots__ = ('source_lat', 'source_lng', 'dest_lat', 'dest_lng', 'pickup_time', 'hour',
+                 'day_of_week', 'month', 'ride_type', 'is_shared', 'num_riders', 'distance')
+
+    def __init__(self, source, destination, pickup_time, ride_type, num_riders):
+        self.source_lat, self.source_lng = source
+        self.dest_lat, self.dest_lng = destination
+        self.pickup_time = pickup_time
+        self.hour = pickup_time.hour
+        self.day_of_week = pickup_time.weekday()
+        self.month = pickup_time.month
+        self.ride_type = ride_type
+        self.is_shared = ride_type == 'shared'
+        self.num_riders = num_riders
+        self.distance = haversine_km(self.source_lat, self.source_lng, self.dest_lat, self.dest_lng)
+
+    def __repr__(self):
+        return (f"RideRequest(({self.source_lat}, {self.source_lng}) -> ({self.dest_lat}, {self.dest_lng}), "
+                f"{self.pickup_time.isoformat()}, {self.ride_type}, {self.num_riders})")
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Haversine distance in kilometers between two scalar points."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def point_field(name):
+    """Decoder for a {latitude, longitude} point, returning (latitude, longitude) floats."""
+    def decode(value):
+        if not isinstance(value, dict):
+            raise SchemaError(f"Invalid {name} format")
+        if 'latitude' not in value or 'longitude' not in value:
+            raise SchemaError(f"Missing coordinates in {name}")
+        latitude, longitude = value['latitude'], value['longitude']
+        if not (_is_number(latitude) and -90 <= latitude <= 90):
+            raise SchemaError(f"Invalid {name} latitude")
+        if not (_is_number(longitude) and -180 <= longitude <= 180):
+            raise SchemaError(f"Invalid {name} longitude")
+        return float(latitude), float(longitude)
+    return decode
+
+def datetime_field(message):
+    """Decoder for an ISO 8601 timestamp, accepting a trailing Z."""
+    def decode(value):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            raise SchemaError(message)
+    return decode
+
+def choice_field(choices, message):
+    """Decoder accepting one of a fixed set of strings."""
+    choices = frozenset(choices)
+    def decode(value):
+        if not isinstance(value, str) or value not in choices:
+            raise SchemaError(message)
+        return value
+    return decode
+
+def positive_int_field(message):
+    """Decoder for an integer of at least 1."""
+    def decode(value):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise SchemaError(message)
+        return value
+    return decode
+
+class RequestSchema:
+    """
+    Ordered table of required fields and their decoders.
+
+    decode checks that every field is present, then runs each decoder once and
+    builds the request object from the decoded values in field order. Errors
+    are reported for the first failing field, like the checks they replace.
+    """
+
+    def __init__(self, fields, build):
+        self.fields = tuple(fields)
+        self.build = build
+
+    def decode(self, data):
+        """
+        Validate and decode a payload
+        Returns:
+            (request object, None), or (None, error message)
+        """
+        if not isinstance(data, dict):
+            return None, "Invalid request format"
+        for name, _ in self.fields:
+            if name not in data:
+                return None, f"Missing required field: {name}"
+        try:
+            return self.build(*[decode(data[name]) for name, decode in self.fields]), None
+        except SchemaError as e:
+            return None, str(e)
+
+RIDE_SCHEMA = RequestSchema([
+    ('source', point_field('source')),
+    ('destination', point_field('destination')),
+    ('pickupTime', datetime_field("Invalid pickup time format")),
+    ('rideType', choice_field(RIDE_TYPES, "Invalid ride type")),
+    ('numberOfRiders', positive_int_field("Invalid number of riders"))
+], RideRequest)
+
+def decode_ride(data):
+    """Validate and decode a /predict request; returns (RideRequest, None) or (None, error message)."""
+    return RIDE_SCHEMA.decode(data)
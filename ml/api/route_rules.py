@@ -0,0 +1,191 @@
+"""
+Route rules: ETA clamps and messages for specific corridors.
+
+Rules are loaded from a JSON file of the form:
+    {
+        "cell_degrees": 0.01,
+        "rules": [
+            {
+                "name": "Jaypee Institute to IIT Delhi, rush hour",
+                "origin": {"lat": [28.52, 28.53], "lng": [77.36, 77.37]},
+                "destination": {"lat": [28.54, 28.55], "lng": [77.19, 77.20]},
+                "hours": [[8, 10], [17, 20]],
+                "days": [0, 1, 2, 3, 4],
+                "min_minutes": 35,
+                "max_minutes": 90,
+                "message": "This route often experiences heavy traffic during rush hour."
+            }
+        ]
+    }
+
+A rule applies when the source is inside its origin box, the destination is
+inside its destination box (both exclusive), the pickup hour is in one of its
+[start, end) windows and the weekday (0=Monday) is in days. hours, days,
+min_minutes, max_minutes and message are optional. When several rules apply,
+the first one in the file wins.
+
+Each rule is indexed under every (origin cell, destination cell) pair of a
+grid of cell_degrees cells that its boxes touch. A request only checks the
+rules indexed under its own cell pair, so lookup cost does not grow with the
+number of rules.
+"""
+import json
+import math
+
+import numpy as np
+
+# A rule touching more (origin cell, destination cell) pairs than this needs a larger cell_degrees
+MAX_CELL_PAIRS_PER_RULE = 10000
+
+def _parse_box(rule, field, name):
+    box = rule.get(field)
+    try:
+        lat_min, lat_max = (float(value) for value in box['lat'])
+        lng_min, lng_max = (float(value) for value in box['lng'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Route rule {name}: {field} must have lat and lng [min, max] ranges")
+    if not (lat_min < lat_max and lng_min < lng_max):
+        raise ValueError(f"Route rule {name}: {field} ranges must have min < max")
+    return lat_min, lat_max, lng_min, lng_max
+
+def _parse_rule(rule, index):
+    """Validate a rule from the JSON file and fill in its defaults."""
+    if not isinstance(rule, dict):
+        raise ValueError(f"Route rule {index} must be an object")
+    name = rule.get('name', str(index))
+    hours = [(float(start), float(end)) for start, end in rule.get('hours', [[0, 24]])]
+    days = rule.get('days')
+    min_minutes = rule.get('min_minutes')
+    max_minutes = rule.get('max_minutes')
+    return {
+        'name': name,
+        'origin': _parse_box(rule, 'origin', name),
+        'destination': _parse_box(rule, 'destination', name),
+        'hours': hours,
+        'days': None if days is None else frozenset(int(day) for day in days),
+        'min_minutes': -math.inf if min_minutes is None else float(min_minutes),
+        'max_minutes': math.inf if max_minutes is None else float(max_minutes),
+        'message': rule.get('message')
+    }
+
+def _in_box(box, latitude, longitude):
+    lat_min, lat_max, lng_min, lng_max = box
+    return lat_min < latitude < lat_max and lng_min < longitude < lng_max
+
+class RouteRules:
+    """
+    Route rules indexed by the grid cells of their origin and destination boxes.
+    """
+
+    def __init__(self, rules=(), cell_degrees=0.01):
+        self.rules = [_parse_rule(rule, index) for index, rule in enumerate(rules)]
+        self.cell_degrees = cell_degrees
+        # Cells are numbered row by row over the whole globe
+        self._columns = math.ceil(360 / cell_degrees) + 2
+        self._index = {}
+        for rule_id, rule in enumerate(self.rules):
+            origin_cells = self._box_cells(rule['origin'])
+            dest_cells = self._box_cells(rule['destination'])
+            if len(origin_cells) * len(dest_cells) > MAX_CELL_PAIRS_PER_RULE:
+                raise ValueError(f"Route rule {rule['name']} covers too many grid cells; "
+                                 f"use a larger cell_degrees")
+            for origin in origin_cells:
+                for dest in dest_cells:
+                    self._index.setdefault((origin, dest), []).append(rule_id)
+        # Sorted cell and cell pair arrays so match_arrays can find indexed rides with searchsorted
+        self._origin_cells = np.array(sorted({origin for origin, _ in self._index}), dtype=np.int64)
+        self._dest_cells = np.array(sorted({dest for _, dest in self._index}), dtype=np.int64)
+        self._pair_keys = np.sort(np.array([
+            np.searchsorted(self._origin_cells, origin) * len(self._dest_cells) +
+            np.searchsorted(self._dest_cells, dest)
+            for origin, dest in self._index
+        ], dtype=np.int64))
+
+        # Arrays for vectorized clamping; rule ID -1 (no rule) reads the last entry
+        self._min_minutes = np.array([rule['min_minutes'] for rule in self.rules] + [-math.inf])
+        self._max_minutes = np.array([rule['max_minutes'] for rule in self.rules] + [math.inf])
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees) * self._columns +
+                math.floor(longitude / self.cell_degrees))
+
+    def _cells(self, latitude, longitude):
+        return (np.floor(np.asarray(latitude) / self.cell_degrees).astype(np.int64) * self._columns +
+                np.floor(np.asarray(longitude) / self.cell_degrees).astype(np.int64))
+
+    def _box_cells(self, box):
+        lat_min, lat_max, lng_min, lng_max = box
+        rows = range(math.floor(lat_min / self.cell_degrees), math.floor(lat_max / self.cell_degrees) + 1)
+        columns = range(math.floor(lng_min / self.cell_degrees), math.floor(lng_max / self.cell_degrees) + 1)
+        return [row * self._columns + column for row in rows for column in columns]
+
+    def _first_applicable(self, rule_ids, source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week):
+        for rule_id in rule_ids:
+            rule = self.rules[rule_id]
+            if (_in_box(rule['origin'], source_lat, source_lng) and
+                    _in_box(rule['destination'], dest_lat, dest_lng) and
+                    any(start <= hour < end for start, end in rule['hours']) and
+                    (rule['days'] is None or day_of_week in rule['days'])):
+                return rule_id
+        return -1
+
+    def match(self, source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week):
+        """Return the rule that applies to a ride, or None."""
+        rule_ids = self._index.get((self._cell(source_lat, source_lng), self._cell(dest_lat, dest_lng)))
+        if rule_ids is None:
+            return None
+        rule_id = self._first_applicable(rule_ids, source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week)
+        return self.rules[rule_id] if rule_id >= 0 else None
+
+    def match_arrays(self, source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week):
+        """
+        Find the rule that applies to each ride
+        Args:
+            source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week:
+                Arrays with one entry per ride, or scalars shared by all rides
+        Returns:
+            Array of rule IDs (indexes into rules), -1 where no rule applies
+        """
+        source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week = np.broadcast_arrays(*map(
+            np.atleast_1d, (source_lat, source_lng, dest_lat, dest_lng, hour, day_of_week)))
+        rule_ids = np.full(source_lat.shape, -1, dtype=np.intp)
+        if not self.rules:
+            return rule_ids
+        # Only rides whose (origin cell, destination cell) pair has rules need a closer look
+        origin_cells = self._cells(source_lat, source_lng)
+        dest_cells = self._cells(dest_lat, dest_lng)
+        origin_index = np.searchsorted(self._origin_cells, origin_cells).clip(max=len(self._origin_cells) - 1)
+        dest_index = np.searchsorted(self._dest_cells, dest_cells).clip(max=len(self._dest_cells) - 1)
+        pair_keys = origin_index * len(self._dest_cells) + dest_index
+        pair_index = np.searchsorted(self._pair_keys, pair_keys).clip(max=len(self._pair_keys) - 1)
+        indexed = ((self._origin_cells[origin_index] == origin_cells) & (self._dest_cells[dest_index] == dest_cells) &
+                   (self._pair_keys[pair_index] == pair_keys))
+        for i in np.flatnonzero(indexed).tolist():
+            rule_ids[i] = self._first_applicable(
+                self._index[origin_cells[i], dest_cells[i]],
+                source_lat[i], source_lng[i], dest_lat[i], dest_lng[i], hour[i], day_of_week[i])
+        return rule_ids
+
+    def clamp(self, minutes, rule):
+        """Clamp a predicted time to a rule's min/max minutes."""
+        return min(max(minutes, rule['min_minutes']), rule['max_minutes'])
+
+    def clamp_arrays(self, minutes, rule_ids):
+        """Clamp predicted times to the min/max minutes of their rules (from match_arrays)."""
+        return np.clip(minutes, self._min_minutes[rule_ids], self._max_minutes[rule_ids])
+
+    def message(self, rule_id):
+        """routeInfo message of a rule ID from match_arrays, or None."""
+        return self.rules[rule_id]['message'] if rule_id >= 0 else None
+
+def load_route_rules(path):
+    """Load route rules from a JSON file; a missing file means no rules."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return RouteRules()
+    return RouteRules(data.get('rules', []), data.get('cell_degrees', 0.01))
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class ServingModel:
+    """Trained model plus the artifacts derived from it, loaded together for serving."""
+
+    def __init__(self, model, feature_spec, metadata, od_table=None, tree_ensemble=None,
+                 load_seconds=None):
+        self.model = model
+        self.feature_spec = feature_spec
+        self.metadata = metadata
+        self.od_table = od_table
+        self.tree_ensemble = tree_ensemble
+        self.load_seconds = load_seconds
+
+    @property
+    def loaded(self):
+        return self.model is not None and self.feature_spec is not None
+
+    @property
+    def version(self):
+        """Registry version of the model, or its training timestamp for unversioned models."""
+        return self.metadata.get('version') or self.metadata.get('timestamp')
+
+    def predict(self, features):
+        """Run the model, using the native tree evaluator when available."""
+        if self.tree_ensemble is not None:
+            return self.tree_ensemble.predict(features)
+        return self.model.predict(features)
+
+def load_serving_model(model_dir, use_native_trees=True, mmap_mode='r'):
+    """
+    Load the active model and its derived artifacts from model_dir
+    Args:
+        model_dir: Model registry directory, or a directory holding
+            ride_time_estimator.joblib and its artifacts
+        use_native_trees: Load the exported tree ensemble if one matches the model
+        mmap_mode: joblib/numpy memory-map mode for large arrays, or None
+    Returns:
+        ServingModel; its model is None if loading failed
+    """
+    # Heavy imports (joblib, scikit-learn via unpickling, pandas) are deferred
+    # until the model is actually needed
+    import joblib
+    from feature_spec import FeatureSpec, load_feature_spec
+    from model_registry import resolve_model_dir
+    from od_table import load_od_table
+    from tree_ensemble import load_tree_ensemble
+
+    # Load the trained model
+    try:
+        model_dir = resolve_model_dir(model_dir)
+        model_path = os.path.join(model_dir, 'ride_time_estimator.joblib')
+        logger.info("Loading model from: %s", model_path)
+        load_started = time.perf_counter()
+        model = joblib.load(model_path, mmap_mode=mmap_mode)
+        load_seconds = time.perf_counter() - load_started
+        logger.info("Model loaded successfully in %.3fs", load_seconds)
+
+        # Log expected feature count
+        if hasattr(model, 'n_features_in_'):
+            logger.info("Model expects %s features", model.n_features_in_)
+    except Exception as e:
+        logger.error("Error loading model: %s", e)
+        return ServingModel(None, None, {})
+
+    # Load the feature spec saved next to the model
+    try:
+        feature_spec = load_feature_spec(os.path.join(model_dir, 'feature_spec.joblib'))
+        if hasattr(model, 'feature_names_in_'):
+            if list(model.feature_names_in_) != feature_spec.columns:
+                logger.warning("Feature spec does not match model features, compiling spec from the model")
+                feature_spec = FeatureSpec(model.feature_names_in_)
+        logger.info("Feature spec loaded with %s features", feature_spec.n_features)
+    except Exception as e:
+        logger.error("Error loading feature spec: %s", e)
+        feature_spec = None
+
+    # Load the model metadata that derived artifacts are checked against
+    try:
+        with open(os.path.join(model_dir, 'model_metadata.json')) as f:
+            metadata = json.load(f)
+    except Exception as e:
+        logger.error("Error loading model metadata: %s", e)
+        metadata = {}
+
+    # Load the precomputed origin-destination table if it matches the model
+    try:
+        od_table = load_od_table(model_dir, metadata)
+        if od_table is not None:
+            logger.info("OD table loaded for %s known locations", len(od_table.location_index))
+        else:
+            logger.info("No up-to-date OD table found, all requests will use model inference")
+    except Exception as e:
+        logger.error("Error loading OD table: %s", e)
+        od_table = None
+
+    # Load the flattened tree ensemble used for native inference
+    try:
+        tree_ensemble = None
+        if use_native_trees:
+            tree_ensemble = load_tree_ensemble(model_dir, metadata, mmap_mode)
+        if tree_ensemble is not None:
+            logger.info("Native tree evaluator loaded with %s trees", tree_ensemble.n_trees)
+    except Exception as e:
+        logger.error("Error loading tree ensemble: %s", e)
+        tree_ensemble = None
+
+    return ServingModel(model, feature_spec, metadata, od_table, tree_ensemble, load_seconds)
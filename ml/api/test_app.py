@@ -0,0 +1,120 @@
+import copy
+import os
+import shutil
+
+import pytest
+
+import app as app_module
+from prediction_cache import PredictionCache
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
+
+# Committed model artifacts; the OD table is left out so every path runs the model
+MODEL_FILES = ['ride_time_estimator.joblib', 'ride_time_estimator_trees.joblib',
+               'feature_spec.joblib', 'model_metadata.json']
+
+JIIT = {'latitude': 28.5244, 'longitude': 77.3656}
+IIT_DELHI = {'latitude': 28.5456, 'longitude': 77.1924}
+CONNAUGHT_PLACE = {'latitude': 28.6315, 'longitude': 77.2167}
+NOIDA = {'latitude': 28.5355, 'longitude': 77.3910}
+
+RIDES = [
+    # Rush hour and off-peak rides on the Jaypee to IIT Delhi route rules
+    {'source': JIIT, 'destination': IIT_DELHI, 'pickupTime': '2023-03-15T09:00:00Z',
+     'rideType': 'private', 'numberOfRiders': 1},
+    {'source': JIIT, 'destination': IIT_DELHI, 'pickupTime': '2023-03-15T13:30:00Z',
+     'rideType': 'shared', 'numberOfRiders': 2},
+    {'source': JIIT, 'destination': IIT_DELHI, 'pickupTime': '2023-03-18T18:00:00Z',
+     'rideType': 'private', 'numberOfRiders': 1},
+    # Rides no rule applies to
+    {'source': CONNAUGHT_PLACE, 'destination': NOIDA, 'pickupTime': '2023-07-08T18:30:00Z',
+     'rideType': 'shared', 'numberOfRiders': 3},
+    {'source': NOIDA, 'destination': CONNAUGHT_PLACE, 'pickupTime': '2023-11-21T23:15:00Z',
+     'rideType': 'private', 'numberOfRiders': 1}
+]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client serving a copy of the committed model, with a fresh cache and no reload thread."""
+    for name in MODEL_FILES:
+        if os.path.exists(os.path.join(MODELS_DIR, name)):
+            shutil.copy(os.path.join(MODELS_DIR, name), tmp_path)
+    monkeypatch.setattr(app_module, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(app_module, '_serving_model', None)
+    monkeypatch.setattr(app_module, 'MODEL_POLL_SECONDS', 0)
+    monkeypatch.setattr(app_module, 'prediction_cache', PredictionCache())
+    assert app_module.get_serving_model().loaded
+    return app_module.app.test_client()
+
+def _assert_same_prediction(actual, expected):
+    assert set(actual) == set(expected)
+    for field, value in expected.items():
+        if isinstance(value, float):
+            assert actual[field] == pytest.approx(value, rel=1e-6), field
+        else:
+            assert actual[field] == value, field
+
+def test_batch_matches_single_predictions(client):
+    """/predict/batch returns exactly what /predict returns for each ride, routeInfo included."""
+    singles = []
+    for ride in RIDES:
+        response = client.post('/predict', json=ride)
+        assert response.status_code == 200
+        singles.append(response.get_json())
+    assert None not in (singles[0]['routeInfo'], singles[1]['routeInfo'])
+    assert singles[0]['routeInfo'] != singles[1]['routeInfo']
+    assert singles[3]['routeInfo'] is None
+
+    response = client.post('/predict/batch', json={'rides': RIDES})
+    assert response.status_code == 200
+    predictions = response.get_json()['predictions']
+    assert len(predictions) == len(RIDES)
+    for actual, expected in zip(predictions, singles):
+        _assert_same_prediction(actual, expected)
+
+def test_batch_reports_invalid_rides(client):
+    response = client.post('/predict/batch', json={'rides': [RIDES[0], {'source': JIIT}, 'ride']})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'index': 1, 'error': 'Missing required field: destination'},
+        {'index': 2, 'error': 'Invalid ride format'}
+    ]
+
+def test_cache_key_changes_with_model_version(client, monkeypatch):
+    """A model swap starts a new set of cache entries instead of serving the old model's predictions."""
+    cache = app_module.prediction_cache
+    client.post('/predict', json=RIDES[3])
+    client.post('/predict', json=RIDES[3])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    swapped = copy.copy(app_module.get_serving_model())
+    swapped.metadata = {**swapped.metadata, 'version': 'next-version'}
+    monkeypatch.setattr(app_module, '_serving_model', swapped)
+    client.post('/predict', json=RIDES[3])
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats()['size'] == 2
+
+def test_matrix_matches_single_predictions(client):
+    """Every cell of /predict/matrix equals /predict for that origin and destination."""
+    origins = [JIIT, CONNAUGHT_PLACE]
+    destinations = [IIT_DELHI, NOIDA, JIIT]
+    shared = {'pickupTime': '2023-03-15T09:00:00Z', 'rideType': 'shared', 'numberOfRiders': 2}
+    response = client.post('/predict/matrix', json={'origins': origins, 'destinations': destinations, **shared})
+    assert response.status_code == 200
+    matrix = response.get_json()
+    assert len(matrix['predictedTimes']) == len(origins)
+
+    for i, origin in enumerate(origins):
+        assert len(matrix['predictedTimes'][i]) == len(destinations)
+        for j, destination in enumerate(destinations):
+            single = client.post('/predict', json={'source': origin, 'destination': destination, **shared}).get_json()
+            assert matrix['predictedTimes'][i][j] == pytest.approx(single['predictedTime'], rel=1e-6)
+            assert matrix['distances'][i][j] == pytest.approx(single['distance'], rel=1e-6, abs=1e-9)
+
+def test_matrix_rejects_invalid_points(client):
+    response = client.post('/predict/matrix', json={
+        'origins': [JIIT], 'destinations': [{'latitude': 95, 'longitude': 77.2}],
+        'pickupTime': '2023-03-15T09:00:00Z', 'rideType': 'private'
+    })
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid destinations[0] latitude'
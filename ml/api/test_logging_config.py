@@ -0,0 +1,31 @@
+import json
+import logging
+import os
+
+from logging_config import ProcessQueueHandler, configure_logging
+
+def test_async_logging_after_fork(tmp_path):
+    """Records logged by a forked child are written, though the parent's listener thread isn't inherited."""
+    log_path = tmp_path / 'log.jsonl'
+    with open(log_path, 'w') as stream:
+        configure_logging(level='INFO', mode='async')
+        handler = next(h for h in logging.getLogger().handlers if isinstance(h, ProcessQueueHandler))
+        handler.targets[0].setStream(stream)
+        logger = logging.getLogger('test_fork')
+        # Start the parent's listener before forking, like a preloaded gunicorn master
+        logger.info("parent before fork")
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logger.warning("child record")
+                handler.stop()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        logger.info("parent after fork")
+        handler.stop()
+        logging.getLogger().removeHandler(handler)
+
+    messages = [json.loads(line)['message'] for line in log_path.read_text().splitlines()]
+    assert sorted(messages) == ["child record", "parent after fork", "parent before fork"]
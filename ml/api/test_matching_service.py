@@ -0,0 +1,46 @@
+import pytest
+
+import matching_service
+from ride_matcher import RideMatcher
+
+IIT_DELHI = {'latitude': 28.5456, 'longitude': 77.1924}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(matching_service, 'matcher', RideMatcher(0.5, 15))
+    return matching_service.app.test_client()
+
+def _ride(ride_id, user_id, pickup_time, destination=IIT_DELHI):
+    return {'rideId': ride_id, 'userId': user_id, 'destination': destination, 'pickupTime': pickup_time}
+
+def test_match_skips_own_rides_and_respects_the_window(client):
+    assert client.post('/rides/waiting', json=_ride('r1', 'alice', '2099-01-01T09:00:00Z')).status_code == 201
+    assert client.post('/rides/waiting', json=_ride('r2', 'bob', '2099-01-01T09:20:00Z')).status_code == 201
+
+    match = client.post('/rides/match', json=_ride(None, 'bob', '2099-01-01T09:10:00Z')).get_json()['match']
+    assert match['rideId'] == 'r1' and match['pickupMinutesApart'] == 10
+    match = client.post('/rides/match', json=_ride(None, 'alice', '2099-01-01T09:10:00Z')).get_json()['match']
+    assert match['rideId'] == 'r2'
+    # 16 minutes after alice's ride, and bob's own ride is skipped
+    assert client.post('/rides/match', json=_ride(None, 'bob', '2099-01-01T09:16:00Z')).get_json() == {'match': None}
+
+def test_remove_waiting_ride(client):
+    client.post('/rides/waiting', json=_ride('r1', 'alice', '2099-01-01T09:00:00Z'))
+    assert client.delete('/rides/waiting/r1').get_json() == {'rideId': 'r1', 'waiting': 0}
+    assert client.delete('/rides/waiting/r1').status_code == 404
+    assert client.post('/rides/match', json=_ride(None, 'bob', '2099-01-01T09:00:00Z')).get_json() == {'match': None}
+
+@pytest.mark.parametrize('payload, message', [
+    ({'destination': IIT_DELHI}, "Missing pickupTime"),
+    ({'pickupTime': '2099-01-01T09:00:00Z'}, "Missing destination"),
+    ({'destination': {'latitude': 91, 'longitude': 77.1}, 'pickupTime': '2099-01-01T09:00:00Z'},
+     "Invalid destination coordinates"),
+    ({'destination': IIT_DELHI, 'pickupTime': 'soon'}, "Invalid pickupTime format")
+])
+def test_invalid_rides_are_rejected(client, payload, message):
+    response = client.post('/rides/match', json=payload)
+    assert response.status_code == 400 and response.get_json() == {'error': message}
+
+def test_polar_destination_is_answered(client):
+    ride = _ride(None, 'bob', '2099-01-01T09:00:00Z', destination={'latitude': 90, 'longitude': 10})
+    assert client.post('/rides/match', json=ride).get_json() == {'match': None}
@@ -0,0 +1,65 @@
+import prediction_cache
+from prediction_cache import PredictionCache, geohash_encode
+
+class FakeClock:
+    """Stands in for time.monotonic so TTL expiry can be tested without sleeping."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_hits_and_misses_are_counted():
+    cache = PredictionCache(max_size=10, ttl_seconds=60)
+    assert cache.get('a') is None
+    cache.put('a', 12.5)
+    assert cache.get('a') == 12.5
+    assert cache.get('a') == 12.5
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['hit_rate'] == 2 / 3
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_size=2, ttl_seconds=60)
+    cache.put('a', 1.0)
+    cache.put('b', 2.0)
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a') == 1.0
+    cache.put('c', 3.0)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1.0 and cache.get('c') == 3.0
+    assert cache.stats()['evictions'] == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    cache = PredictionCache(max_size=10, ttl_seconds=60)
+    cache.put('a', 1.0)
+    clock.now += 59
+    assert cache.get('a') == 1.0
+    clock.now += 1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['expirations'], stats['misses'], stats['size']) == (1, 1, 0)
+
+def test_clear_resets_entries_and_counters():
+    cache = PredictionCache(max_size=1, ttl_seconds=60)
+    cache.put('a', 1.0)
+    cache.put('b', 2.0)
+    cache.get('b')
+    cache.get('a')
+    cache.clear()
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses'], stats['evictions']) == (0, 0, 0, 0)
+
+def test_keys_quantize_nearby_points():
+    cache = PredictionCache(precision=7)
+    key = cache.make_key(28.52440, 77.36560, 28.5456, 77.1924, 9, 2, 3, 'private', 1)
+    # About a meter away, in the same ~150 m geohash cell
+    assert cache.make_key(28.52441, 77.36561, 28.5456, 77.1924, 9, 2, 3, 'private', 1) == key
+    assert cache.make_key(28.5300, 77.36560, 28.5456, 77.1924, 9, 2, 3, 'private', 1) != key
+    assert cache.make_key(28.52440, 77.36560, 28.5456, 77.1924, 10, 2, 3, 'private', 1) != key
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(57.64911, 10.40744, precision=11) == 'u4pruydqqvj'
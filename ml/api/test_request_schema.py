@@ -0,0 +1,58 @@
+import pytest
+
+from request_schema import RideRequest, decode_ride, haversine_km
+
+VALID = {
+    'source': {'latitude': 28.5244, 'longitude': 77.3656},
+    'destination': {'latitude': 28.5456, 'longitude': 77.1924},
+    'pickupTime': '2023-03-15T09:30:00Z',
+    'rideType': 'shared',
+    'numberOfRiders': 2
+}
+
+def _with(**fields):
+    payload = {**VALID, **fields}
+    return {name: value for name, value in payload.items() if value is not None}
+
+def test_valid_request_is_decoded():
+    ride, error = decode_ride(VALID)
+    assert error is None and isinstance(ride, RideRequest)
+    assert (ride.source_lat, ride.source_lng, ride.dest_lat, ride.dest_lng) == (28.5244, 77.3656, 28.5456, 77.1924)
+    assert (ride.hour, ride.day_of_week, ride.month) == (9, 2, 3)
+    assert ride.ride_type == 'shared' and ride.is_shared and ride.num_riders == 2
+    assert ride.distance == pytest.approx(haversine_km(28.5244, 77.3656, 28.5456, 77.1924))
+    assert ride.distance == pytest.approx(17.0, abs=0.5)
+
+def test_integer_coordinates_and_offsets_are_accepted():
+    ride, error = decode_ride(_with(source={'latitude': 28, 'longitude': 77},
+                                    pickupTime='2023-03-15T09:30:00+05:30'))
+    assert error is None
+    assert isinstance(ride.source_lat, float) and ride.hour == 9
+
+@pytest.mark.parametrize('payload, message', [
+    (None, "Invalid request format"),
+    ([VALID], "Invalid request format"),
+    (_with(source=None), "Missing required field: source"),
+    (_with(destination=None), "Missing required field: destination"),
+    (_with(pickupTime=None), "Missing required field: pickupTime"),
+    (_with(rideType=None), "Missing required field: rideType"),
+    (_with(numberOfRiders=None), "Missing required field: numberOfRiders"),
+    (_with(source='28.5,77.3'), "Invalid source format"),
+    (_with(source={'latitude': 28.5}), "Missing coordinates in source"),
+    (_with(destination={'longitude': 77.1}), "Missing coordinates in destination"),
+    (_with(source={'latitude': 91, 'longitude': 77.3}), "Invalid source latitude"),
+    (_with(source={'latitude': '28.5', 'longitude': 77.3}), "Invalid source latitude"),
+    (_with(source={'latitude': True, 'longitude': 77.3}), "Invalid source latitude"),
+    (_with(destination={'latitude': 28.5, 'longitude': -181}), "Invalid destination longitude"),
+    (_with(pickupTime='tomorrow at nine'), "Invalid pickup time format"),
+    (_with(pickupTime=1678872600), "Invalid pickup time format"),
+    (_with(rideType='pooled'), "Invalid ride type"),
+    (_with(numberOfRiders=0), "Invalid number of riders"),
+    (_with(numberOfRiders=1.5), "Invalid number of riders"),
+    (_with(numberOfRiders=True), "Invalid number of riders")
+])
+def test_invalid_requests_report_the_first_failing_field(payload, message):
+    assert decode_ride(payload) == (None, message)
+
+def test_missing_fields_are_reported_before_invalid_ones():
+    assert decode_ride(_with(source='bad', numberOfRiders=None)) == (None, "Missing required field: numberOfRiders")
@@ -0,0 +1,105 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from route_rules import RouteRules, load_route_rules
+
+JIIT_BOX = {'lat': [28.52, 28.53], 'lng': [77.36, 77.37]}
+IIT_BOX = {'lat': [28.54, 28.55], 'lng': [77.19, 77.20]}
+
+RULES = [
+    {'name': 'rush hour', 'origin': JIIT_BOX, 'destination': IIT_BOX,
+     'hours': [[8, 10], [17, 20]], 'days': [0, 1, 2, 3, 4],
+     'min_minutes': 35, 'max_minutes': 90, 'message': 'rush'},
+    {'name': 'any time', 'origin': JIIT_BOX, 'destination': IIT_BOX, 'min_minutes': 26, 'message': 'moderate'},
+    # A large box spanning many grid cells
+    {'name': 'wide', 'origin': {'lat': [28.40, 28.46], 'lng': [77.00, 77.06]},
+     'destination': {'lat': [28.60, 28.70], 'lng': [77.20, 77.30]}, 'max_minutes': 60}
+]
+
+@pytest.fixture
+def rules():
+    return RouteRules(RULES, cell_degrees=0.01)
+
+def _random_rides(n_rides=2000, seed=0):
+    """Rides around and inside the rule boxes, at every hour and day."""
+    rng = np.random.default_rng(seed)
+    wide = n_rides // 2
+    # Half over the whole area, half just around the small Jaypee boxes
+    return (np.concatenate([rng.uniform(28.38, 28.56, wide), rng.uniform(28.515, 28.535, n_rides - wide)]),
+            np.concatenate([rng.uniform(76.98, 77.40, wide), rng.uniform(77.355, 77.375, n_rides - wide)]),
+            np.concatenate([rng.uniform(28.52, 28.72, wide), rng.uniform(28.535, 28.555, n_rides - wide)]),
+            np.concatenate([rng.uniform(77.17, 77.32, wide), rng.uniform(77.185, 77.205, n_rides - wide)]),
+            rng.integers(0, 24, n_rides), rng.integers(0, 7, n_rides))
+
+def test_match_arrays_agrees_with_match(rules):
+    rides = _random_rides()
+    # Points exactly on grid lines and box edges
+    edges = ([28.52, 28.525, 28.53, 28.41], [77.36, 77.365, 77.37, 77.05],
+             [28.54, 28.545, 28.55, 28.65], [77.19, 77.195, 77.20, 77.25], [9, 9, 9, 3], [2, 2, 2, 6])
+    for arrays in (rides, edges):
+        rule_ids = rules.match_arrays(*arrays)
+        for i, rule_id in enumerate(rule_ids.tolist()):
+            rule = rules.match(*(float(values[i]) for values in arrays[:4]), int(arrays[4][i]), int(arrays[5][i]))
+            assert (rules.rules[rule_id] if rule_id >= 0 else None) is rule
+    assert set(rules.match_arrays(*rides).tolist()) == {-1, 0, 1, 2}
+
+def test_scalar_inputs_broadcast(rules):
+    rule_ids = rules.match_arrays(28.525, 77.365, np.array([28.545, 28.6]), 77.195, 9, 1)
+    assert rule_ids.tolist() == [0, -1]
+    assert rules.match_arrays(28.525, 77.365, 28.545, 77.195, 9, 1).tolist() == [0]
+
+def test_first_matching_rule_wins(rules):
+    # Both Jaypee rules cover a weekday rush hour ride; the rush hour rule is listed first
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 9, 1)['name'] == 'rush hour'
+    # Off-peak and at weekends only the second rule applies
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 13, 1)['name'] == 'any time'
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 9, 5)['name'] == 'any time'
+    reordered = RouteRules([RULES[1], RULES[0]])
+    assert reordered.match(28.525, 77.365, 28.545, 77.195, 9, 1)['name'] == 'any time'
+
+def test_boxes_and_hours_are_exclusive_and_half_open(rules):
+    assert rules.match(28.52, 77.365, 28.545, 77.195, 9, 1) is None
+    assert rules.match(28.525, 77.365, 28.545, 77.20, 9, 1) is None
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 8, 1)['name'] == 'rush hour'
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 10, 1)['name'] == 'any time'
+
+def test_clamp_bounds(rules):
+    rush, any_time, wide = rules.rules
+    assert rules.clamp(20.0, rush) == 35
+    assert rules.clamp(50.0, rush) == 50
+    assert rules.clamp(120.0, rush) == 90
+    # A missing bound doesn't clamp
+    assert rules.clamp(500.0, any_time) == 500
+    assert rules.clamp(1.0, wide) == 1
+    clamped = rules.clamp_arrays(np.array([20.0, 120.0, 10.0, 500.0, 7.0]), np.array([0, 0, 1, 2, -1]))
+    assert clamped.tolist() == [35, 90, 26, 60, 7]
+
+def test_messages(rules):
+    assert rules.message(0) == 'rush'
+    assert rules.message(2) is None
+    assert rules.message(-1) is None
+
+def test_no_rules():
+    rules = RouteRules()
+    assert len(rules) == 0
+    assert rules.match(28.525, 77.365, 28.545, 77.195, 9, 1) is None
+    assert rules.match_arrays(*_random_rides(10)).tolist() == [-1] * 10
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError, match='min < max'):
+        RouteRules([{'origin': {'lat': [1, 0], 'lng': [0, 1]}, 'destination': IIT_BOX}])
+    with pytest.raises(ValueError, match='destination must have'):
+        RouteRules([{'origin': JIIT_BOX}])
+    with pytest.raises(ValueError, match='too many grid cells'):
+        RouteRules([{'origin': {'lat': [0, 10], 'lng': [0, 10]}, 'destination': IIT_BOX}])
+
+def test_load_route_rules(tmp_path):
+    path = tmp_path / 'route_rules.json'
+    path.write_text(json.dumps({'cell_degrees': 0.05, 'rules': RULES}))
+    rules = load_route_rules(str(path))
+    assert len(rules) == 3 and rules.cell_degrees == 0.05
+    assert rules.rules[1]['max_minutes'] == math.inf
+    assert len(load_route_rules(str(tmp_path / 'missing.json'))) == 0
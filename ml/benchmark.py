@@ -0,0 +1,301 @@
+"""
+Microbenchmarks for the training pipeline and the API hot paths.
+
+Each benchmark reports the median time per call over several repeats along
+with its throughput. Results can be saved as a baseline and later runs
+compared against it; any benchmark slower than the baseline by more than
+the threshold is reported as a regression and the script exits non-zero.
+
+Usage (from the ml/ directory):
+    python benchmark.py --save-baseline
+    python benchmark.py --compare
+    python benchmark.py --only api --compare
+    python benchmark.py --only pipeline --skip-large
+    python benchmark.py --only pipeline --sizes 10000 100000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Minimum time each repeat should run for, so short calls are timed in loops
+MIN_REPEAT_SECONDS = 0.2
+
+# Dataset sizes the pipeline benchmarks run at by default
+DEFAULT_PIPELINE_SIZES = [10000, 1000000, 10000000]
+
+# Pipeline sizes up to this many rows are timed over several runs; larger
+# sizes are timed once and can be skipped with --skip-large
+SMALL_PIPELINE_SIZE = 100000
+
+# preprocess_data holds the whole dataset in memory, so larger sizes only
+# time the constant-memory preprocess_data_streaming
+IN_MEMORY_PIPELINE_SIZE = 1000000
+
+class Benchmark:
+    """Collects timings and renders them as a table."""
+
+    def __init__(self, repeats=5):
+        self.repeats = repeats
+        self.results = {}
+
+    def run(self, name, fn, items=1, repeats=None):
+        """
+        Time fn and record the median seconds per call
+        Args:
+            name: Benchmark name used in reports and baselines
+            fn: Zero-argument callable to time
+            items: Number of items processed per call, used for throughput
+            repeats: Number of timed repeats; defaults to the suite setting
+        """
+        # Calibrate the loop count so each repeat runs for a measurable time
+        fn()
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - started
+            if elapsed >= MIN_REPEAT_SECONDS or loops >= 1 << 20:
+                break
+            loops *= 2 if elapsed == 0 else max(2, int(MIN_REPEAT_SECONDS / elapsed))
+
+        timings = [elapsed / loops]
+        for _ in range((repeats or self.repeats) - 1):
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            timings.append((time.perf_counter() - started) / loops)
+
+        seconds = statistics.median(timings)
+        self.results[name] = {
+            'seconds': seconds,
+            'min_seconds': min(timings),
+            'items_per_second': items / seconds
+        }
+        print(f"{name:<48}{_format_time(seconds):>12}{items / seconds:>16,.0f}/s")
+
+    def run_calls(self, name, fn, items=1, calls=1):
+        """Time long-running fn with one call per repeat and no warm-up call."""
+        timings = []
+        for _ in range(calls):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        seconds = statistics.median(timings)
+        self.results[name] = {
+            'seconds': seconds,
+            'min_seconds': min(timings),
+            'items_per_second': items / seconds
+        }
+        print(f"{name:<48}{_format_time(seconds):>12}{items / seconds:>16,.0f}/s")
+
+def _format_time(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def _print_header(title):
+    print(f"\n{title}")
+    print(f"{'benchmark':<48}{'median':>12}{'throughput':>18}")
+
+def bench_api(bench):
+    """Benchmark the request path helpers and /predict end to end."""
+    # The cache would turn repeated requests into dictionary lookups
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, API_DIR)
+    import app as api
+    from generate_ride_data import haversine_distance
+
+    serving_model = api.get_serving_model()
+    if not serving_model.loaded:
+        raise RuntimeError("Model could not be loaded from models/")
+    spec = serving_model.feature_spec
+
+    payload = api.WARMUP_REQUESTS[2]
+    known_route = api.WARMUP_REQUESTS[0]
+    source, dest = payload['source'], payload['destination']
+    rng = np.random.default_rng(42)
+    n = 10000
+    lat1, lat2 = rng.uniform(28.4, 28.8, n), rng.uniform(28.4, 28.8, n)
+    lng1, lng2 = rng.uniform(77.0, 77.6, n), rng.uniform(77.0, 77.6, n)
+
+    _print_header("API hot paths")
+    bench.run('haversine_distance (math, scalar)', lambda: haversine_distance(
+        source['latitude'], source['longitude'], dest['latitude'], dest['longitude']))
+    bench.run('haversine_distance (numpy, scalar)', lambda: api.haversine_distance(
+        source['latitude'], source['longitude'], dest['latitude'], dest['longitude']))
+    bench.run(f'haversine_distance (numpy, {n} pairs)',
+              lambda: api.haversine_distance(lat1, lng1, lat2, lng2), items=n)
+    bench.run('decode_ride', lambda: api.decode_ride(payload))
+    ride, _ = api.decode_ride(payload)
+    bench.run('process_input_data', lambda: api.process_input_data(ride, spec))
+    bench.run('calculate_realistic_time_estimate',
+              lambda: api.calculate_realistic_time_estimate(21.3, 18, 2, 'shared'))
+
+    bench.run(f'RouteRules.match ({len(api.route_rules)} rules)', lambda: api.route_rules.match(
+        source['latitude'], source['longitude'], dest['latitude'], dest['longitude'], 18, 2))
+    features = api.process_input_data(ride, spec).copy()
+    bench.run('ServingModel.predict (1 row)', lambda: serving_model.predict(features))
+
+    client = api.app.test_client()
+    bench.run('/predict (model inference)', lambda: client.post('/predict', json=payload))
+    if serving_model.od_table is not None:
+        bench.run('/predict (OD table hit)', lambda: client.post('/predict', json=known_route))
+    batch = {'rides': [api.WARMUP_REQUESTS[i % 3] for i in range(100)]}
+    bench.run('/predict/batch (100 rides)', lambda: client.post('/predict/batch', json=batch), items=100)
+    points = [{'latitude': float(lat), 'longitude': float(lng)} for lat, lng in zip(lat1[:50], lng1[:50])]
+    matrix = {'origins': points[:20], 'destinations': points, 'pickupTime': payload['pickupTime'],
+              'rideType': payload['rideType'], 'numberOfRiders': payload['numberOfRiders']}
+    bench.run('/predict/matrix (20x50)', lambda: client.post('/predict/matrix', json=matrix), items=1000)
+
+def bench_models(bench, train_rows=4000):
+    """Benchmark predict for each model family trained by train_models."""
+    from train_model import load_processed_data, train_models
+
+    X_train, X_test, y_train, _, _ = load_processed_data()
+    with contextlib.redirect_stdout(io.StringIO()):
+        models = train_models(X_train.head(train_rows), y_train.head(train_rows))
+
+    _print_header(f"model.predict by family (trained on {min(train_rows, len(X_train))} rows)")
+    one_row = X_test.head(1)
+    rows = X_test.head(1000)
+    for name, model in models.items():
+        bench.run(f'{name} predict (1 row)', lambda: model.predict(one_row))
+        bench.run(f'{name} predict ({len(rows)} rows)', lambda: model.predict(rows), items=len(rows))
+
+def bench_pipeline(bench, sizes):
+    """Benchmark data generation and preprocessing at each dataset size."""
+    from generate_ride_data import generate_ride_data
+    from preprocess_data import preprocess_data, preprocess_data_streaming
+
+    _print_header("Pipeline")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            # Small sizes are noisy, so they take the median of several runs
+            calls = bench.repeats if size <= SMALL_PIPELINE_SIZE else 1
+            data_path = os.path.join(tmp, 'ride_data.csv')
+            output_dir = os.path.join(tmp, 'processed')
+            frames = {}
+
+            def generate():
+                frames['df'] = generate_ride_data(num_samples=size)
+
+            bench.run_calls(f'generate_ride_data ({size} rows)', generate, size, calls)
+            bench.run_calls(f'write ride_data.csv ({size} rows)',
+                            lambda: frames['df'].to_csv(data_path, index=False), size, calls)
+            del frames['df']
+
+            def preprocess():
+                # Includes reading ride_data.csv and writing the processed files
+                with contextlib.redirect_stdout(io.StringIO()):
+                    preprocess_data(data_path, output_dir)
+
+            if size <= IN_MEMORY_PIPELINE_SIZE:
+                bench.run_calls(f'preprocess_data ({size} rows)', preprocess, size, calls)
+
+            def preprocess_streaming():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    preprocess_data_streaming(data_path, output_dir)
+
+            bench.run_calls(f'preprocess_data_streaming ({size} rows)', preprocess_streaming, size, calls)
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a saved baseline
+    Args:
+        results: Timings from this run
+        baseline: Timings loaded from a baseline file
+        threshold: Allowed slowdown as a fraction (0.2 = 20%)
+    Returns:
+        List of benchmark names that regressed
+    """
+    regressions = []
+    print(f"\nComparison with baseline (threshold {threshold:.0%})")
+    print(f"{'benchmark':<48}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['seconds']
+        change = result['seconds'] / before - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<48}{_format_time(before):>12}{_format_time(result['seconds']):>12}{change:>+10.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ride time pipeline and API')
+    parser.add_argument('--only', choices=['api', 'models', 'pipeline'], action='append',
+                        help='Benchmark groups to run (default: all)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_PIPELINE_SIZES,
+                        help='Dataset sizes for the pipeline benchmarks (default: 10k, 1M and 10M rows)')
+    parser.add_argument('--skip-large', action='store_true',
+                        help=f'Skip pipeline sizes above {SMALL_PIPELINE_SIZE} rows')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per benchmark')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='Save results as the new baseline')
+    parser.add_argument('--compare', action='store_true', help='Compare results with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown before a benchmark counts as a regression')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    groups = args.only or ['api', 'models', 'pipeline']
+    bench = Benchmark(repeats=args.repeats)
+    if 'api' in groups:
+        bench_api(bench)
+    if 'models' in groups:
+        bench_models(bench)
+    if 'pipeline' in groups:
+        sizes = [size for size in args.sizes if not (args.skip_large and size > SMALL_PIPELINE_SIZE)]
+        bench_pipeline(bench, sizes)
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline found at {args.baseline}; run with --save-baseline first")
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            regressions = compare(bench.results, baseline['results'], args.threshold)
+            if regressions:
+                print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+                sys.exit(1)
+            print("\nNo regressions")
+
+    if args.save_baseline:
+        # Merge so groups run separately can share one baseline file
+        saved = {'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                saved = json.load(f)
+        saved['results'].update(bench.results)
+        saved['machine'] = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count()
+        }
+        saved['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        with open(args.baseline, 'w') as f:
+            json.dump(saved, f, indent=4)
+        print(f"\nBaseline saved to {args.baseline}")
+
+if __name__ == '__main__':
+    main()
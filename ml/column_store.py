@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+
+# Manifest describing the columns of a store directory
+MANIFEST = 'columns.json'
+
+def is_column_store(path):
+    """Check whether path is a column store directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+def save_columns(df, path, dtypes=None):
+    """
+    Save a DataFrame as a directory of typed .npy files, one per column
+    Args:
+        df: DataFrame to save
+        path: Directory to write the column files and manifest to
+        dtypes: Optional mapping of column name to storage dtype
+    Returns:
+        Path of the store
+    """
+    dtypes = dtypes or {}
+    os.makedirs(path, exist_ok=True)
+    if is_column_store(path):
+        os.remove(os.path.join(path, MANIFEST))
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'file': f'{i:03d}.npy'}
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy().astype('datetime64[s]')
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy()
+            values = values.astype(dtypes.get(name, values.dtype), copy=False)
+        else:
+            # Strings are stored as integer codes into a category list
+            categorical = pd.Categorical(series)
+            entry['categories'] = [str(category) for category in categorical.categories]
+            code_dtype = np.uint8 if len(categorical.categories) < 256 else np.uint16
+            values = categorical.codes.astype(code_dtype)
+        entry['dtype'] = values.dtype.str
+        np.save(os.path.join(path, entry['file']), values)
+        columns.append(entry)
+
+    # The manifest is written last so a half-written store is never picked up
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump({'rows': len(df), 'columns': columns}, f, indent=4)
+    return path
+
+def load_columns(path, mmap_mode='r'):
+    """
+    Load a column store as a dict of (memory-mapped) arrays
+    Args:
+        path: Store directory written by save_columns
+        mmap_mode: numpy memory-map mode, or None to read columns into memory
+    Returns:
+        Dict of column name to array, in stored column order; string columns
+        are returned as pandas Categoricals
+    """
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    columns = {}
+    for entry in manifest['columns']:
+        file_path = os.path.join(path, entry['file'])
+        if entry['file'].endswith('.bin'):
+            # Raw column written by ColumnAppender
+            if mmap_mode is not None and manifest['rows'] > 0:
+                values = np.memmap(file_path, dtype=entry['dtype'], mode=mmap_mode, shape=(manifest['rows'],))
+            else:
+                values = np.fromfile(file_path, dtype=entry['dtype'], count=manifest['rows'])
+        else:
+            values = np.load(file_path, mmap_mode=mmap_mode)
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(np.asarray(values, dtype=np.int32), entry['categories'])
+        columns[entry['name']] = values
+    return columns
+
+def load_frame(path, mmap_mode='r'):
+    """Load a column store as a DataFrame."""
+    return pd.DataFrame(load_columns(path, mmap_mode))
+
+def load_matrix(path, dtype=np.float32, columns=None):
+    """
+    Gather numeric columns of a store into one 2-D array
+    Args:
+        path: Store directory written by save_columns
+        dtype: dtype of the returned matrix
+        columns: Column names to gather; defaults to all stored columns
+    Returns:
+        (matrix, column names)
+    """
+    arrays = load_columns(path)
+    columns = list(columns or arrays)
+    n_rows = len(arrays[columns[0]]) if columns else 0
+    matrix = np.empty((n_rows, len(columns)), dtype=dtype)
+    for i, name in enumerate(columns):
+        matrix[:, i] = arrays[name]
+    return matrix, columns
+
+def allocate_columns(path, n_rows, schema):
+    """
+    Preallocate a column store so several writers can fill disjoint row ranges
+    Args:
+        path: Directory to create the column files in
+        n_rows: Total number of rows
+        schema: List of {"name", "dtype"} entries, with "categories" for
+            string columns stored as codes
+    Returns:
+        Manifest entries to pass to write_rows and finish_columns
+    """
+    os.makedirs(path, exist_ok=True)
+    if is_column_store(path):
+        os.remove(os.path.join(path, MANIFEST))
+    columns = []
+    for i, column in enumerate(schema):
+        entry = dict(column, file=f'{i:03d}.npy', dtype=np.dtype(column['dtype']).str)
+        values = np.lib.format.open_memmap(
+            os.path.join(path, entry['file']), mode='w+', dtype=entry['dtype'], shape=(n_rows,)
+        )
+        del values
+        columns.append(entry)
+    return columns
+
+def write_rows(path, columns, start, values):
+    """Write a block of rows, given as a dict of column name to array, at row start."""
+    for entry in columns:
+        target = np.load(os.path.join(path, entry['file']), mmap_mode='r+')
+        block = values[entry['name']]
+        target[start:start + len(block)] = block
+        target.flush()
+        del target
+
+def finish_columns(path, columns, n_rows):
+    """Write the manifest of a preallocated store once all rows are written."""
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump({'rows': n_rows, 'columns': columns}, f, indent=4)
+    return path
+
+class ColumnAppender:
+    """
+    Appends row blocks to a column store whose final size is not known up front.
+
+    Columns are written as raw binary files opened in append mode, so memory
+    use is bounded by the block size. The manifest recording the row count
+    is written by close().
+    """
+
+    def __init__(self, path, schema):
+        os.makedirs(path, exist_ok=True)
+        if is_column_store(path):
+            os.remove(os.path.join(path, MANIFEST))
+        self.path = path
+        self.rows = 0
+        self.columns = [
+            dict(column, file=f'{i:03d}.bin', dtype=np.dtype(column['dtype']).str)
+            for i, column in enumerate(schema)
+        ]
+        self._files = [open(os.path.join(path, column['file']), 'wb') for column in self.columns]
+
+    def append(self, values):
+        """Append a block of rows given as a dict of column name to array."""
+        n_rows = None
+        for column, f in zip(self.columns, self._files):
+            block = np.ascontiguousarray(values[column['name']], dtype=column['dtype'])
+            f.write(block.tobytes())
+            n_rows = len(block)
+        self.rows += n_rows or 0
+
+    def close(self):
+        """Close the column files and write the manifest."""
+        for f in self._files:
+            f.close()
+        return finish_columns(self.path, self.columns, self.rows)
+
+    def abort(self):
+        """Close the column files without writing the manifest, leaving no loadable store."""
+        for f in self._files:
+            f.close()
@@ -0,0 +1,141 @@
+import numpy as np
+import joblib
+import os
+
+# Feature columns in the order the model is trained on. The second day_of_week
+# column is a historical duplicate (it matched the old 'day_' prefix filter) and
+# is kept so the layout stays compatible with already trained models.
+FEATURE_COLUMNS = (
+    ['source_lat', 'source_lng', 'dest_lat', 'dest_lng', 'distance_km'] +
+    ['hour', 'day_of_week', 'month', 'is_weekend', 'is_rush_hour'] +
+    ['day_of_week.1'] + [f'day_{day}' for day in range(7)] +
+    [f'hour_{hour}' for hour in range(24)] +
+    ['is_shared', 'num_riders']
+)
+
+# Raw inputs accepted by FeatureSpec.transform
+INPUT_FIELDS = [
+    'source_lat', 'source_lng', 'dest_lat', 'dest_lng', 'distance_km',
+    'hour', 'day_of_week', 'month', 'is_shared', 'num_riders'
+]
+
+# Derived binary features computed from the raw inputs
+DERIVED_FIELDS = ['is_weekend', 'is_rush_hour']
+
+# Compact storage dtypes for feature columns; one-hot columns are uint8
+FIELD_DTYPES = {
+    'source_lat': np.float32, 'source_lng': np.float32,
+    'dest_lat': np.float32, 'dest_lng': np.float32, 'distance_km': np.float32,
+    'hour': np.int8, 'day_of_week': np.int8, 'month': np.int8, 'num_riders': np.int8,
+    'is_shared': np.uint8, 'is_weekend': np.uint8, 'is_rush_hour': np.uint8
+}
+
+# One-hot encoded groups: column prefix -> (source field, number of categories)
+ONE_HOT_GROUPS = {
+    'day': ('day_of_week', 7),
+    'hour': ('hour', 24)
+}
+
+class FeatureSpec:
+    """
+    Compiled feature layout shared by preprocessing, training and serving.
+
+    The column list is compiled once into column offsets per input field and
+    one-hot lookup tables, so transform() only does array copies and table
+    lookups into a preallocated output buffer.
+    """
+
+    def __init__(self, columns=FEATURE_COLUMNS):
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+
+        field_offsets = {}
+        one_hot_offsets = {}
+        for offset, column in enumerate(self.columns):
+            # Duplicated columns are suffixed '.1', '.2', ... by pandas
+            name = column.split('.')[0]
+            prefix, _, category = name.rpartition('_')
+            if name in INPUT_FIELDS or name in DERIVED_FIELDS:
+                field_offsets.setdefault(name, []).append(offset)
+            elif prefix in ONE_HOT_GROUPS and category.isdigit():
+                one_hot_offsets.setdefault(prefix, {})[int(category)] = offset
+            else:
+                raise ValueError(f"Unknown feature column: {column}")
+
+        # Precomputed destination columns for every scalar field
+        self.field_offsets = {
+            name: np.array(offsets, dtype=np.intp) for name, offsets in field_offsets.items()
+        }
+
+        # One-hot lookup tables: row k holds the encoding of category k over
+        # the group's destination columns
+        self.one_hot_tables = {}
+        for prefix, offsets in one_hot_offsets.items():
+            field, size = ONE_HOT_GROUPS[prefix]
+            categories = sorted(offsets)
+            table = np.zeros((size, len(categories)))
+            for column, category in enumerate(categories):
+                if category < size:
+                    table[category, column] = 1
+            self.one_hot_tables[field] = (
+                np.array([offsets[category] for category in categories], dtype=np.intp), table
+            )
+
+    def column_dtypes(self):
+        """Return the compact storage dtype of every column."""
+        return {
+            column: FIELD_DTYPES.get(column.split('.')[0], np.uint8) for column in self.columns
+        }
+
+    def empty(self, n_rows=1):
+        """Allocate an output buffer for n_rows feature rows."""
+        return np.zeros((n_rows, self.n_features))
+
+    def transform(self, source_lat, source_lng, dest_lat, dest_lng, distance_km,
+                  hour, day_of_week, month, is_shared, num_riders, out=None):
+        """
+        Build model features for scalar or array inputs
+        Args:
+            source_lat, source_lng, dest_lat, dest_lng: Coordinates in degrees
+            distance_km: Haversine distance in kilometers
+            hour: Hour of the day (0-23)
+            day_of_week: Day of the week (0=Monday, 6=Sunday)
+            month: Month of the year (1-12)
+            is_shared: 1 for shared rides, 0 for private rides
+            num_riders: Number of riders
+            out: Optional preallocated buffer with at least as many rows as inputs
+        Returns:
+            2-D feature matrix with one row per input
+        """
+        hour = np.atleast_1d(hour).astype(np.intp, copy=False)
+        day_of_week = np.atleast_1d(day_of_week).astype(np.intp, copy=False)
+        n_rows = len(hour)
+        if out is None:
+            out = self.empty(n_rows)
+        out = out[:n_rows]
+
+        values = {
+            'source_lat': source_lat,
+            'source_lng': source_lng,
+            'dest_lat': dest_lat,
+            'dest_lng': dest_lng,
+            'distance_km': distance_km,
+            'hour': hour,
+            'day_of_week': day_of_week,
+            'month': month,
+            'is_shared': is_shared,
+            'num_riders': num_riders,
+            'is_weekend': day_of_week >= 5,
+            'is_rush_hour': ((hour >= 8) & (hour < 10)) | ((hour >= 17) & (hour < 19))
+        }
+        for name, offsets in self.field_offsets.items():
+            out[:, offsets] = np.reshape(values[name], (-1, 1))
+        for field, (offsets, table) in self.one_hot_tables.items():
+            out[:, offsets] = table[values[field]]
+        return out
+
+def load_feature_spec(path, fallback_columns=FEATURE_COLUMNS):
+    """Load a saved feature spec, compiling one from fallback_columns if none exists."""
+    if os.path.exists(path):
+        return joblib.load(path)
+    return FeatureSpec(fallback_columns)
@@ -1,6 +1,6 @@
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 import random
 from math import radians, sin, cos, sqrt, atan2
 
@@ -45,6 +45,15 @@ LANDMARKS = {
 # Combine all locations
 ALL_LOCATIONS = {**INSTITUTIONS, **LANDMARKS}
 
+# Compact dtypes used when saving rides in the columnar format
+RIDE_DATA_DTYPES = {
+    "source_lat": np.float32, "source_lng": np.float32,
+    "dest_lat": np.float32, "dest_lng": np.float32,
+    "hour": np.int8, "day_of_week": np.int8, "month": np.int8, "num_riders": np.int8,
+    "distance_km": np.float32, "duration_minutes": np.float32,
+    "is_weekend": np.uint8, "is_rush_hour": np.uint8
+}
+
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the great circle distance between two points
@@ -118,73 +127,228 @@ def calculate_realistic_duration(distance, hour, weekday, ride_type):
     # Ensure minimum ride time
     return max(round(duration + pickup_time, 1), 7)  # Minimum 7 minutes
 
-def generate_ride_data(num_samples=5000, start_date="2023-01-01", end_date="2023-12-31"):
-    """Generate synthetic ride data with realistic travel times"""
-    rides = []
-    start_date = datetime.strptime(start_date, "%Y-%m-%d")
-    end_date = datetime.strptime(end_date, "%Y-%m-%d")
-    date_range = (end_date - start_date).days
+# Time factors for every (weekday, hour), used by the vectorized generator
+TIME_FACTORS = np.array([[get_time_factor(hour, weekday) for hour in range(24)] for weekday in range(7)])
+
+# String columns of the ride data and their fixed category lists, so that
+# every chunk encodes them the same way
+RIDE_TYPES = ["private", "shared"]
+
+RIDE_DATA_COLUMNS = [
+    "source_name", "source_lat", "source_lng", "dest_name", "dest_lat", "dest_lng",
+    "pickup_time", "hour", "day_of_week", "month", "ride_type", "num_riders",
+    "distance_km", "duration_minutes", "is_weekend", "is_rush_hour"
+]
+
+def realistic_durations(distance, hour, weekday, is_shared, rng):
+    """Vectorized calculate_realistic_duration for arrays of rides"""
+    base_speed = np.select([distance < 5, distance < 10], [18, 22], 28)
+    base_duration = (distance / base_speed) * 60
+    ride_type_factor = np.where(is_shared, 1.3, 1.0)
+    random_factor = rng.uniform(0.92, 1.08, len(distance))
+    duration = base_duration * TIME_FACTORS[weekday, hour] * ride_type_factor * random_factor
+    pickup_time = rng.uniform(2, 5, len(distance))
+    return np.maximum(np.round(duration + pickup_time, 1), 7)
+
+def pair_distance_matrix(locations=ALL_LOCATIONS):
+    """Distance in km between every ordered pair of locations"""
+    coords = [(location["lat"], location["lng"]) for location in locations.values()]
+    return np.array([
+        [haversine_distance(lat1, lng1, lat2, lng2) for lat2, lng2 in coords]
+        for lat1, lng1 in coords
+    ])
+
+def _generation_plan(num_samples, start_date, end_date, seed, chunk_size):
+    """Everything the chunks of one dataset share: distances, reference durations and seeds"""
+    start = np.datetime64(datetime.strptime(start_date, "%Y-%m-%d"), "s")
+    end = np.datetime64(datetime.strptime(end_date, "%Y-%m-%d"), "s")
+    chunk_size = chunk_size or max(num_samples, 1)
+    n_chunks = -(-num_samples // chunk_size)
     
-    # Create reference pairs for specific routes to ensure consistency
-    reference_pairs = {}
+    # Each chunk gets an independent stream, so the output depends only on
+    # the seed and chunk size, not on how many processes generate it
+    reference_seed, *chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks + 1)
     
-    for _ in range(num_samples):
-        # Randomly select source and destination
-        source, dest = random.sample(list(ALL_LOCATIONS.keys()), 2)
-        source_coords = ALL_LOCATIONS[source]
-        dest_coords = ALL_LOCATIONS[dest]
-        
-        # Calculate distance
-        distance = haversine_distance(
-            source_coords["lat"], source_coords["lng"],
-            dest_coords["lat"], dest_coords["lng"]
-        )
-        
-        # Generate random pickup time
-        random_days = random.randint(0, date_range)
-        random_hours = random.randint(0, 23)
-        random_minutes = random.randint(0, 59)
-        pickup_time = start_date + timedelta(days=random_days, hours=random_hours, minutes=random_minutes)
-        
-        # Determine ride type and number of riders
-        ride_type = random.choice(["shared", "private"])
-        num_riders = random.randint(1, 4) if ride_type == "shared" else 1
-        
-        # Check if this source-dest pair exists in our reference
-        pair_key = f"{source}->{dest}"
-        if pair_key in reference_pairs:
-            # Get the reference travel time and apply time-based variation
-            ref_duration = reference_pairs[pair_key]
-            time_factor = get_time_factor(pickup_time.hour, pickup_time.weekday())
-            duration = ref_duration * time_factor * random.uniform(0.95, 1.05)
+    # Every pair's reference travel time comes from one realistic ride drawn up
+    # front (rather than the pair's first occurrence) so all chunks agree on it
+    distances = pair_distance_matrix()
+    n_locations = len(distances)
+    rng = np.random.default_rng(reference_seed)
+    hour = rng.integers(0, 24, distances.shape)
+    weekday = rng.integers(0, 7, distances.shape)
+    is_shared = rng.random(distances.shape) < 0.5
+    reference = realistic_durations(
+        distances.ravel(), hour.ravel(), weekday.ravel(), is_shared.ravel(), rng
+    ).reshape(distances.shape) / TIME_FACTORS[weekday, hour]
+    
+    return {
+        "num_samples": num_samples,
+        "chunk_size": chunk_size,
+        "chunk_seeds": chunk_seeds,
+        "start": start,
+        "date_range": int((end - start) // np.timedelta64(1, "D")),
+        "n_locations": n_locations,
+        "distances": distances,
+        "reference": reference
+    }
+
+def _generate_chunk(plan, index):
+    """Generate chunk number index of a plan as a dict of column arrays"""
+    rng = np.random.default_rng(plan["chunk_seeds"][index])
+    n = min(plan["chunk_size"], plan["num_samples"] - index * plan["chunk_size"])
+    names = list(ALL_LOCATIONS)
+    lat = np.array([ALL_LOCATIONS[name]["lat"] for name in names])
+    lng = np.array([ALL_LOCATIONS[name]["lng"] for name in names])
+    
+    # Two distinct locations per ride, like random.sample(locations, 2)
+    source = rng.integers(0, plan["n_locations"], n)
+    dest = rng.integers(0, plan["n_locations"] - 1, n)
+    dest += dest >= source
+    
+    # Random pickup time within the date range
+    days = rng.integers(0, plan["date_range"] + 1, n)
+    hour = rng.integers(0, 24, n)
+    minutes = rng.integers(0, 60, n)
+    pickup_time = plan["start"] + (days * 86400 + hour * 3600 + minutes * 60).astype("timedelta64[s]")
+    day_of_week = (pickup_time.astype("datetime64[D]").astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    month = pickup_time.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    
+    is_shared = rng.random(n) < 0.5
+    num_riders = np.where(is_shared, rng.integers(1, 5, n), 1)
+    
+    # Reference travel time for the pair with time-based variation
+    duration = (
+        plan["reference"][source, dest] * TIME_FACTORS[day_of_week, hour] * rng.uniform(0.95, 1.05, n)
+    )
+    
+    return {
+        "source_name": source,
+        "source_lat": lat[source],
+        "source_lng": lng[source],
+        "dest_name": dest,
+        "dest_lat": lat[dest],
+        "dest_lng": lng[dest],
+        "pickup_time": pickup_time,
+        "hour": hour,
+        "day_of_week": day_of_week,
+        "month": month,
+        "ride_type": is_shared.astype(np.uint8),
+        "num_riders": num_riders,
+        "distance_km": np.round(plan["distances"][source, dest], 2),
+        "duration_minutes": np.round(duration, 1),
+        "is_weekend": (day_of_week >= 5).astype(int),
+        "is_rush_hour": (((8 <= hour) & (hour < 10)) | ((17 <= hour) & (hour < 20))).astype(int)
+    }
+
+def _chunk_frame(columns):
+    """Convert generated column arrays to a DataFrame with string columns decoded"""
+    names = list(ALL_LOCATIONS)
+    frame = dict(columns)
+    frame["source_name"] = pd.Categorical.from_codes(columns["source_name"], names)
+    frame["dest_name"] = pd.Categorical.from_codes(columns["dest_name"], names)
+    frame["ride_type"] = pd.Categorical.from_codes(columns["ride_type"], RIDE_TYPES)
+    return pd.DataFrame(frame, columns=RIDE_DATA_COLUMNS)
+
+def generate_ride_data(num_samples=5000, start_date="2023-01-01", end_date="2023-12-31", seed=None):
+    """Generate synthetic ride data with realistic travel times"""
+    plan = _generation_plan(num_samples, start_date, end_date, seed, None)
+    if num_samples == 0:
+        return pd.DataFrame(columns=RIDE_DATA_COLUMNS)
+    return _chunk_frame(_generate_chunk(plan, 0))
+
+def _ride_data_schema():
+    """Column store schema of the ride data with fixed string categories"""
+    categories = {"source_name": list(ALL_LOCATIONS), "dest_name": list(ALL_LOCATIONS), "ride_type": RIDE_TYPES}
+    schema = []
+    for name in RIDE_DATA_COLUMNS:
+        if name in categories:
+            schema.append({"name": name, "dtype": np.uint8, "categories": categories[name]})
+        elif name == "pickup_time":
+            schema.append({"name": name, "dtype": "datetime64[s]"})
         else:
-            # Calculate realistic duration
-            duration = calculate_realistic_duration(
-                distance, pickup_time.hour, pickup_time.weekday(), ride_type
-            )
-            # Store reference for future consistency
-            reference_pairs[pair_key] = duration / get_time_factor(pickup_time.hour, pickup_time.weekday())
-        
-        rides.append({
-            "source_name": source,
-            "source_lat": source_coords["lat"],
-            "source_lng": source_coords["lng"],
-            "dest_name": dest,
-            "dest_lat": dest_coords["lat"],
-            "dest_lng": dest_coords["lng"],
-            "pickup_time": pickup_time,
-            "hour": pickup_time.hour,
-            "day_of_week": pickup_time.weekday(),
-            "month": pickup_time.month,
-            "ride_type": ride_type,
-            "num_riders": num_riders,
-            "distance_km": round(distance, 2),
-            "duration_minutes": round(duration, 1),
-            "is_weekend": 1 if pickup_time.weekday() >= 5 else 0,
-            "is_rush_hour": 1 if (8 <= pickup_time.hour < 10 or 17 <= pickup_time.hour < 20) else 0
-        })
+            schema.append({"name": name, "dtype": RIDE_DATA_DTYPES[name]})
+    return schema
+
+def _chunk_stats(df):
+    """Sums needed to report dataset statistics without keeping the rows"""
+    rush = df["is_rush_hour"] == 1
+    return {
+        "rows": len(df),
+        "distance_sum": float(df["distance_km"].sum()),
+        "duration_sum": float(df["duration_minutes"].sum()),
+        "duration_min": float(df["duration_minutes"].min()),
+        "duration_max": float(df["duration_minutes"].max()),
+        "rush_rows": int(rush.sum()),
+        "rush_duration_sum": float(df.loc[rush, "duration_minutes"].sum())
+    }
+
+def _write_store_chunk(plan, index, output_path, schema):
+    """Generate one chunk straight into a preallocated column store"""
+    from column_store import write_rows
+    columns = _generate_chunk(plan, index)
+    write_rows(output_path, schema, index * plan["chunk_size"], columns)
+    return _chunk_stats(_chunk_frame(columns))
+
+def _generate_frame_chunk(plan, index):
+    return _chunk_frame(_generate_chunk(plan, index))
+
+def generate_to_disk(num_samples, output_path, data_format="csv", chunk_size=1000000, workers=1,
+                     seed=None, start_date="2023-01-01", end_date="2023-12-31", extra_rows=None):
+    """
+    Generate ride data in fixed-size chunks and stream it to disk
+    Args:
+        num_samples: Number of rides to generate
+        output_path: CSV file or column store directory to write
+        data_format: 'csv' or 'npy'
+        chunk_size: Rides generated (and held in memory) per chunk
+        workers: Number of processes generating chunks
+        seed: Root seed; each chunk gets its own SeedSequence child
+        start_date, end_date: Pickup date range
+        extra_rows: Optional DataFrame appended after the generated rides
+    Returns:
+        Dataset statistics aggregated over all chunks
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    plan = _generation_plan(num_samples, start_date, end_date, seed, chunk_size)
+    n_chunks = len(plan["chunk_seeds"])
+    n_extra = 0 if extra_rows is None else len(extra_rows)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    run = pool.map if pool is not None else map
+    
+    stats = []
+    try:
+        if data_format == "npy":
+            # Workers write their chunk into their own row range of the store
+            from column_store import allocate_columns, finish_columns, write_rows
+            schema = allocate_columns(output_path, num_samples + n_extra, _ride_data_schema())
+            indices = range(n_chunks)
+            stats.extend(run(_write_store_chunk, [plan] * n_chunks, indices,
+                             [output_path] * n_chunks, [schema] * n_chunks))
+            if n_extra:
+                extra = {column["name"]: extra_rows[column["name"]] for column in schema}
+                for name, categories in [(c["name"], c["categories"]) for c in schema if "categories" in c]:
+                    extra[name] = pd.Categorical(extra_rows[name], categories=categories).codes
+                write_rows(output_path, schema, num_samples, extra)
+                stats.append(_chunk_stats(extra_rows))
+            finish_columns(output_path, schema, num_samples + n_extra)
+        else:
+            # Chunks are appended in order by this process
+            with open(output_path, "w", newline="") as f:
+                for index, df in enumerate(run(_generate_frame_chunk, [plan] * n_chunks, range(n_chunks))):
+                    df.to_csv(f, index=False, header=index == 0)
+                    stats.append(_chunk_stats(df))
+                if n_extra:
+                    extra_rows[RIDE_DATA_COLUMNS].to_csv(f, index=False, header=n_chunks == 0)
+                    stats.append(_chunk_stats(extra_rows))
+    finally:
+        if pool is not None:
+            pool.shutdown()
     
-    return pd.DataFrame(rides)
+    total = {key: sum(s[key] for s in stats) for key in ["rows", "distance_sum", "duration_sum",
+                                                        "rush_rows", "rush_duration_sum"]}
+    total["duration_min"] = min(s["duration_min"] for s in stats)
+    total["duration_max"] = max(s["duration_max"] for s in stats)
+    return total
 
 def add_specific_routes(df):
     """Add specific known routes to the dataset for benchmarking"""
@@ -235,7 +399,7 @@ def add_specific_routes(df):
         
         # Generate pickup time
         pickup_time = datetime(2023, route["month"], 15, route["hour"], 0)
-        df = df._append({
+        df = pd.concat([df, pd.DataFrame([{
             "source_name": route["source_name"],
             "source_lat": source_coords["lat"],
             "source_lng": source_coords["lng"],
@@ -252,36 +416,48 @@ def add_specific_routes(df):
             "duration_minutes": route["duration_minutes"],
             "is_weekend": 1 if route["day_of_week"] >= 5 else 0,
             "is_rush_hour": 1 if (8 <= route["hour"] < 10 or 17 <= route["hour"] < 20) else 0
-        }, ignore_index=True)
+        }])], ignore_index=True)
     
     return df
 
 if __name__ == "__main__":
-    # Generate the dataset
-    df = generate_ride_data(num_samples=5000)
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate synthetic ride data")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv",
+                        help="Save as data/ride_data.csv or as typed columns in data/ride_data/")
+    parser.add_argument("--samples", type=int, default=5000, help="Number of rides to generate")
+    parser.add_argument("--chunk-size", type=int, default=1000000, help="Rides generated per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating chunks")
+    parser.add_argument("--seed", type=int, default=None, help="Root seed for reproducible datasets")
+    parser.add_argument("--output", help="Output file or directory")
+    args = parser.parse_args()
     
-    # Add specific benchmark routes
-    df = add_specific_routes(df)
+    # Specific benchmark routes are appended after the generated rides
+    specific_routes = add_specific_routes(pd.DataFrame(columns=RIDE_DATA_COLUMNS))
     
     # Verify the data for key routes
     print("\nSample data for specific routes:")
-    for _, row in df[df["source_name"] == "Jaypee Institute"].head(3).iterrows():
+    for _, row in specific_routes.iterrows():
         print(f"From {row['source_name']} to {row['dest_name']}: {row['duration_minutes']} minutes")
     
-    # Save to CSV
-    df.to_csv("data/ride_data.csv", index=False)
-    print(f"\nGenerated {len(df)} ride samples and saved to data/ride_data.csv")
+    # Generate the dataset in chunks and stream it to CSV or the columnar store
+    output_path = args.output or ("data/ride_data" if args.format == "npy" else "data/ride_data.csv")
+    stats = generate_to_disk(
+        args.samples, output_path, data_format=args.format, chunk_size=args.chunk_size,
+        workers=args.workers, seed=args.seed, extra_rows=specific_routes
+    )
+    print(f"\nGenerated {stats['rows']} ride samples and saved to {output_path}")
     
     # Print statistics
     print("\nData Statistics:")
-    print(f"Average distance: {df['distance_km'].mean():.2f} km")
-    print(f"Average duration: {df['duration_minutes'].mean():.2f} minutes")
-    print(f"Min duration: {df['duration_minutes'].min():.2f} minutes")
-    print(f"Max duration: {df['duration_minutes'].max():.2f} minutes")
+    print(f"Average distance: {stats['distance_sum'] / stats['rows']:.2f} km")
+    print(f"Average duration: {stats['duration_sum'] / stats['rows']:.2f} minutes")
+    print(f"Min duration: {stats['duration_min']:.2f} minutes")
+    print(f"Max duration: {stats['duration_max']:.2f} minutes")
     
     # Time calculations
-    rush_hour_avg = df[df["is_rush_hour"] == 1]["duration_minutes"].mean()
-    non_rush_hour_avg = df[df["is_rush_hour"] == 0]["duration_minutes"].mean()
+    rush_hour_avg = stats["rush_duration_sum"] / stats["rush_rows"]
+    non_rush_hour_avg = (stats["duration_sum"] - stats["rush_duration_sum"]) / (stats["rows"] - stats["rush_rows"])
     print(f"\nRush hour avg: {rush_hour_avg:.2f} minutes")
     print(f"Non-rush hour avg: {non_rush_hour_avg:.2f} minutes")
-    print(f"Rush hour factor: {rush_hour_avg/non_rush_hour_avg:.2f}x")
\ No newline at end of file
+    print(f"Rush hour factor: {rush_hour_avg/non_rush_hour_avg:.2f}x")
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+from datetime import datetime
+
+# Published model versions live in models/versions/<version>/; the top-level
+# model_metadata.json is the manifest naming the active version
+VERSIONS_DIR = 'versions'
+MANIFEST = 'model_metadata.json'
+
+def read_manifest(model_dir='models'):
+    """Return the manifest (active model metadata), or {} if there is none."""
+    try:
+        with open(os.path.join(model_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def manifest_version(metadata):
+    """Identity of a model: its registry version, or its timestamp for unversioned models."""
+    return metadata.get('version') or metadata.get('timestamp')
+
+def resolve_model_dir(model_dir='models'):
+    """
+    Return the directory holding the active model's artifacts
+    Args:
+        model_dir: Registry root (the models/ directory)
+    Returns:
+        The active version's directory, or model_dir itself for the
+        unversioned layout with artifacts directly in models/ (or when
+        model_dir already is a version directory)
+    """
+    version = read_manifest(model_dir).get('version')
+    version_dir = os.path.join(model_dir, VERSIONS_DIR, version or '')
+    if version and os.path.isdir(version_dir):
+        return version_dir
+    return model_dir
+
+def stage_version(model_dir='models'):
+    """Create an empty staging directory for a new version; returns (version, path)."""
+    version = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    staging_dir = os.path.join(model_dir, VERSIONS_DIR, f'.staging-{version}')
+    os.makedirs(staging_dir)
+    return version, staging_dir
+
+def publish_version(model_dir, version, staging_dir, keep=5):
+    """
+    Make a fully written staged version the active model
+    Args:
+        model_dir: Registry root
+        version: Version name returned by stage_version
+        staging_dir: Staging directory holding the model, its model_metadata.json
+            and derived artifacts
+        keep: Number of most recent versions to keep on disk
+    Returns:
+        Path of the published version directory
+    """
+    metadata_path = os.path.join(staging_dir, MANIFEST)
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    metadata['version'] = version
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    # Renaming the complete directory and then replacing the manifest are both
+    # atomic, so readers see either the old version or the complete new one
+    version_dir = os.path.join(model_dir, VERSIONS_DIR, version)
+    os.rename(staging_dir, version_dir)
+    manifest_path = os.path.join(model_dir, MANIFEST)
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump(metadata, f, indent=4)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+
+    prune_versions(model_dir, keep, active=version)
+    return version_dir
+
+def list_versions(model_dir='models'):
+    """Published versions, oldest first."""
+    versions_dir = os.path.join(model_dir, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if not name.startswith('.'))
+
+def prune_versions(model_dir='models', keep=5, active=None):
+    """Delete all but the newest keep versions, never deleting the active one."""
+    for version in list_versions(model_dir)[:-keep or None]:
+        if version != active:
+            shutil.rmtree(os.path.join(model_dir, VERSIONS_DIR, version), ignore_errors=True)
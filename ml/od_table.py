@@ -0,0 +1,155 @@
+import numpy as np
+import joblib
+import json
+import os
+import argparse
+from model_registry import resolve_model_dir
+
+# (ride type, number of riders) combinations stored in the table
+RIDE_VARIANTS = [('private', 1), ('shared', 1), ('shared', 2), ('shared', 3), ('shared', 4)]
+
+# Coordinates are snapped to known locations at this many decimal places (~10 m)
+SNAP_DECIMALS = 4
+
+HOURS_PER_WEEK = 7 * 24
+
+def _snap(latitude, longitude):
+    return (round(latitude, SNAP_DECIMALS), round(longitude, SNAP_DECIMALS))
+
+def build_od_table(model, spec, metadata, output_dir='models', locations=None):
+    """
+    Evaluate the model for every ordered location pair and time slot
+    Args:
+        model: Trained ride time model
+        spec: FeatureSpec the model was trained with
+        metadata: Contents of model_metadata.json for the model
+        output_dir: Directory to write od_table.npy and od_table.json to
+        locations: Mapping of location name to {"lat", "lng"}; defaults to ALL_LOCATIONS
+    Returns:
+        Path of the written table
+    """
+    # Imported here so the serving API can load tables without pulling in
+    # the data generation script (and pandas)
+    import pandas as pd
+    from generate_ride_data import ALL_LOCATIONS, haversine_distance
+    locations = locations or ALL_LOCATIONS
+    names = list(locations)
+    lat = np.array([locations[name]['lat'] for name in names])
+    lng = np.array([locations[name]['lng'] for name in names])
+    n_locations = len(names)
+
+    # Every (hour of week, source, destination) row for a single month and variant
+    how, source, dest = np.meshgrid(
+        np.arange(HOURS_PER_WEEK), np.arange(n_locations), np.arange(n_locations), indexing='ij'
+    )
+    how, source, dest = how.ravel(), source.ravel(), dest.ravel()
+    distances = np.array([
+        [haversine_distance(lat[i], lng[i], lat[j], lng[j]) for j in range(n_locations)]
+        for i in range(n_locations)
+    ])
+
+    os.makedirs(output_dir, exist_ok=True)
+    table_path = os.path.join(output_dir, 'od_table.npy')
+    shape = (len(RIDE_VARIANTS), 12, HOURS_PER_WEEK, n_locations, n_locations)
+    table = np.lib.format.open_memmap(table_path, mode='w+', dtype=np.float32, shape=shape)
+
+    features = spec.empty(len(how))
+    for variant, (ride_type, num_riders) in enumerate(RIDE_VARIANTS):
+        for month in range(1, 13):
+            spec.transform(
+                lat[source], lng[source], lat[dest], lng[dest], distances[source, dest],
+                how % 24, how // 24, month, ride_type == 'shared', num_riders,
+                out=features
+            )
+            # Named columns, as the model was fitted on a DataFrame; a bare
+            # array makes scikit-learn warn about missing feature names
+            frame = pd.DataFrame(features, columns=spec.columns, copy=False)
+            table[variant, month - 1] = model.predict(frame).reshape(shape[2:])
+    table.flush()
+    del table
+
+    # The header ties the table to the model it was built from
+    header = {
+        'model_name': metadata.get('model_name'),
+        'model_timestamp': metadata.get('timestamp'),
+        'locations': [{'name': name, 'lat': locations[name]['lat'], 'lng': locations[name]['lng']} for name in names],
+        'ride_variants': [list(variant) for variant in RIDE_VARIANTS],
+        'shape': list(shape)
+    }
+    with open(os.path.join(output_dir, 'od_table.json'), 'w') as f:
+        json.dump(header, f, indent=4)
+
+    return table_path
+
+class ODTable:
+    """Memory-mapped table of ML predictions for known origin-destination pairs."""
+
+    def __init__(self, table, header):
+        self.table = table
+        self.header = header
+        self.location_index = {
+            _snap(location['lat'], location['lng']): i
+            for i, location in enumerate(header['locations'])
+        }
+        self.variant_index = {
+            tuple(variant): i for i, variant in enumerate(header['ride_variants'])
+        }
+
+    def lookup(self, source_lat, source_lng, dest_lat, dest_lng,
+               hour, day_of_week, month, ride_type, num_riders):
+        """Return the stored ML prediction, or None if the request is not covered."""
+        source = self.location_index.get(_snap(source_lat, source_lng))
+        if source is None:
+            return None
+        dest = self.location_index.get(_snap(dest_lat, dest_lng))
+        if dest is None:
+            return None
+        variant = self.variant_index.get((ride_type, num_riders))
+        if variant is None:
+            return None
+        return float(self.table[variant, month - 1, day_of_week * 24 + hour, source, dest])
+
+def load_od_table(model_dir, metadata):
+    """Load the OD table from model_dir, or return None if it is missing or stale."""
+    header_path = os.path.join(model_dir, 'od_table.json')
+    table_path = os.path.join(model_dir, 'od_table.npy')
+    if not (os.path.exists(header_path) and os.path.exists(table_path)):
+        return None
+    with open(header_path) as f:
+        header = json.load(f)
+    if header.get('model_timestamp') != metadata.get('timestamp'):
+        return None
+    table = np.load(table_path, mmap_mode='r')
+    if list(table.shape) != header['shape']:
+        return None
+    return ODTable(table, header)
+
+def is_stale(model_dir='models'):
+    """Check whether the OD table needs rebuilding for the current model metadata."""
+    model_dir = resolve_model_dir(model_dir)
+    with open(os.path.join(model_dir, 'model_metadata.json')) as f:
+        metadata = json.load(f)
+    return load_od_table(model_dir, metadata) is None
+
+def build_for_saved_model(model_dir='models'):
+    """Build the OD table for the model saved in model_dir (or its active version)."""
+    from feature_spec import load_feature_spec
+    model_dir = resolve_model_dir(model_dir)
+    model = joblib.load(os.path.join(model_dir, 'ride_time_estimator.joblib'))
+    spec = load_feature_spec(os.path.join(model_dir, 'feature_spec.joblib'))
+    with open(os.path.join(model_dir, 'model_metadata.json')) as f:
+        metadata = json.load(f)
+    return build_od_table(model, spec, metadata, output_dir=model_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the origin-destination ETA table')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the table is up to date')
+    args = parser.parse_args()
+
+    if args.force or is_stale(args.model_dir):
+        print("Building origin-destination ETA table...")
+        table_path = build_for_saved_model(args.model_dir)
+        print(f"OD table saved to {table_path}")
+    else:
+        print("OD table is up to date")
@@ -2,10 +2,15 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from datetime import datetime
+from feature_spec import FeatureSpec
+from column_store import ColumnAppender, is_column_store, load_columns, load_frame, save_columns
 
 def load_data(file_path):
-    """Load the ride data from CSV file"""
-    df = pd.read_csv(file_path)
+    """Load the ride data from a CSV file or a column store directory"""
+    if is_column_store(file_path):
+        df = load_frame(file_path)
+    else:
+        df = pd.read_csv(file_path)
     # Convert pickup_time to datetime if it's not already
     if not pd.api.types.is_datetime64_any_dtype(df['pickup_time']):
         df['pickup_time'] = pd.to_datetime(df['pickup_time'])
@@ -30,56 +35,56 @@ def encode_categorical_features(df):
     # Convert ride_type to binary
     df['is_shared'] = (df['ride_type'] == 'shared').astype(int)
     
-    # One-hot encode day of week
-    day_dummies = pd.get_dummies(df['day_of_week'], prefix='day')
-    df = pd.concat([df, day_dummies], axis=1)
-    
-    # One-hot encode hour (optional, can be commented out)
-    hour_dummies = pd.get_dummies(df['hour'], prefix='hour')
-    df = pd.concat([df, hour_dummies], axis=1)
-    
+    # Day of week and hour are one-hot encoded by the feature spec, which uses
+    # fixed category sets so every dataset produces the same columns
     return df
 
-def create_final_feature_set(df):
+def create_final_feature_set(df, spec=None):
     """Create the final feature set for model training"""
-    # Define feature columns
-    geographical_features = [
-        'source_lat', 'source_lng',
-        'dest_lat', 'dest_lng',
-        'distance_km'
-    ]
-    
-    time_features = [
-        'hour', 'day_of_week', 'month',
-        'is_weekend', 'is_rush_hour'
-    ]
-    
-    # Add one-hot encoded day and hour features
-    day_features = [col for col in df.columns if col.startswith('day_')]
-    hour_features = [col for col in df.columns if col.startswith('hour_')]
-    
-    ride_features = [
-        'is_shared',
-        'num_riders'
-    ]
-    
-    # Combine all features
-    feature_columns = (
-        geographical_features +
-        time_features +
-        day_features +
-        hour_features +
-        ride_features
+    # The feature spec defines the column layout shared with the serving API
+    spec = spec or FeatureSpec()
+    features = spec.transform(
+        df['source_lat'].to_numpy(), df['source_lng'].to_numpy(),
+        df['dest_lat'].to_numpy(), df['dest_lng'].to_numpy(),
+        df['distance_km'].to_numpy(),
+        df['hour'].to_numpy(), df['day_of_week'].to_numpy(), df['month'].to_numpy(),
+        df['is_shared'].to_numpy(), df['num_riders'].to_numpy()
     )
     
     # Create feature matrix and target variable
-    X = df[feature_columns]
+    X = pd.DataFrame(features, columns=spec.columns, index=df.index)
     y = df['duration_minutes']
     
     return X, y
 
+def save_processed_data(X_train, X_test, y_train, y_test, output_dir, spec, data_format='csv'):
+    """Save the train/test split as CSV files or as typed column stores"""
+    # Create output directory if it doesn't exist
+    import os
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Save feature names
+    pd.Series(X_train.columns).to_csv(f'{output_dir}/feature_names.csv', index=False)
+    
+    if data_format == 'npy':
+        # Compact per-column dtypes; training memory-maps these files
+        dtypes = spec.column_dtypes()
+        save_columns(X_train, f'{output_dir}/X_train', dtypes)
+        save_columns(X_test, f'{output_dir}/X_test', dtypes)
+        save_columns(y_train.to_frame(), f'{output_dir}/y_train', {y_train.name: np.float32})
+        save_columns(y_test.to_frame(), f'{output_dir}/y_test', {y_test.name: np.float32})
+        return
+    
+    # Save training data
+    X_train.to_csv(f'{output_dir}/X_train.csv', index=False)
+    y_train.to_csv(f'{output_dir}/y_train.csv', index=False)
+    
+    # Save testing data
+    X_test.to_csv(f'{output_dir}/X_test.csv', index=False)
+    y_test.to_csv(f'{output_dir}/y_test.csv', index=False)
+
 def preprocess_data(input_file='data/ride_data.csv', 
-                   output_dir='data/processed'):
+                   output_dir='data/processed', data_format='csv'):
     """Main preprocessing function"""
     # Load data
     print("Loading data...")
@@ -95,7 +100,8 @@ def preprocess_data(input_file='data/ride_data.csv',
     
     # Create final feature set
     print("Creating final feature set...")
-    X, y = create_final_feature_set(df)
+    spec = FeatureSpec()
+    X, y = create_final_feature_set(df, spec)
     
     # Split data into training and testing sets
     print("Splitting data into training and testing sets...")
@@ -105,20 +111,7 @@ def preprocess_data(input_file='data/ride_data.csv',
     
     # Save processed data
     print("Saving processed data...")
-    # Create output directory if it doesn't exist
-    import os
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Save feature names
-    pd.Series(X.columns).to_csv(f'{output_dir}/feature_names.csv', index=False)
-    
-    # Save training data
-    X_train.to_csv(f'{output_dir}/X_train.csv', index=False)
-    y_train.to_csv(f'{output_dir}/y_train.csv', index=False)
-    
-    # Save testing data
-    X_test.to_csv(f'{output_dir}/X_test.csv', index=False)
-    y_test.to_csv(f'{output_dir}/y_test.csv', index=False)
+    save_processed_data(X_train, X_test, y_train, y_test, output_dir, spec, data_format)
     
     print(f"Processed data saved to {output_dir}")
     print(f"Training set size: {len(X_train)} samples")
@@ -126,5 +119,133 @@ def preprocess_data(input_file='data/ride_data.csv',
     
     return X_train, X_test, y_train, y_test
 
+def iter_data_chunks(file_path, chunk_size):
+    """Yield the ride data from a CSV file or a column store in chunks of rows"""
+    if is_column_store(file_path):
+        columns = load_columns(file_path)
+        n_rows = len(next(iter(columns.values())))
+        for start in range(0, n_rows, chunk_size):
+            yield pd.DataFrame({name: values[start:start + chunk_size] for name, values in columns.items()})
+        return
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, parse_dates=['pickup_time']):
+        yield chunk
+
+def hash_split(row_ids, test_size=0.2, seed=42):
+    """Deterministically assign rows to the test set by hashing their row numbers"""
+    # splitmix64 finalizer over the seeded row number
+    offset = np.uint64(((seed + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+    z = np.asarray(row_ids, dtype=np.uint64) + offset
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z % np.uint64(10000) < np.uint64(int(test_size * 10000))
+
+class _SplitWriter:
+    """Appends train or test rows to CSV files or a typed column store"""
+    
+    def __init__(self, output_dir, split, spec, data_format):
+        self.data_format = data_format
+        if data_format == 'npy':
+            dtypes = spec.column_dtypes()
+            self.X = ColumnAppender(f'{output_dir}/X_{split}',
+                                    [{'name': column, 'dtype': dtypes[column]} for column in spec.columns])
+            self.y = ColumnAppender(f'{output_dir}/y_{split}', [{'name': 'duration_minutes', 'dtype': np.float32}])
+        else:
+            self.X = open(f'{output_dir}/X_{split}.csv', 'w', newline='')
+            self.y = open(f'{output_dir}/y_{split}.csv', 'w', newline='')
+        self.rows = 0
+        # A chunk can put no rows into a split, so the row count can't tell
+        # whether the CSV header has been written yet
+        self.header_written = False
+    
+    def append(self, X, y):
+        if self.data_format == 'npy':
+            self.X.append({column: X[column].to_numpy() for column in X.columns})
+            self.y.append({'duration_minutes': y.to_numpy()})
+        else:
+            X.to_csv(self.X, index=False, header=not self.header_written)
+            y.to_csv(self.y, index=False, header=not self.header_written)
+            self.header_written = True
+        self.rows += len(X)
+    
+    def close(self):
+        """Close the files and write the column store manifests"""
+        self.X.close()
+        self.y.close()
+    
+    def abort(self):
+        """Close the files after a failure without writing the column store manifests"""
+        if self.data_format == 'npy':
+            self.X.abort()
+            self.y.abort()
+        else:
+            self.close()
+
+def preprocess_data_streaming(input_file='data/ride_data.csv', output_dir='data/processed',
+                              data_format='csv', chunk_size=1000000, test_size=0.2, seed=42):
+    """
+    Preprocess ride data chunk by chunk with constant memory use
+    Args:
+        input_file: Ride data CSV file or column store directory
+        output_dir: Directory to write the processed data to
+        data_format: 'csv' or 'npy' output
+        chunk_size: Rows read and transformed at a time
+        test_size: Fraction of rows assigned to the test set
+        seed: Key of the row hash used for the train/test split
+    Returns:
+        (training rows, testing rows)
+    """
+    import os
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # The feature spec's one-hot groups have fixed category sets, so every
+    # chunk produces exactly the same columns
+    spec = FeatureSpec()
+    pd.Series(spec.columns).to_csv(f'{output_dir}/feature_names.csv', index=False)
+    
+    train = _SplitWriter(output_dir, 'train', spec, data_format)
+    test = _SplitWriter(output_dir, 'test', spec, data_format)
+    rows_seen = 0
+    try:
+        for chunk in iter_data_chunks(input_file, chunk_size):
+            chunk = chunk.reset_index(drop=True)
+            chunk = encode_categorical_features(extract_time_features(chunk))
+            X, y = create_final_feature_set(chunk, spec)
+            
+            # The split depends only on each row's position in the input, so
+            # it is the same for any chunk size
+            is_test = hash_split(np.arange(rows_seen, rows_seen + len(chunk)), test_size, seed)
+            train.append(X[~is_test], y[~is_test])
+            test.append(X[is_test], y[is_test])
+            rows_seen += len(chunk)
+            print(f"Processed {rows_seen} rows...")
+    except BaseException:
+        # A partial split must not get a manifest, or it would load as complete
+        train.abort()
+        test.abort()
+        raise
+    train.close()
+    test.close()
+    
+    print(f"Processed data saved to {output_dir}")
+    print(f"Training set size: {train.rows} samples")
+    print(f"Testing set size: {test.rows} samples")
+    return train.rows, test.rows
+
 if __name__ == "__main__":
-    preprocess_data() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Preprocess ride data for training')
+    parser.add_argument('--format', choices=['csv', 'npy'], default='csv',
+                        help='Read data/ride_data.csv and write CSV, or read data/ride_data/ and write column stores')
+    parser.add_argument('--input', help='Ride data CSV file or column store directory')
+    parser.add_argument('--stream', action='store_true',
+                        help='Process the input in chunks with constant memory and a hash-based split')
+    parser.add_argument('--chunk-size', type=int, default=1000000, help='Rows per chunk with --stream')
+    args = parser.parse_args()
+    
+    default_input = 'data/ride_data' if args.format == 'npy' else 'data/ride_data.csv'
+    if args.stream:
+        preprocess_data_streaming(args.input or default_input, data_format=args.format,
+                                  chunk_size=args.chunk_size)
+    else:
+        preprocess_data(args.input or default_input, data_format=args.format)
\ No newline at end of file
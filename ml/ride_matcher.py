@@ -0,0 +1,228 @@
+"""
+In-memory index of waiting shared rides for fast ride matching.
+
+Waiting rides are bucketed by destination grid cell and pickup time bucket.
+A match query only looks at the cells within max_distance_km of the
+requested destination and the buckets within the time window, so its cost
+depends on how many rides wait near that destination and time, not on the
+total number of waiting rides.
+
+Usage:
+    python ride_matcher.py --rides 100000     # benchmark insert/match/expire
+"""
+import argparse
+from datetime import datetime
+import heapq
+import math
+import threading
+import time
+
+from generate_ride_data import haversine_distance
+
+# Kilometers per degree of latitude, for the earth radius used by haversine_distance
+KM_PER_DEGREE = 6371 * math.pi / 180
+
+def to_timestamp(value):
+    """Convert epoch seconds, a datetime or an ISO 8601 string to epoch seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.timestamp()
+
+class RideMatcher:
+    """
+    Thread-safe spatio-temporal index of waiting shared rides.
+
+    A ride matches a request when its destination is within max_distance_km
+    and its pickup time within time_window_minutes of the request, and it
+    belongs to another user. The nearest destination wins; ties go to the
+    closest pickup time.
+    """
+
+    def __init__(self, max_distance_km=0.5, time_window_minutes=15, cell_km=None, reference_latitude=28.6):
+        self.max_distance_km = max_distance_km
+        self.window_seconds = time_window_minutes * 60
+        # Cells default to the match radius, so a query reads 3x3 cells per time bucket
+        cell_km = cell_km or max_distance_km
+        self.lat_step = cell_km / KM_PER_DEGREE
+        self.lng_step = self.lat_step / math.cos(math.radians(reference_latitude))
+        self._cells = {}
+        self._rides = {}
+        self._expiry = []
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.matches = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._rides)
+
+    def _key(self, latitude, longitude, timestamp):
+        return (
+            math.floor(latitude / self.lat_step),
+            math.floor(longitude / self.lng_step),
+            math.floor(timestamp / self.window_seconds)
+        )
+
+    def insert(self, ride_id, dest_lat, dest_lng, pickup_time, user_id=None):
+        """Add a waiting ride, replacing any ride with the same ID."""
+        timestamp = to_timestamp(pickup_time)
+        key = self._key(dest_lat, dest_lng, timestamp)
+        with self._lock:
+            self._remove(ride_id)
+            self._cells.setdefault(key, {})[ride_id] = (dest_lat, dest_lng, timestamp, user_id)
+            self._rides[ride_id] = key
+            heapq.heappush(self._expiry, (timestamp, ride_id))
+
+    def _remove(self, ride_id):
+        key = self._rides.pop(ride_id, None)
+        if key is None:
+            return False
+        cell = self._cells[key]
+        del cell[ride_id]
+        if not cell:
+            del self._cells[key]
+        return True
+
+    def remove(self, ride_id):
+        """Remove a ride that was matched, confirmed or cancelled; returns False if unknown."""
+        with self._lock:
+            return self._remove(ride_id)
+
+    def expire(self, now=None):
+        """
+        Remove rides that can no longer match because their pickup time has passed
+        Args:
+            now: Current time; defaults to the wall clock
+        Returns:
+            Number of rides removed
+        """
+        cutoff = to_timestamp(now if now is not None else time.time()) - self.window_seconds
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] < cutoff:
+                timestamp, ride_id = heapq.heappop(self._expiry)
+                # Entries of removed or re-inserted rides are skipped lazily
+                key = self._rides.get(ride_id)
+                if key is not None and self._cells[key][ride_id][2] == timestamp:
+                    self._remove(ride_id)
+                    removed += 1
+            # Drop stale heap entries once they dominate the heap
+            if len(self._expiry) > 2 * len(self._rides) + 1024:
+                self._expiry = [(entry[2], ride_id) for ride_id, key in self._rides.items()
+                                for entry in (self._cells[key][ride_id],)]
+                heapq.heapify(self._expiry)
+            self.expired += removed
+        return removed
+
+    def find_match(self, dest_lat, dest_lng, pickup_time, exclude_user=None):
+        """
+        Find the nearest compatible waiting ride
+        Args:
+            dest_lat, dest_lng: Destination of the new ride
+            pickup_time: Pickup time of the new ride
+            exclude_user: User requesting the match, whose own rides are skipped
+        Returns:
+            (ride_id, destination distance in km, pickup time difference in
+            seconds), or None if no ride is compatible
+        """
+        timestamp = to_timestamp(pickup_time)
+        cell_lat, cell_lng, _ = self._key(dest_lat, dest_lng, timestamp)
+        # Longitude cells get narrower away from the reference latitude
+        lat_reach = math.ceil(self.max_distance_km / (self.lat_step * KM_PER_DEGREE))
+        lng_km = self.lng_step * KM_PER_DEGREE * math.cos(math.radians(dest_lat))
+        # Near the poles the reach would grow without bound; it never needs more
+        # than the columns around the globe, and no ride lies outside them
+        lng_reach = min(math.ceil(self.max_distance_km / lng_km), math.ceil(360 / self.lng_step))
+        first_column = max(cell_lng - lng_reach, math.floor(-180 / self.lng_step))
+        last_column = min(cell_lng + lng_reach, math.floor(180 / self.lng_step))
+        first_bucket = math.floor((timestamp - self.window_seconds) / self.window_seconds)
+        last_bucket = math.floor((timestamp + self.window_seconds) / self.window_seconds)
+
+        # Candidates are compared by squared planar distance, which matches
+        # haversine closely at these scales; only the winner gets haversine
+        lng_scale = math.cos(math.radians(dest_lat))
+        max_sq = (self.max_distance_km / KM_PER_DEGREE) ** 2
+        best = None
+        best_key = (max_sq, self.window_seconds)
+        with self._lock:
+            self.queries += 1
+            for i in range(cell_lat - lat_reach, cell_lat + lat_reach + 1):
+                for j in range(first_column, last_column + 1):
+                    for bucket in range(first_bucket, last_bucket + 1):
+                        cell = self._cells.get((i, j, bucket))
+                        if cell is None:
+                            continue
+                        for ride_id, (lat, lng, ride_time, user_id) in cell.items():
+                            time_diff = abs(ride_time - timestamp)
+                            distance_sq = (lat - dest_lat) ** 2 + ((lng - dest_lng) * lng_scale) ** 2
+                            if (distance_sq, time_diff) <= best_key and time_diff <= self.window_seconds \
+                                    and (exclude_user is None or user_id != exclude_user):
+                                best, best_key = (ride_id, lat, lng), (distance_sq, time_diff)
+            if best is not None:
+                self.matches += 1
+        if best is None:
+            return None
+        ride_id, lat, lng = best
+        return ride_id, haversine_distance(dest_lat, dest_lng, lat, lng), best_key[1]
+
+    def stats(self):
+        """Return index counters for health reporting."""
+        with self._lock:
+            return {
+                'waiting': len(self._rides),
+                'cells': len(self._cells),
+                'max_distance_km': self.max_distance_km,
+                'time_window_minutes': self.window_seconds / 60,
+                'queries': self.queries,
+                'matches': self.matches,
+                'expired': self.expired
+            }
+
+def _percentile_us(timings, q):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * q / 100))] * 1e6
+
+def benchmark(num_rides=100000, num_queries=10000, hours=24, seed=42):
+    """Time insert, match and expire with rides drawn from generate_ride_data."""
+    import numpy as np
+    from generate_ride_data import generate_ride_data
+    df = generate_ride_data(num_samples=num_rides + num_queries, seed=seed)
+    # Spread destinations around the known locations and pickups over the time span
+    rng = np.random.default_rng(seed)
+    dest_lat = df['dest_lat'].to_numpy() + rng.normal(0, 0.01, len(df))
+    dest_lng = df['dest_lng'].to_numpy() + rng.normal(0, 0.01, len(df))
+    pickups = rng.uniform(0, hours * 3600, len(df))
+
+    matcher = RideMatcher()
+    started = time.perf_counter()
+    for i in range(num_rides):
+        matcher.insert(i, dest_lat[i], dest_lng[i], pickups[i], user_id=i)
+    insert_seconds = time.perf_counter() - started
+
+    timings = []
+    found = 0
+    for i in range(num_rides, num_rides + num_queries):
+        started = time.perf_counter()
+        match = matcher.find_match(dest_lat[i], dest_lng[i], pickups[i], exclude_user=i)
+        timings.append(time.perf_counter() - started)
+        found += match is not None
+
+    started = time.perf_counter()
+    expired = matcher.expire(hours * 3600 / 2)
+    expire_seconds = time.perf_counter() - started
+
+    print(f"Waiting rides: {num_rides} over {hours}h")
+    print(f"insert: {insert_seconds / num_rides * 1e6:.2f} us/ride")
+    print(f"find_match: p50 {_percentile_us(timings, 50):.1f} us, p99 {_percentile_us(timings, 99):.1f} us, "
+          f"{found / num_queries:.0%} matched")
+    print(f"expire: {expired} rides in {expire_seconds * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the waiting ride index')
+    parser.add_argument('--rides', type=int, default=100000, help='Waiting rides in the index')
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--hours', type=float, default=24, help='Time span of pickup times')
+    args = parser.parse_args()
+    benchmark(args.rides, args.queries, args.hours)
@@ -0,0 +1,452 @@
+"""
+Batch pooling of shared ride requests into vehicles.
+
+Requests are grouped so that the total vehicle time plus rider detour time
+is as small as possible, subject to:
+    - the riders in a vehicle fit its capacity
+    - pooled requests have pickup times within time_window_minutes of each other
+    - no rider's in-vehicle time exceeds their direct time by more than
+      max_detour_ratio
+    - a vehicle picks up all its riders before the first drop-off
+
+Routes follow the riders' pickup times. A vehicle reaches its first pickup
+at that rider's pickup time and waits at each later pickup until the rider
+is due; the waiting counts as vehicle minutes. A rider's in-vehicle time is
+measured from their own pickup time, so a rider picked up late has the delay
+counted as detour.
+
+Each request is first paired only with its nearest compatible neighbours
+(sources and destinations both close), and only requests that are pairwise
+neighbours can share a vehicle. The travel times of every leg those pairs can
+use are predicted by the trained model in one vectorized call. Vehicles are
+then built by merging groups in order of decreasing savings, with cheapest
+insertion of stops into the route. A local search follows, moving single
+requests between vehicles. The time budget covers the whole call, including
+loading the model: merging stops at the budget, and the local search only
+runs while time is left.
+
+Usage:
+    python ride_pooling.py --requests 2000 --time-budget 5.0
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from ride_matcher import to_timestamp
+
+# Legs shorter than this are treated as the same stop
+SAME_STOP_KM = 0.05
+
+# Legs between the stops of a candidate pair (i, j) that a pickups-first route
+# can use, as indexes into (pickup i, drop-off i, pickup j, drop-off j)
+PAIR_LEGS = [(0, 2), (2, 0), (0, 3), (2, 1), (1, 3), (3, 1)]
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Vectorized haversine distance in kilometers."""
+    lat1, lng1, lat2, lng2 = map(np.radians, [lat1, lng1, lat2, lng2])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 6371 * 2 * np.arcsin(np.sqrt(a))
+
+def model_eta(pickup_time, model_dir='models', ride_type='private'):
+    """
+    Build a vectorized travel time function from the trained model
+    Args:
+        pickup_time: Time used for the time-of-day features of every leg
+        model_dir: Model registry directory
+        ride_type: Ride type used for the legs; vehicle legs are driven like private rides
+    Returns:
+        Function (source_lat, source_lng, dest_lat, dest_lng arrays) -> minutes
+    """
+    import joblib
+    from datetime import datetime
+    from feature_spec import load_feature_spec
+    from model_registry import resolve_model_dir, read_manifest
+    from tree_ensemble import load_tree_ensemble
+
+    model_dir = resolve_model_dir(model_dir)
+    spec = load_feature_spec(os.path.join(model_dir, 'feature_spec.joblib'))
+    # The native tree evaluator is much faster on large batches when available
+    model = load_tree_ensemble(model_dir, read_manifest(model_dir), mmap_mode='r')
+    if model is None:
+        model = joblib.load(os.path.join(model_dir, 'ride_time_estimator.joblib'))
+    when = datetime.fromtimestamp(to_timestamp(pickup_time))
+
+    def eta(source_lat, source_lng, dest_lat, dest_lng):
+        distance = haversine_km(source_lat, source_lng, dest_lat, dest_lng)
+        n = len(distance)
+        features = spec.transform(
+            source_lat, source_lng, dest_lat, dest_lng, distance,
+            np.full(n, when.hour), np.full(n, when.weekday()), when.month,
+            ride_type == 'shared', 1
+        )
+        minutes = np.asarray(model.predict(features), dtype=np.float64)
+        return np.where(distance < SAME_STOP_KM, 0.0, np.maximum(minutes, 0.0))
+
+    return eta
+
+def candidate_pairs(source, dest, pickup, riders, capacity, time_window, neighbors, chunk_size=512):
+    """
+    Find each request's nearest compatible requests
+    Args:
+        source, dest: (n, 2) arrays of latitude/longitude
+        pickup: Pickup times in seconds
+        riders: Riders per request
+        capacity: Vehicle capacity in riders
+        time_window: Largest pickup time difference in seconds
+        neighbors: Neighbours kept per request
+        chunk_size: Requests compared per step, bounding memory to chunk_size x n
+    Returns:
+        (m, 2) array of distinct pairs (i, j) with i < j
+    """
+    n = len(pickup)
+    found = []
+    for start in range(0, n, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, n))
+        # Pair distance is how far apart both the pickups and the drop-offs are
+        score = (haversine_km(source[rows, None, 0], source[rows, None, 1], source[None, :, 0], source[None, :, 1]) +
+                 haversine_km(dest[rows, None, 0], dest[rows, None, 1], dest[None, :, 0], dest[None, :, 1]))
+        compatible = ((np.abs(pickup[rows, None] - pickup[None, :]) <= time_window) &
+                      (riders[rows, None] + riders[None, :] <= capacity))
+        compatible[np.arange(len(rows)), rows] = False
+        score[~compatible] = np.inf
+        k = min(neighbors, n - 1)
+        if k <= 0:
+            break
+        nearest = np.argpartition(score, k - 1, axis=1)[:, :k]
+        keep = np.isfinite(np.take_along_axis(score, nearest, axis=1))
+        row_index = np.broadcast_to(rows[:, None], nearest.shape)[keep]
+        found.append(np.stack([np.minimum(row_index, nearest[keep]), np.maximum(row_index, nearest[keep])], axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.intp)
+    return np.unique(np.concatenate(found), axis=0)
+
+class PoolingPlan:
+    """
+    Vehicles built from a batch of requests.
+
+    Stops are numbered 2*i for the pickup and 2*i + 1 for the drop-off of
+    request i. A vehicle's route is a list of stops, all pickups first, and
+    its cost is route time plus detour_weight times the riders' total detour.
+    ready holds each request's pickup time in minutes.
+    """
+
+    def __init__(self, direct, ready, legs, riders, pairs, capacity, max_detour_ratio, detour_weight):
+        self.direct = direct
+        self.ready = ready
+        self.legs = legs
+        self.riders = riders
+        self.pairs = pairs
+        self.capacity = capacity
+        self.allowed_detour = direct * max_detour_ratio
+        self.detour_weight = detour_weight
+        self.vehicle_of = list(range(len(direct)))
+        self.routes = {i: [2 * i, 2 * i + 1] for i in range(len(direct))}
+        self.costs = {i: float(direct[i]) for i in range(len(direct))}
+        self.loads = {i: int(riders[i]) for i in range(len(direct))}
+
+    def evaluate(self, route):
+        """Return (cost, route minutes, detour minutes) of a route, or None if a rider's detour is too long."""
+        detour = 0.0
+        previous = route[0]
+        start = clock = self.ready[previous // 2]
+        for stop in route[1:]:
+            request = stop // 2
+            if stop % 2 == 0:
+                # The vehicle waits for riders who aren't due yet
+                clock = max(clock + self.legs[previous, stop], self.ready[request])
+            else:
+                clock += self.legs[previous, stop]
+                extra = clock - self.ready[request] - self.direct[request]
+                if extra > self.allowed_detour[request] + 1e-9:
+                    return None
+                detour += max(extra, 0.0)
+            previous = stop
+        elapsed = float(clock - start)
+        return elapsed + self.detour_weight * detour, elapsed, detour
+
+    def members(self, vehicle):
+        return [stop // 2 for stop in self.routes[vehicle] if stop % 2 == 0]
+
+    def compatible(self, request, members):
+        """Requests can share a vehicle only if they are pairwise candidates (their legs are known)."""
+        return all((min(request, other), max(request, other)) in self.pairs for other in members)
+
+    def best_insertion(self, route, request):
+        """Cheapest feasible route with request's pickup and drop-off inserted, as (cost, route) or None."""
+        best = None
+        pickup, dropoff = 2 * request, 2 * request + 1
+        pickups = len(route) // 2
+        for i in range(pickups + 1):
+            for j in range(pickups + 1, len(route) + 2):
+                candidate = route[:i] + [pickup] + route[i:]
+                candidate = candidate[:j] + [dropoff] + candidate[j:]
+                result = self.evaluate(candidate)
+                if result is not None and (best is None or result[0] < best[0]):
+                    best = (result[0], candidate)
+        return best
+
+    def merge_route(self, vehicle, other):
+        """Insert all of other's requests into vehicle's route; returns (cost, route) or None."""
+        route = self.routes[vehicle]
+        cost = None
+        for request in self.members(other):
+            insertion = self.best_insertion(route, request)
+            if insertion is None:
+                return None
+            cost, route = insertion
+        return cost, route
+
+    def assign(self, vehicle, route, cost):
+        self.routes[vehicle] = route
+        self.costs[vehicle] = cost
+        self.loads[vehicle] = sum(int(self.riders[request]) for request in self.members(vehicle))
+        for request in self.members(vehicle):
+            self.vehicle_of[request] = vehicle
+
+    def drop(self, vehicle):
+        del self.routes[vehicle], self.costs[vehicle], self.loads[vehicle]
+
+    def total_cost(self):
+        return sum(self.costs.values())
+
+def _pair_savings(plan, pairs, pair_legs):
+    """
+    Savings of pooling each candidate pair on its own, for all pairs at once
+    Args:
+        plan: PoolingPlan with every request in its own vehicle
+        pairs: (m, 2) array of candidate pairs (i, j)
+        pair_legs: (m, 6) leg minutes, columns as in PAIR_LEGS
+    Returns:
+        List of (saving, i, j) with positive savings, best first
+    """
+    i, j = pairs[:, 0], pairs[:, 1]
+    direct_i, direct_j = plan.direct[i], plan.direct[j]
+    ready_i, ready_j = plan.ready[i], plan.ready[j]
+    si_sj, sj_si, si_dj, sj_di, di_dj, dj_di = pair_legs.T
+    # Second pickup times, as in PoolingPlan.evaluate
+    at_sj = np.maximum(ready_i + si_sj, ready_j)
+    at_si = np.maximum(ready_j + sj_si, ready_i)
+    # The four routes that pick both riders up first, as (route minutes, ride i,
+    # ride j) given the time of each drop-off
+    routes = []
+    for start, at_di, at_dj in [
+        (ready_i, at_sj + sj_di, at_sj + sj_di + di_dj),
+        (ready_i, at_sj + direct_j + dj_di, at_sj + direct_j),
+        (ready_j, at_si + direct_i, at_si + direct_i + di_dj),
+        (ready_j, at_si + si_dj + dj_di, at_si + si_dj)
+    ]:
+        routes.append((np.maximum(at_di, at_dj) - start, at_di - ready_i, at_dj - ready_j))
+    best = np.full(len(pairs), np.inf)
+    for minutes, ride_i, ride_j in routes:
+        detour_i, detour_j = ride_i - direct_i, ride_j - direct_j
+        feasible = ((detour_i <= plan.allowed_detour[i] + 1e-9) & (detour_j <= plan.allowed_detour[j] + 1e-9))
+        cost = minutes + plan.detour_weight * (np.maximum(detour_i, 0) + np.maximum(detour_j, 0))
+        best = np.where(feasible, np.minimum(best, cost), best)
+    saving = direct_i + direct_j - best
+    order = np.argsort(-saving, kind='stable')
+    order = order[saving[order] > 0]
+    return list(zip(saving[order].tolist(), i[order].tolist(), j[order].tolist()))
+
+def _merge_by_savings(plan, savings, deadline):
+    """Merge the vehicles of candidate pairs, best savings first, while it lowers the cost or until time runs out."""
+    for _, i, j in savings:
+        if time.perf_counter() > deadline:
+            break
+        a, b = plan.vehicle_of[i], plan.vehicle_of[j]
+        if a == b or plan.loads[a] + plan.loads[b] > plan.capacity:
+            continue
+        if not all(plan.compatible(request, plan.members(a)) for request in plan.members(b)):
+            continue
+        # Insert the smaller group's requests into the larger group's route
+        if len(plan.routes[a]) < len(plan.routes[b]):
+            a, b = b, a
+        merged = plan.merge_route(a, b)
+        if merged is not None and merged[0] < plan.costs[a] + plan.costs[b] - 1e-9:
+            plan.drop(b)
+            plan.assign(a, merged[1], merged[0])
+
+def _relocate(plan, neighbours, deadline, seed):
+    """Move single requests to the vehicle where they cost least until no move helps or time runs out."""
+    rng = random.Random(seed)
+    requests = list(range(len(plan.direct)))
+    moves = 0
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        rng.shuffle(requests)
+        for request in requests:
+            if time.perf_counter() > deadline:
+                break
+            source = plan.vehicle_of[request]
+            if len(plan.routes[source]) == 2:
+                remaining = None
+                base = 0.0
+            else:
+                remaining = [stop for stop in plan.routes[source] if stop // 2 != request]
+                result = plan.evaluate(remaining)
+                if result is None:
+                    continue
+                base = result[0]
+            # Cost of the request on its own; the alternative to every move
+            best = (base + float(plan.direct[request]), None, None)
+            for target in {plan.vehicle_of[other] for other in neighbours[request]} - {source}:
+                if plan.loads[target] + int(plan.riders[request]) > plan.capacity:
+                    continue
+                if not plan.compatible(request, plan.members(target)):
+                    continue
+                insertion = plan.best_insertion(plan.routes[target], request)
+                if insertion is None:
+                    continue
+                total = base + insertion[0] - plan.costs[target]
+                if total < best[0]:
+                    best = (total, target, insertion)
+            if best[0] >= plan.costs[source] - 1e-6:
+                continue
+            _, target, insertion = best
+            if remaining is None:
+                plan.drop(source)
+            else:
+                plan.assign(source, remaining, base)
+            if target is None:
+                vehicle = max(plan.routes) + 1
+                plan.assign(vehicle, [2 * request, 2 * request + 1], float(plan.direct[request]))
+            else:
+                plan.assign(target, insertion[1], insertion[0])
+            moves += 1
+            improved = True
+    return moves
+
+def pool_requests(requests, eta=None, capacity=4, time_window_minutes=15, max_detour_ratio=0.5,
+                  detour_weight=1.0, neighbors=10, time_budget=5.0, seed=42):
+    """
+    Group shared ride requests into vehicles
+    Args:
+        requests: List of dicts in the /predict request format (source,
+            destination, pickupTime, numberOfRiders)
+        eta: Vectorized travel time function (see model_eta); defaults to the
+            saved model at the batch's median pickup time
+        capacity: Riders per vehicle
+        time_window_minutes: Largest pickup time difference within a vehicle
+        max_detour_ratio: Largest extra in-vehicle time as a fraction of the direct time
+        detour_weight: Weight of rider detour minutes against vehicle minutes
+        neighbors: Candidate partners considered per request
+        time_budget: Seconds allowed for the whole call, including loading the
+            model; merging and the local search stop when it runs out
+        seed: Seed for the local search order
+    Returns:
+        (vehicles, summary); each vehicle is a dict with its request indices,
+        stops as (request index, 'pickup' | 'dropoff'), riders, and route and
+        detour minutes
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget
+    n = len(requests)
+    source = np.array([[r['source']['latitude'], r['source']['longitude']] for r in requests], dtype=float).reshape(-1, 2)
+    dest = np.array([[r['destination']['latitude'], r['destination']['longitude']] for r in requests], dtype=float).reshape(-1, 2)
+    pickup = np.array([to_timestamp(r['pickupTime']) for r in requests], dtype=float)
+    riders = np.array([r.get('numberOfRiders', 1) for r in requests], dtype=int)
+    if eta is None:
+        eta = model_eta(float(np.median(pickup)) if n else time.time())
+
+    pairs = candidate_pairs(source, dest, pickup, riders, capacity, time_window_minutes * 60, neighbors)
+    neighbours = [[] for _ in range(n)]
+    for i, j in pairs.tolist():
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+
+    # Every leg a route can use: the direct rides, then the PAIR_LEGS of each
+    # candidate pair. No two pairs share a leg, so nothing is predicted twice.
+    stops = np.concatenate([source, dest], axis=1).reshape(-1, 2)
+    pair_stops = 2 * pairs[:, [0, 0, 1, 1]] + [0, 1, 0, 1]
+    leg_index = np.concatenate([
+        np.stack([2 * np.arange(n), 2 * np.arange(n) + 1], axis=1),
+        np.stack([pair_stops[:, [a for a, _ in PAIR_LEGS]], pair_stops[:, [b for _, b in PAIR_LEGS]]], axis=2).reshape(-1, 2)
+    ]).astype(np.intp)
+    minutes = eta(stops[leg_index[:, 0], 0], stops[leg_index[:, 0], 1],
+                  stops[leg_index[:, 1], 0], stops[leg_index[:, 1], 1]) if len(leg_index) else np.array([])
+    legs = dict(zip(map(tuple, leg_index.tolist()), minutes.tolist()))
+    direct = np.asarray(minutes[:n], dtype=float)
+    eta_seconds = time.perf_counter() - started
+
+    ready = (pickup - pickup.min()) / 60 if n else pickup
+    plan = PoolingPlan(direct, ready, legs, riders, set(map(tuple, pairs.tolist())), capacity,
+                       max_detour_ratio, detour_weight)
+    _merge_by_savings(plan, _pair_savings(plan, pairs, minutes[n:].reshape(-1, len(PAIR_LEGS))), deadline)
+    greedy_cost = plan.total_cost()
+    moves = _relocate(plan, neighbours, deadline, seed)
+
+    vehicles = []
+    total_route = total_detour = 0.0
+    for vehicle, route in plan.routes.items():
+        _, route_minutes, detour_minutes = plan.evaluate(route)
+        total_route += route_minutes
+        total_detour += detour_minutes
+        vehicles.append({
+            'requests': plan.members(vehicle),
+            'stops': [(stop // 2, 'pickup' if stop % 2 == 0 else 'dropoff') for stop in route],
+            'riders': plan.loads[vehicle],
+            'route_minutes': route_minutes,
+            'detour_minutes': detour_minutes
+        })
+    summary = {
+        'requests': n,
+        'riders': int(riders.sum()),
+        'vehicles': len(vehicles),
+        'riders_per_vehicle': float(riders.sum()) / max(len(vehicles), 1),
+        'vehicle_minutes': total_route,
+        'unpooled_vehicle_minutes': float(direct.sum()),
+        'detour_minutes': total_detour,
+        'cost': plan.total_cost(),
+        'greedy_cost': greedy_cost,
+        'local_search_moves': moves,
+        'candidate_pairs': len(pairs),
+        'legs': len(legs),
+        'eta_seconds': eta_seconds,
+        'seconds': time.perf_counter() - started
+    }
+    return vehicles, summary
+
+def generate_requests(num_requests, window_minutes=30, seed=42):
+    """Build a batch of shared requests from generate_ride_data rides, all due within window_minutes."""
+    from generate_ride_data import generate_ride_data
+    rng = np.random.default_rng(seed)
+    df = generate_ride_data(num_samples=num_requests, seed=seed)
+    start = to_timestamp(df['pickup_time'].iloc[0].replace(hour=8, minute=0, second=0).to_pydatetime())
+    # Jitter the known locations so riders don't all share exact coordinates
+    jitter = rng.normal(0, 0.005, (num_requests, 4))
+    offsets = rng.uniform(0, window_minutes * 60, num_requests)
+    return [
+        {
+            'source': {'latitude': float(row.source_lat + jitter[i, 0]), 'longitude': float(row.source_lng + jitter[i, 1])},
+            'destination': {'latitude': float(row.dest_lat + jitter[i, 2]), 'longitude': float(row.dest_lng + jitter[i, 3])},
+            'pickupTime': float(start + offsets[i]),
+            'numberOfRiders': int(rng.integers(1, 3))
+        }
+        for i, row in enumerate(df.itertuples())
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pool a batch of generated shared ride requests')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--capacity', type=int, default=4)
+    parser.add_argument('--time-budget', type=float, default=5.0, help='Seconds for the whole optimization')
+    parser.add_argument('--max-detour', type=float, default=0.5, help='Largest detour as a fraction of the direct time')
+    parser.add_argument('--neighbors', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    batch = generate_requests(args.requests, seed=args.seed)
+    vehicles, summary = pool_requests(batch, capacity=args.capacity, max_detour_ratio=args.max_detour,
+                                      neighbors=args.neighbors, time_budget=args.time_budget, seed=args.seed)
+    print(f"Requests: {summary['requests']} ({summary['riders']} riders)")
+    print(f"Vehicles: {summary['vehicles']} ({summary['riders_per_vehicle']:.2f} riders per vehicle)")
+    print(f"Vehicle minutes: {summary['vehicle_minutes']:.0f} pooled vs "
+          f"{summary['unpooled_vehicle_minutes']:.0f} unpooled")
+    print(f"Rider detour: {summary['detour_minutes']:.0f} minutes in total")
+    print(f"Cost: {summary['greedy_cost']:.0f} after greedy merging, {summary['cost']:.0f} after "
+          f"{summary['local_search_moves']} local search moves")
+    print(f"Time: {summary['seconds'] * 1000:.0f} ms ({summary['eta_seconds'] * 1000:.0f} ms for "
+          f"{summary['legs']} leg ETAs over {summary['candidate_pairs']} candidate pairs)")
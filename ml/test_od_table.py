@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_spec import FeatureSpec
+from generate_ride_data import haversine_distance
+from od_table import build_od_table, load_od_table
+
+LOCATIONS = {
+    'Jaypee Institute': {'lat': 28.5244, 'lng': 77.3656},
+    'IIT Delhi': {'lat': 28.5456, 'lng': 77.1924},
+    'Connaught Place': {'lat': 28.6315, 'lng': 77.2167}
+}
+
+METADATA = {'model_name': 'Formula', 'timestamp': '2024-01-01T00:00:00'}
+
+class FormulaModel:
+    """Model whose prediction is a known function of the named feature columns."""
+
+    def predict(self, X):
+        assert isinstance(X, pd.DataFrame)
+        return (3 * X['distance_km'] + X['hour'] + X['day_of_week'] / 10 + X['month'] / 100 +
+                5 * X['is_shared'] + X['num_riders']).to_numpy()
+
+def expected_minutes(source, dest, hour, day_of_week, month, is_shared, num_riders):
+    distance = haversine_distance(source['lat'], source['lng'], dest['lat'], dest['lng'])
+    return 3 * distance + hour + day_of_week / 10 + month / 100 + 5 * is_shared + num_riders
+
+@pytest.fixture
+def od_table(tmp_path):
+    build_od_table(FormulaModel(), FeatureSpec(), METADATA, output_dir=str(tmp_path), locations=LOCATIONS)
+    return load_od_table(str(tmp_path), METADATA)
+
+def test_table_is_memory_mapped(od_table):
+    assert isinstance(od_table.table, np.memmap)
+    assert od_table.table.dtype == np.float32
+
+@pytest.mark.parametrize('source, dest, hour, day_of_week, month, ride_type, num_riders', [
+    ('Jaypee Institute', 'IIT Delhi', 9, 2, 3, 'private', 1),
+    ('IIT Delhi', 'Connaught Place', 23, 6, 12, 'shared', 4),
+    ('Connaught Place', 'Jaypee Institute', 0, 0, 1, 'shared', 2),
+    ('IIT Delhi', 'IIT Delhi', 17, 4, 7, 'private', 1)
+])
+def test_hit_returns_model_prediction(od_table, source, dest, hour, day_of_week, month, ride_type, num_riders):
+    source, dest = LOCATIONS[source], LOCATIONS[dest]
+    minutes = od_table.lookup(source['lat'], source['lng'], dest['lat'], dest['lng'],
+                              hour, day_of_week, month, ride_type, num_riders)
+    expected = expected_minutes(source, dest, hour, day_of_week, month, ride_type == 'shared', num_riders)
+    assert minutes == pytest.approx(expected, rel=1e-5)
+
+def test_nearby_coordinates_snap_to_known_locations(od_table):
+    source, dest = LOCATIONS['Jaypee Institute'], LOCATIONS['IIT Delhi']
+    exact = od_table.lookup(source['lat'], source['lng'], dest['lat'], dest['lng'], 9, 2, 3, 'private', 1)
+    nearby = od_table.lookup(source['lat'] + 0.00004, source['lng'] - 0.00004, dest['lat'], dest['lng'],
+                             9, 2, 3, 'private', 1)
+    assert nearby == exact
+
+def test_miss_returns_none(od_table):
+    source, dest = LOCATIONS['Jaypee Institute'], LOCATIONS['IIT Delhi']
+    # Unknown source or destination
+    assert od_table.lookup(28.6, 77.3, dest['lat'], dest['lng'], 9, 2, 3, 'private', 1) is None
+    assert od_table.lookup(source['lat'], source['lng'], source['lat'] + 0.001, source['lng'],
+                           9, 2, 3, 'private', 1) is None
+    # Ride variants the table doesn't store
+    assert od_table.lookup(source['lat'], source['lng'], dest['lat'], dest['lng'], 9, 2, 3, 'private', 2) is None
+    assert od_table.lookup(source['lat'], source['lng'], dest['lat'], dest['lng'], 9, 2, 3, 'shared', 5) is None
+
+def test_table_for_another_model_is_not_loaded(tmp_path, od_table):
+    assert load_od_table(str(tmp_path), {**METADATA, 'timestamp': '2024-02-01T00:00:00'}) is None
+    assert load_od_table(str(tmp_path / 'missing'), METADATA) is None
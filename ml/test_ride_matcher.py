@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+import pytest
+
+from generate_ride_data import haversine_distance
+from ride_matcher import RideMatcher
+
+@pytest.mark.parametrize('latitude', [90.0, -90.0, 89.9999, -89.99, 85.0, 70.0])
+def test_find_match_near_poles_returns(latitude):
+    """The longitude reach is capped, so polar queries scan at most the columns around the globe."""
+    matcher = RideMatcher()
+    toward_equator = -0.001 if latitude > 0 else 0.001
+    matcher.insert('near', latitude + toward_equator, 10.0, 1000.0)
+    matcher.insert('far', 0.0, 10.0, 1000.0)
+    started = time.perf_counter()
+    match = matcher.find_match(latitude, 10.0, 1000.0)
+    assert time.perf_counter() - started < 5
+    assert match is not None and match[0] == 'near'
+
+def test_find_match_across_the_pole():
+    """At the pole every longitude is close, so a ride on the far side is still found."""
+    matcher = RideMatcher()
+    matcher.insert('across', 89.999, -170.0, 1000.0)
+    match = matcher.find_match(90.0, 10.0, 1000.0)
+    assert match is not None and match[0] == 'across'
+    assert match[1] < matcher.max_distance_km
+
+def test_insert_replace_and_remove():
+    matcher = RideMatcher()
+    matcher.insert('a', 28.5456, 77.1924, 1000.0)
+    matcher.insert('a', 28.6315, 77.2167, 1000.0)
+    assert len(matcher) == 1
+    assert matcher.find_match(28.5456, 77.1924, 1000.0) is None
+    assert matcher.find_match(28.6315, 77.2167, 1000.0)[0] == 'a'
+    assert matcher.remove('a') and not matcher.remove('a')
+    assert len(matcher) == 0 and matcher.stats()['cells'] == 0
+
+def test_exclude_user_skips_own_rides():
+    matcher = RideMatcher()
+    matcher.insert('own', 28.5456, 77.1924, 1000.0, user_id='alice')
+    matcher.insert('other', 28.5470, 77.1924, 1000.0, user_id='bob')
+    assert matcher.find_match(28.5456, 77.1924, 1000.0)[0] == 'own'
+    assert matcher.find_match(28.5456, 77.1924, 1000.0, exclude_user='alice')[0] == 'other'
+    assert matcher.find_match(28.5456, 77.1924, 1000.0, exclude_user='bob')[0] == 'own'
+    matcher.remove('other')
+    assert matcher.find_match(28.5456, 77.1924, 1000.0, exclude_user='alice') is None
+
+@pytest.mark.parametrize('offset_seconds, matches', [(0, True), (899, True), (900, True), (901, False),
+                                                     (-900, True), (-901, False), (3600, False)])
+def test_time_window_boundary(offset_seconds, matches):
+    matcher = RideMatcher(time_window_minutes=15)
+    matcher.insert('a', 28.5456, 77.1924, 90000.0)
+    match = matcher.find_match(28.5456, 77.1924, 90000.0 + offset_seconds)
+    assert (match is not None) == matches
+    if matches:
+        assert match[2] == abs(offset_seconds)
+
+def test_expire_removes_rides_past_the_window():
+    matcher = RideMatcher(time_window_minutes=15)
+    for i, pickup in enumerate([0.0, 1000.0, 2000.0, 3000.0]):
+        matcher.insert(i, 28.5456, 77.1924, pickup)
+    # Re-inserting moves ride 0 later, so its old heap entry must not expire it
+    matcher.insert(0, 28.5456, 77.1924, 5000.0)
+    assert matcher.expire(now=2900.0) == 1
+    assert len(matcher) == 3
+    assert matcher.find_match(28.5456, 77.1924, 1000.0) is None
+    assert matcher.expire(now=2900.0) == 0
+    assert matcher.expire(now=100000.0) == 3
+    assert matcher.stats()['expired'] == 4
+
+def test_nearest_ride_matches_brute_force():
+    """find_match picks the ride a full haversine scan picks, within the planar approximation."""
+    rng = np.random.default_rng(3)
+    matcher = RideMatcher(max_distance_km=0.5, time_window_minutes=15)
+    n_rides = 3000
+    lat = 28.55 + rng.normal(0, 0.01, n_rides)
+    lng = 77.20 + rng.normal(0, 0.01, n_rides)
+    pickup = rng.uniform(0, 4 * 3600, n_rides)
+    users = rng.integers(0, 50, n_rides)
+    for i in range(n_rides):
+        matcher.insert(i, lat[i], lng[i], pickup[i], user_id=int(users[i]))
+
+    found = 0
+    for _ in range(300):
+        query_lat, query_lng = 28.55 + rng.normal(0, 0.01), 77.20 + rng.normal(0, 0.01)
+        query_time, user = rng.uniform(0, 4 * 3600), int(rng.integers(0, 50))
+        distances = np.array([haversine_distance(query_lat, query_lng, lat[i], lng[i]) for i in range(n_rides)])
+        eligible = (np.abs(pickup - query_time) <= matcher.window_seconds) & (users != user)
+        best = distances[eligible].min() if eligible.any() else np.inf
+
+        match = matcher.find_match(query_lat, query_lng, query_time, exclude_user=user)
+        if best < matcher.max_distance_km - 0.005:
+            assert match is not None
+        if match is None:
+            continue
+        found += 1
+        ride_id, distance, time_diff = match
+        assert eligible[ride_id]
+        assert distance == pytest.approx(distances[ride_id])
+        assert distance <= best + 1e-3
+        assert distance <= matcher.max_distance_km + 0.005
+        assert time_diff == pytest.approx(abs(pickup[ride_id] - query_time))
+    assert found > 100
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from ride_matcher import to_timestamp
+from ride_pooling import PAIR_LEGS, PoolingPlan, _pair_savings, candidate_pairs, generate_requests, pool_requests
+
+CAPACITY = 4
+MAX_DETOUR_RATIO = 0.5
+
+def straight_line_eta(source_lat, source_lng, dest_lat, dest_lng):
+    """Deterministic stand-in for the model: 2.5 minutes per km as the crow flies."""
+    lat1, lng1, lat2, lng2 = map(np.radians, [source_lat, source_lng, dest_lat, dest_lng])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2.5 * 6371 * 2 * np.arcsin(np.sqrt(a))
+
+@pytest.fixture(scope='module')
+def batch():
+    return generate_requests(300, seed=7)
+
+def _arrays(requests):
+    source = np.array([[r['source']['latitude'], r['source']['longitude']] for r in requests])
+    dest = np.array([[r['destination']['latitude'], r['destination']['longitude']] for r in requests])
+    pickup = np.array([to_timestamp(r['pickupTime']) for r in requests])
+    riders = np.array([r['numberOfRiders'] for r in requests])
+    return source, dest, pickup, riders
+
+def _leg(stops, a, b):
+    return float(straight_line_eta(*stops[a], *stops[b]))
+
+def test_pair_savings_match_route_evaluation(batch):
+    """The vectorized savings equal the best pickups-first route PoolingPlan.evaluate finds for each pair."""
+    source, dest, pickup, riders = _arrays(batch)
+    pairs = candidate_pairs(source, dest, pickup, riders, CAPACITY, 15 * 60, 10)
+    stops = np.concatenate([source, dest], axis=1).reshape(-1, 2)
+    n = len(batch)
+    direct = np.array([_leg(stops, 2 * i, 2 * i + 1) for i in range(n)])
+    legs = {(2 * i, 2 * i + 1): direct[i] for i in range(n)}
+    pair_legs = []
+    for i, j in pairs.tolist():
+        pair_stops = [2 * i, 2 * i + 1, 2 * j, 2 * j + 1]
+        for a, b in PAIR_LEGS:
+            legs[pair_stops[a], pair_stops[b]] = _leg(stops, pair_stops[a], pair_stops[b])
+        pair_legs.append([legs[pair_stops[a], pair_stops[b]] for a, b in PAIR_LEGS])
+    ready = (pickup - pickup.min()) / 60
+    plan = PoolingPlan(direct, ready, legs, riders, set(map(tuple, pairs.tolist())), CAPACITY,
+                       MAX_DETOUR_RATIO, 1.0)
+
+    savings = {(i, j): saving for saving, i, j in _pair_savings(plan, pairs, np.array(pair_legs))}
+    assert savings
+    for i, j in pairs.tolist():
+        pi, di, pj, dj = 2 * i, 2 * i + 1, 2 * j, 2 * j + 1
+        costs = [result[0] for result in map(plan.evaluate, [[pi, pj, di, dj], [pi, pj, dj, di],
+                                                             [pj, pi, di, dj], [pj, pi, dj, di]])
+                 if result is not None]
+        expected = direct[i] + direct[j] - min(costs) if costs else None
+        if expected is not None and expected > 0:
+            assert savings[i, j] == pytest.approx(expected, abs=1e-9)
+        else:
+            assert (i, j) not in savings
+
+@pytest.mark.parametrize('time_budget', [5.0, 0.0])
+def test_vehicles_respect_capacity_and_detour(batch, time_budget):
+    """Every request is served once, and no route breaks capacity, pickup order, time window or detour limits."""
+    vehicles, summary = pool_requests(batch, eta=straight_line_eta, capacity=CAPACITY,
+                                      max_detour_ratio=MAX_DETOUR_RATIO, time_budget=time_budget)
+    source, dest, pickup, riders = _arrays(batch)
+    stops = np.concatenate([source, dest], axis=1).reshape(-1, 2)
+    served = sorted(request for vehicle in vehicles for request in vehicle['requests'])
+    assert served == list(range(len(batch)))
+    assert summary['vehicles'] == len(vehicles)
+    assert summary['vehicle_minutes'] <= summary['unpooled_vehicle_minutes'] + 1e-6
+
+    for vehicle in vehicles:
+        members = vehicle['requests']
+        assert vehicle['riders'] == sum(riders[members]) <= CAPACITY
+        assert np.ptp(pickup[members]) <= 15 * 60
+        kinds = [kind for _, kind in vehicle['stops']]
+        assert kinds == ['pickup'] * len(members) + ['dropoff'] * len(members)
+
+        # Replay the route: the vehicle waits for riders who aren't due yet
+        clock = pickup[vehicle['stops'][0][0]]
+        previous = 2 * vehicle['stops'][0][0]
+        for request, kind in vehicle['stops'][1:]:
+            stop = 2 * request + (kind == 'dropoff')
+            clock += 60 * _leg(stops, previous, stop)
+            if kind == 'pickup':
+                clock = max(clock, pickup[request])
+            else:
+                ride_minutes = (clock - pickup[request]) / 60
+                direct = _leg(stops, 2 * request, 2 * request + 1)
+                assert ride_minutes <= direct * (1 + MAX_DETOUR_RATIO) + 1e-6
+            previous = stop
+        if len(members) > 1:
+            assert (clock - pickup[vehicle['stops'][0][0]]) / 60 == pytest.approx(vehicle['route_minutes'])
+
+    if time_budget > 0:
+        assert summary['vehicles'] < len(batch)
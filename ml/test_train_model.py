@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from train_model import REPORT_ORDER, cross_validate_models, train_models
+
+def _mixed_frame(n_rows=200, seed=0):
+    """Features like the processed CSVs: one-hot bool columns next to int and float ones."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'distance': rng.uniform(1, 30, n_rows),
+        'hour': rng.integers(0, 24, n_rows),
+        'is_shared': rng.random(n_rows) < 0.5,
+        'location_a': rng.random(n_rows) < 0.3
+    })
+    y = pd.Series(3 * X['distance'] + 5 * X['is_shared'] + rng.normal(0, 1, n_rows))
+    return X, y
+
+def test_parallel_training_on_mixed_dtypes():
+    """Bool and numeric columns are shared with worker processes as a memory-mappable array."""
+    X, y = _mixed_frame()
+    models = train_models(X, y, cores=2)
+    assert list(models) == REPORT_ORDER
+    for model in models.values():
+        assert np.isfinite(model.predict(X.head(5))).all()
+
+    cv_rmse = cross_validate_models(models, X, y, cv=3, cores=2)
+    assert set(cv_rmse) == set(REPORT_ORDER)
+    assert all(np.isfinite(rmse) for rmse in cv_rmse.values())
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from xgboost import XGBRegressor
+
+from tree_ensemble import export_for_serving, load_tree_ensemble, prune_ensemble
+
+# Largest prediction difference check_parity accepts at export
+TOLERANCE = 1e-3
+
+MODELS = {
+    'random_forest': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'gradient_boosting': lambda: GradientBoostingRegressor(n_estimators=30, max_depth=4, random_state=0),
+    'xgboost': lambda: XGBRegressor(n_estimators=30, max_depth=4, random_state=0, n_jobs=1)
+}
+
+def _ride_like_data(n_rows=500, seed=0):
+    """Continuous distances and coordinates, small integers and one-hot flags, like the feature spec."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        'distance': rng.uniform(0.5, 40, n_rows),
+        'source_lat': rng.uniform(28.4, 28.8, n_rows),
+        'hour': rng.integers(0, 24, n_rows).astype(float),
+        'is_shared': (rng.random(n_rows) < 0.5).astype(float)
+    })
+    y = 2.5 * X['distance'] + 10 * np.sin(X['hour'] / 4) + 4 * X['is_shared'] + rng.normal(0, 1, n_rows)
+    return X, y.to_numpy()
+
+@pytest.mark.parametrize('name', sorted(MODELS))
+def test_exported_ensemble_matches_model(name, tmp_path):
+    """The flattened ensemble predicts like the original model, before and after a no-op prune."""
+    X, y = _ride_like_data()
+    model = MODELS[name]().fit(X, y)
+    metadata = {'timestamp': '2024-01-01T00:00:00'}
+    assert export_for_serving(model, X, metadata, model_dir=str(tmp_path)) is not None
+
+    ensemble = load_tree_ensemble(str(tmp_path), metadata, mmap_mode='r')
+    X_new, _ = _ride_like_data(seed=1)
+    expected = model.predict(X_new)
+    np.testing.assert_allclose(ensemble.predict(X_new.to_numpy()), expected, rtol=0, atol=TOLERANCE)
+
+    # Default arguments keep every tree at full depth
+    pruned = prune_ensemble(ensemble)
+    assert (pruned.n_trees, pruned.max_depth) == (ensemble.n_trees, ensemble.max_depth)
+    np.testing.assert_allclose(pruned.predict(X_new.to_numpy()), expected, rtol=0, atol=TOLERANCE)
+
+def test_stale_export_is_ignored(tmp_path):
+    """An export made for another model version isn't loaded."""
+    X, y = _ride_like_data(n_rows=100)
+    model = MODELS['random_forest']().fit(X, y)
+    export_for_serving(model, X, {'timestamp': 'old'}, model_dir=str(tmp_path))
+    assert load_tree_ensemble(str(tmp_path), {'timestamp': 'new'}) is None
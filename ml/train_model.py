@@ -1,28 +1,73 @@
 import pandas as pd
 import numpy as np
+import matplotlib
+# Plots are only saved to files, so use the headless backend (also in workers)
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.linear_model import LinearRegression, Ridge
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import KFold
+from sklearn.base import clone
 import joblib
+from joblib import Parallel, delayed
 import os
 import json
+import tempfile
+from feature_spec import FeatureSpec
+from column_store import load_columns, load_matrix
+from model_registry import publish_version, stage_version
+from od_table import build_for_saved_model as build_od_table
+from tree_ensemble import artifact_report, export_for_serving, print_artifact_report
 
-def load_processed_data(data_dir='data/processed'):
+def processed_data_format(data_dir='data/processed'):
+    """Return 'npy' or 'csv', whichever format of processed data was written last"""
+    store_manifest = f'{data_dir}/X_train/columns.json'
+    csv_path = f'{data_dir}/X_train.csv'
+    if not os.path.exists(store_manifest):
+        return 'csv'
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(store_manifest):
+        return 'csv'
+    return 'npy'
+
+def load_processed_data(data_dir='data/processed', data_format=None):
     """Load the preprocessed training and testing data"""
+    feature_names = pd.read_csv(f'{data_dir}/feature_names.csv').squeeze().tolist()
+    if (data_format or processed_data_format(data_dir)) == 'npy':
+        # Memory-map the typed columns and gather them into float32 matrices,
+        # which the tree models use without another conversion
+        X_train = pd.DataFrame(load_matrix(f'{data_dir}/X_train', columns=feature_names)[0], columns=feature_names)
+        X_test = pd.DataFrame(load_matrix(f'{data_dir}/X_test', columns=feature_names)[0], columns=feature_names)
+        y_train = pd.DataFrame(load_columns(f'{data_dir}/y_train')).squeeze()
+        y_test = pd.DataFrame(load_columns(f'{data_dir}/y_test')).squeeze()
+        return X_train, X_test, y_train, y_test, feature_names
+    
     X_train = pd.read_csv(f'{data_dir}/X_train.csv')
     X_test = pd.read_csv(f'{data_dir}/X_test.csv')
     y_train = pd.read_csv(f'{data_dir}/y_train.csv').squeeze()
     y_test = pd.read_csv(f'{data_dir}/y_test.csv').squeeze()
-    feature_names = pd.read_csv(f'{data_dir}/feature_names.csv').squeeze().tolist()
     return X_train, X_test, y_train, y_test, feature_names
 
-def train_models(X_train, y_train):
-    """Train multiple regression models"""
-    models = {
+# Candidate models, listed most expensive first so the pool starts them early
+MODEL_NAMES = ['Random Forest', 'XGBoost', 'Gradient Boosting', 'Ridge Regression', 'Linear Regression']
+
+# Order in which models are trained and reported
+REPORT_ORDER = ['Linear Regression', 'Ridge Regression', 'Random Forest', 'Gradient Boosting', 'XGBoost']
+
+def get_core_budget(cores=None):
+    """Number of cores training may use: cores, TRAIN_CORES or all cores"""
+    return cores or int(os.environ.get('TRAIN_CORES', 0)) or os.cpu_count() or 1
+
+def plan_parallelism(n_tasks, cores):
+    """Split a core budget into concurrent worker processes and threads per worker"""
+    workers = max(1, min(n_tasks, cores))
+    return workers, max(1, cores // workers)
+
+def build_models(threads=1):
+    """Create the candidate models; threads is the estimator-level n_jobs"""
+    return {
         'Linear Regression': LinearRegression(),
         'Ridge Regression': Ridge(alpha=1.0),
         'Random Forest': RandomForestRegressor(
@@ -30,7 +75,8 @@ def train_models(X_train, y_train):
             max_depth=20,
             min_samples_split=5,
             min_samples_leaf=2,
-            random_state=42
+            random_state=42,
+            n_jobs=threads
         ),
         'Gradient Boosting': GradientBoostingRegressor(
             n_estimators=100,
@@ -42,42 +88,143 @@ def train_models(X_train, y_train):
             n_estimators=100,
             learning_rate=0.1,
             max_depth=5,
-            random_state=42
+            random_state=42,
+            n_jobs=threads
         )
     }
+
+def share_data(directory, X, y):
+    """Save X and y as .npy files that worker processes memory-map instead of unpickling"""
+    X_path = os.path.join(directory, 'X.npy')
+    y_path = os.path.join(directory, 'y.npy')
+    # Numeric float64 arrays; a frame mixing bool and numeric columns would
+    # otherwise be saved as an object array, which can't be memory-mapped
+    np.save(X_path, np.ascontiguousarray(X.to_numpy(dtype=np.float64)))
+    np.save(y_path, np.asarray(y, dtype=np.float64))
+    return X_path, y_path, list(X.columns)
+
+def _load_shared(X_path, y_path, columns):
+    X = pd.DataFrame(np.load(X_path, mmap_mode='r'), columns=columns, copy=False)
+    y = np.load(y_path, mmap_mode='r')
+    return X, y
+
+def _fit_model(name, model, X_path, y_path, columns):
+    """Fit one model on the shared training data in a worker process"""
+    X, y = _load_shared(X_path, y_path, columns)
+    model.fit(X, y)
+    return name, model
+
+def _score_fold(model, X_path, y_path, columns, train_index, test_index):
+    """Fit a clone of model on one cross-validation fold and return its test MSE"""
+    X, y = _load_shared(X_path, y_path, columns)
+    fold_model = clone(model).fit(X.iloc[train_index], y[train_index])
+    return mean_squared_error(y[test_index], fold_model.predict(X.iloc[test_index]))
+
+def _reset_threads(model):
+    # Saved models predict single-threaded, as before; serving calls predict
+    # on one row at a time
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=None)
+    return model
+
+def train_models(X_train, y_train, cores=None):
+    """Train multiple regression models, in parallel within the core budget"""
+    cores = get_core_budget(cores)
+    workers, threads = plan_parallelism(len(MODEL_NAMES), cores)
+    models = build_models(threads)
     
     trained_models = {}
-    for name, model in models.items():
-        print(f"Training {name}...")
-        model.fit(X_train, y_train)
-        trained_models[name] = model
+    if workers == 1:
+        for name in REPORT_ORDER:
+            print(f"Training {name}...")
+            trained_models[name] = models[name].fit(X_train, y_train)
+    else:
+        print(f"Training {len(models)} models in {workers} processes with {threads} threads each...")
+        with tempfile.TemporaryDirectory() as shared_dir:
+            X_path, y_path, columns = share_data(shared_dir, X_train, y_train)
+            results = Parallel(n_jobs=workers)(
+                delayed(_fit_model)(name, models[name], X_path, y_path, columns) for name in MODEL_NAMES
+            )
+        fitted = dict(results)
+        trained_models = {name: fitted[name] for name in REPORT_ORDER}
+    
+    return {name: _reset_threads(model) for name, model in trained_models.items()}
+
+def cross_validate_models(models, X, y, cv=5, cores=None):
+    """
+    Cross-validated RMSE for every model, with all (model, fold) fits run in parallel
+    Args:
+        models: Dict of model name to estimator; clones are fitted per fold
+        X, y: Data to cross-validate on
+        cv: Number of folds (unshuffled KFold, like cross_val_score)
+        cores: Core budget; defaults to get_core_budget()
+    Returns:
+        Dict of model name to CV RMSE
+    """
+    folds = list(KFold(n_splits=cv).split(X))
+    tasks = [(name, fold) for name in models for fold in range(cv)]
+    workers, threads = plan_parallelism(len(tasks), get_core_budget(cores))
+    
+    with tempfile.TemporaryDirectory() as shared_dir:
+        X_path, y_path, columns = share_data(shared_dir, X, y)
+        fold_models = {}
+        for name, model in models.items():
+            fold_models[name] = clone(model)
+            if 'n_jobs' in model.get_params():
+                fold_models[name].set_params(n_jobs=threads)
+        scores = Parallel(n_jobs=workers)(
+            delayed(_score_fold)(fold_models[name], X_path, y_path, columns, *folds[fold])
+            for name, fold in tasks
+        )
     
-    return trained_models
+    mse = {}
+    for (name, _), score in zip(tasks, scores):
+        mse.setdefault(name, []).append(score)
+    return {name: np.sqrt(np.mean(values)) for name, values in mse.items()}
 
-def evaluate_models(models, X_test, y_test):
-    """Evaluate multiple models and return metrics"""
+def predict_all(models, X_test):
+    """Predict the test set once per model; all metrics and plots use these predictions"""
+    return {name: np.asarray(model.predict(X_test)) for name, model in models.items()}
+
+def evaluate_models(models, X_test, y_test, cores=None, predictions=None, cv=5, X_train=None, y_train=None):
+    """
+    Evaluate multiple models and return metrics
+    Args:
+        models: Dict of model name to fitted model
+        X_test, y_test: Test data
+        cores: Core budget for cross-validation
+        predictions: Cached test set predictions from predict_all
+        cv: Number of cross-validation folds; 0 skips cross-validation
+        X_train, y_train: Training data, required for cross-validation. CV_RMSE
+            estimates the error of refitting each model on the training split;
+            the test set stays held out for MAE, RMSE and R2
+    Returns:
+        Dict of model name to metrics
+    """
+    predictions = predictions if predictions is not None else predict_all(models, X_test)
     metrics = {}
-    for name, model in models.items():
-        y_pred = model.predict(X_test)
+    for name in models:
+        y_pred = predictions[name]
         
-        model_metrics = {
+        metrics[name] = {
             'MAE': mean_absolute_error(y_test, y_pred),
             'RMSE': np.sqrt(mean_squared_error(y_test, y_pred)),
             'R2': r2_score(y_test, y_pred)
         }
-        
-        # Calculate cross-validation scores
-        cv_scores = cross_val_score(model, X_test, y_test, cv=5, scoring='neg_mean_squared_error')
-        model_metrics['CV_RMSE'] = np.sqrt(-cv_scores.mean())
-        
-        metrics[name] = model_metrics
+    
+    # Calculate cross-validation scores
+    if cv:
+        if X_train is None or y_train is None:
+            raise ValueError("Cross-validation needs the training data; pass X_train and y_train or cv=0")
+        cv_rmse = cross_validate_models(models, X_train, y_train, cv=cv, cores=cores)
+        for name in models:
+            metrics[name]['CV_RMSE'] = cv_rmse[name]
     
     return metrics
 
-def plot_feature_importance(model, feature_names, model_name):
+def plot_feature_importance(importances, feature_names, model_name):
     """Plot feature importance for tree-based models"""
-    if hasattr(model, 'feature_importances_'):
-        importances = model.feature_importances_
+    if importances is not None:
         indices = np.argsort(importances)[::-1]
         
         plt.figure(figsize=(12, 6))
@@ -114,15 +261,39 @@ def plot_predicted_vs_actual(y_test, y_pred, model_name):
     plt.savefig(f'models/predicted_vs_actual_{model_name.lower().replace(" ", "_")}.png')
     plt.close()
 
-def save_best_model(models, metrics):
-    """Save the best performing model based on RMSE"""
+def _render_plots(name, y_test, y_pred, importances, feature_names):
+    plot_residuals(y_test, y_pred, name)
+    plot_predicted_vs_actual(y_test, y_pred, name)
+    plot_feature_importance(importances, feature_names, name)
+    return name
+
+def render_plots(models, predictions, y_test, feature_names, cores=None):
+    """Render every model's plots in parallel worker processes from cached predictions"""
+    y_test = np.asarray(y_test)
+    workers, _ = plan_parallelism(len(models), get_core_budget(cores))
+    # Only importances and predictions go to the workers, not the fitted models;
+    # joblib memory-maps the large prediction arrays
+    Parallel(n_jobs=workers)(
+        delayed(_render_plots)(
+            name, y_test, predictions[name], getattr(model, 'feature_importances_', None), feature_names
+        )
+        for name, model in models.items()
+    )
+
+def save_best_model(models, metrics, feature_names, output_dir='models'):
+    """Save the best performing model and its feature spec based on RMSE"""
     best_model_name = min(metrics.items(), key=lambda x: x[1]['RMSE'])[0]
     best_model = models[best_model_name]
     
-    os.makedirs('models', exist_ok=True)
-    model_path = f'models/ride_time_estimator.joblib'
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = f'{output_dir}/ride_time_estimator.joblib'
     joblib.dump(best_model, model_path)
     
+    # Save the compiled feature spec next to the model so serving builds
+    # exactly the columns the model was trained on
+    spec_columns = getattr(best_model, 'feature_names_in_', feature_names)
+    joblib.dump(FeatureSpec(spec_columns), f'{output_dir}/feature_spec.joblib')
+    
     # Save model metadata
     metadata = {
         'model_name': best_model_name,
@@ -130,21 +301,22 @@ def save_best_model(models, metrics):
         'timestamp': pd.Timestamp.now().isoformat()
     }
     
-    with open('models/model_metadata.json', 'w') as f:
+    with open(f'{output_dir}/model_metadata.json', 'w') as f:
         json.dump(metadata, f, indent=4)
     
     return model_path, best_model_name
 
-def train_and_evaluate():
+def train_and_evaluate(cores=None, plots=True, cv=5, prune_tolerance=0.0):
     """Main function to train and evaluate multiple models"""
     print("Loading processed data...")
     X_train, X_test, y_train, y_test, feature_names = load_processed_data()
     
     print("Training models...")
-    models = train_models(X_train, y_train)
+    models = train_models(X_train, y_train, cores)
     
     print("Evaluating models...")
-    metrics = evaluate_models(models, X_test, y_test)
+    predictions = predict_all(models, X_test)
+    metrics = evaluate_models(models, X_test, y_test, cores, predictions, cv, X_train, y_train)
     
     print("\nModel Performance Metrics:")
     for model_name, model_metrics in metrics.items():
@@ -153,19 +325,46 @@ def train_and_evaluate():
             print(f"{metric}: {value:.2f}")
     
     # Create visualizations
-    print("\nCreating visualizations...")
-    for name, model in models.items():
-        y_pred = model.predict(X_test)
-        plot_residuals(y_test, y_pred, name)
-        plot_predicted_vs_actual(y_test, y_pred, name)
-        plot_feature_importance(model, feature_names, name)
-    
-    # Save best model
+    if plots:
+        print("\nCreating visualizations...")
+        render_plots(models, predictions, y_test, feature_names, cores)
+    
+    # Save best model into a staging directory of the model registry; the
+    # running API only sees it once every artifact is written and published
     print("\nSaving best model...")
-    model_path, best_model_name = save_best_model(models, metrics)
-    print(f"Best model ({best_model_name}) saved to {model_path}")
+    version, staging_dir = stage_version('models')
+    model_path, best_model_name = save_best_model(models, metrics, feature_names, staging_dir)
+    
+    # Export the compact tree ensemble for the API's native evaluator;
+    # this fails if its predictions drift from the model on the test set
+    with open(f'{staging_dir}/model_metadata.json') as f:
+        metadata = json.load(f)
+    ensemble_path = export_for_serving(models[best_model_name], X_test, metadata, staging_dir,
+                                       y_test, prune_tolerance)
+    if ensemble_path is not None:
+        print("Tree ensemble exported")
+    
+    # Build the OD table so it matches the new model metadata
+    print("\nBuilding origin-destination ETA table...")
+    build_od_table(staging_dir)
+    
+    version_dir = publish_version('models', version, staging_dir)
+    print(f"Best model ({best_model_name}) published as version {version} in {version_dir}")
+    
+    if ensemble_path is not None:
+        print("\nServing artifacts (loaded as the API loads them):")
+        print_artifact_report(artifact_report(version_dir, X_test, y_test))
     
     return models, metrics
 
 if __name__ == "__main__":
-    train_and_evaluate() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Train and evaluate ride time models')
+    parser.add_argument('--cores', type=int, help='Core budget for training (default: TRAIN_CORES or all cores)')
+    parser.add_argument('--no-plots', action='store_true', help='Skip rendering evaluation plots')
+    parser.add_argument('--cv', type=int, default=5, help='Cross-validation folds (0 to skip)')
+    parser.add_argument('--prune-tolerance', type=float, default=0.0,
+                        help='Allowed relative test MAE increase from pruning the exported tree ensemble')
+    args = parser.parse_args()
+    
+    train_and_evaluate(args.cores, plots=not args.no_plots, cv=args.cv, prune_tolerance=args.prune_tolerance) 
\ No newline at end of file
@@ -0,0 +1,404 @@
+import numpy as np
+import joblib
+import json
+import os
+import time
+import argparse
+
+def _float32_floor(values):
+    """Round thresholds down to float32 so 'x <= t' is unchanged for float32 inputs."""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded.astype(np.float64)
+
+class TreeEnsemble:
+    """
+    Tree ensemble flattened into contiguous node arrays.
+
+    All trees share one set of node arrays. Leaves point to themselves, so
+    every row walks every tree for max_depth steps with no per-tree Python
+    dispatch. Internal nodes send a row left when x[feature] <= threshold,
+    with inputs compared as float32 like the original estimators. Every node
+    stores the value its subtree would predict as a leaf, so trees can be
+    cut to a smaller depth. Node arrays are stored as int32/float32.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 base_score, scale, max_depth, n_features, model_name=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_score = float(base_score)
+        self.scale = float(scale)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.model_name = model_name
+        self.model_timestamp = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.left,
+                                              self.right, self.value, self.roots))
+
+    def predict(self, X):
+        """Predict targets for a 2-D feature matrix."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0]) * X.shape[1])[:, None]
+        # Node ids stay intp so the int32 arrays are indexed without conversion
+        nodes = np.repeat(self.roots[None, :].astype(np.intp), X.shape[0], axis=0)
+        for _ in range(self.max_depth):
+            go_left = flat.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            np.copyto(nodes, np.where(go_left, self.left.take(nodes), self.right.take(nodes)))
+        return self.base_score + self.scale * self.value.take(nodes).sum(axis=1, dtype=np.float64)
+
+def _tree_depth(left_children, right_children):
+    """Depth of a tree given child index arrays with -1 marking leaves."""
+    depth = 0
+    level = [0]
+    while True:
+        level = [child for node in level for child in (left_children[node], right_children[node]) if child != -1]
+        if not level:
+            return depth
+        depth += 1
+
+class _TreeBuilder:
+    """Accumulates flattened trees into shared node arrays."""
+
+    def __init__(self):
+        self.feature = []
+        self.threshold = []
+        self.left = []
+        self.right = []
+        self.value = []
+        self.roots = []
+        self.max_depth = 0
+
+    def add_sklearn_tree(self, tree):
+        """Append a fitted sklearn Tree (estimator.tree_)."""
+        offset = len(self.feature)
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count) + offset
+        self.feature.extend(np.where(is_leaf, 0, tree.feature))
+        self.threshold.extend(np.where(is_leaf, 0.0, _float32_floor(tree.threshold)))
+        self.left.extend(np.where(is_leaf, node_ids, tree.children_left + offset))
+        self.right.extend(np.where(is_leaf, node_ids, tree.children_right + offset))
+        self.value.extend(tree.value[:, 0, 0])
+        self.roots.append(offset)
+        self.max_depth = max(self.max_depth, tree.max_depth)
+
+    def add_xgboost_tree(self, tree, learning_rate):
+        """Append one tree from an XGBoost JSON model."""
+        offset = len(self.feature)
+        left_children = np.array(tree['left_children'])
+        right_children = np.array(tree['right_children'])
+        split_conditions = np.array(tree['split_conditions'], dtype=np.float32)
+        is_leaf = left_children == -1
+        node_ids = np.arange(len(left_children)) + offset
+
+        # XGBoost goes left when x < split; for float32 inputs that is
+        # x <= the next float32 below the split. Leaves keep their value in
+        # split_conditions; internal nodes only have an unscaled base weight.
+        thresholds = np.nextafter(split_conditions, np.float32(-np.inf)).astype(np.float64)
+        internal_values = np.array(tree['base_weights'], dtype=np.float64) * learning_rate
+        self.feature.extend(np.where(is_leaf, 0, tree['split_indices']))
+        self.threshold.extend(np.where(is_leaf, 0.0, thresholds))
+        self.left.extend(np.where(is_leaf, node_ids, left_children + offset))
+        self.right.extend(np.where(is_leaf, node_ids, right_children + offset))
+        self.value.extend(np.where(is_leaf, split_conditions.astype(np.float64), internal_values))
+        self.roots.append(offset)
+        self.max_depth = max(self.max_depth, _tree_depth(left_children, right_children))
+
+    def build(self, base_score, scale, n_features, model_name):
+        return TreeEnsemble(
+            self.feature, self.threshold, self.left, self.right, self.value, self.roots,
+            base_score, scale, self.max_depth, n_features, model_name
+        )
+
+def export_tree_ensemble(model):
+    """
+    Flatten a fitted tree ensemble into a TreeEnsemble
+    Args:
+        model: Fitted RandomForestRegressor, GradientBoostingRegressor or XGBRegressor
+    Returns:
+        TreeEnsemble, or None if the model is not a supported tree ensemble
+    """
+    model_type = type(model).__name__
+    builder = _TreeBuilder()
+
+    if model_type == 'RandomForestRegressor':
+        for estimator in model.estimators_:
+            builder.add_sklearn_tree(estimator.tree_)
+        return builder.build(0.0, 1.0 / len(model.estimators_), model.n_features_in_, model_type)
+
+    if model_type == 'GradientBoostingRegressor':
+        for estimator in model.estimators_[:, 0]:
+            builder.add_sklearn_tree(estimator.tree_)
+        if model.init_ == 'zero':
+            base_score = 0.0
+        else:
+            base_score = model.init_.predict(np.zeros((1, model.n_features_in_)))[0]
+        return builder.build(base_score, model.learning_rate, model.n_features_in_, model_type)
+
+    if model_type == 'XGBRegressor':
+        model_json = json.loads(model.get_booster().save_raw(raw_format='json'))
+        config = json.loads(model.get_booster().save_config())
+        learning_rate = float(config['learner']['gradient_booster']['tree_train_param']['eta'])
+        learner = model_json['learner']
+        for tree in learner['gradient_booster']['model']['trees']:
+            builder.add_xgboost_tree(tree, learning_rate)
+        base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+        return builder.build(base_score, 1.0, model.n_features_in_, model_type)
+
+    return None
+
+def check_parity(model, ensemble, X, tolerance=1e-3):
+    """
+    Compare TreeEnsemble predictions against the original model
+    Returns:
+        Maximum absolute difference between the two predictions
+    Raises:
+        ValueError: If the difference exceeds tolerance
+    """
+    expected = model.predict(X)
+    actual = ensemble.predict(np.asarray(X))
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        raise ValueError(f"Tree ensemble does not match {type(model).__name__}: max difference {max_diff}")
+    return max_diff
+
+def _node_depths(ensemble):
+    """Depth of every node below its tree's root."""
+    depth = np.zeros(ensemble.n_nodes, dtype=np.int32)
+    level = ensemble.roots
+    for d in range(1, ensemble.max_depth + 1):
+        level = level[ensemble.left[level] != level]
+        level = np.concatenate([ensemble.left[level], ensemble.right[level]])
+        depth[level] = d
+    return depth
+
+def prune_ensemble(ensemble, n_trees=None, max_depth=None):
+    """
+    Return a smaller copy of ensemble
+    Args:
+        ensemble: TreeEnsemble to prune
+        n_trees: Keep only the first n_trees trees (boosting stages or forest trees)
+        max_depth: Turn nodes at this depth into leaves predicting their subtree value
+    Returns:
+        Pruned TreeEnsemble; the original is not modified
+    """
+    n_trees = ensemble.n_trees if n_trees is None else min(n_trees, ensemble.n_trees)
+    max_depth = ensemble.max_depth if max_depth is None else min(max_depth, ensemble.max_depth)
+    n_nodes = ensemble.roots[n_trees] if n_trees < ensemble.n_trees else ensemble.n_nodes
+
+    # Keep the nodes of the first n_trees trees down to max_depth and renumber them
+    depth = _node_depths(ensemble)[:n_nodes]
+    kept = np.flatnonzero(depth <= max_depth)
+    new_index = np.cumsum(depth <= max_depth) - 1
+    is_leaf = (ensemble.left[kept] == kept) | (depth[kept] == max_depth)
+    left = np.where(is_leaf, kept, ensemble.left[kept])
+    right = np.where(is_leaf, kept, ensemble.right[kept])
+
+    # A forest averages its trees, boosting stages are summed
+    scale = 1.0 / n_trees if ensemble.model_name == 'RandomForestRegressor' else ensemble.scale
+    pruned = TreeEnsemble(
+        np.where(is_leaf, 0, ensemble.feature[kept]), np.where(is_leaf, 0.0, ensemble.threshold[kept]),
+        new_index[left], new_index[right], ensemble.value[kept], new_index[ensemble.roots[:n_trees]],
+        ensemble.base_score, scale, depth[kept].max(), ensemble.n_features, ensemble.model_name
+    )
+    pruned.model_timestamp = ensemble.model_timestamp
+    return pruned
+
+def _mae(ensemble, X, y):
+    return float(np.mean(np.abs(ensemble.predict(X) - y)))
+
+def prune_within_tolerance(ensemble, X, y, tolerance):
+    """
+    Drop trees, then depth, while MAE on X stays within tolerance of the full ensemble
+    Args:
+        ensemble: TreeEnsemble to prune
+        X, y: Evaluation set, normally the test set
+        tolerance: Allowed relative MAE increase (0.01 = 1%)
+    Returns:
+        (pruned ensemble, full MAE, pruned MAE)
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    full_mae = _mae(ensemble, X, y)
+    limit = full_mae * (1 + tolerance)
+
+    # Fewest trees first, in steps of a tenth of the ensemble
+    pruned = ensemble
+    for n_trees in sorted({max(1, round(ensemble.n_trees * step / 10)) for step in range(1, 10)}):
+        candidate = prune_ensemble(ensemble, n_trees=n_trees)
+        if _mae(candidate, X, y) <= limit:
+            pruned = candidate
+            break
+
+    # Then the shallowest depth that still fits with those trees
+    for depth in range(1, pruned.max_depth):
+        candidate = prune_ensemble(pruned, max_depth=depth)
+        if _mae(candidate, X, y) <= limit:
+            pruned = candidate
+            break
+    return pruned, full_mae, _mae(pruned, X, y)
+
+def export_for_serving(model, X_check, metadata, model_dir='models', y_check=None, prune_tolerance=0.0):
+    """
+    Export the serving model's trees and verify them against X_check
+    Args:
+        model: Fitted model being published
+        X_check: Feature rows the export must reproduce the model's predictions on
+        metadata: Contents of model_metadata.json for the model
+        model_dir: Directory to write ride_time_estimator_trees.joblib to
+        y_check: Targets for X_check, required for pruning
+        prune_tolerance: Allowed relative MAE increase on X_check from dropping
+            trees and depth; 0 exports the full ensemble
+    Returns:
+        Path of the saved ensemble, or None if the model has no tree export
+    """
+    ensemble_path = os.path.join(model_dir, 'ride_time_estimator_trees.joblib')
+    ensemble = export_tree_ensemble(model)
+    if ensemble is None:
+        # Don't leave an export of a previous model behind
+        if os.path.exists(ensemble_path):
+            os.remove(ensemble_path)
+        return None
+
+    check_parity(model, ensemble, X_check)
+    if prune_tolerance > 0 and y_check is not None:
+        full_size = (ensemble.n_trees, ensemble.max_depth)
+        ensemble, full_mae, pruned_mae = prune_within_tolerance(ensemble, X_check, y_check, prune_tolerance)
+        print(f"Pruned tree ensemble from {full_size[0]} trees of depth {full_size[1]} to "
+              f"{ensemble.n_trees} trees of depth {ensemble.max_depth} (MAE {full_mae:.3f} -> {pruned_mae:.3f})")
+
+    # Numpy arrays are written uncompressed, so serving can memory-map them.
+    # Replacing the file rather than overwriting it keeps existing maps valid.
+    ensemble.model_timestamp = metadata.get('timestamp')
+    joblib.dump(ensemble, f'{ensemble_path}.tmp')
+    os.replace(f'{ensemble_path}.tmp', ensemble_path)
+    return ensemble_path
+
+def load_tree_ensemble(model_dir, metadata, mmap_mode=None):
+    """Load the exported ensemble, or return None if it is missing or stale."""
+    ensemble_path = os.path.join(model_dir, 'ride_time_estimator_trees.joblib')
+    if not os.path.exists(ensemble_path):
+        return None
+    ensemble = joblib.load(ensemble_path, mmap_mode=mmap_mode)
+    if ensemble.model_timestamp != metadata.get('timestamp'):
+        return None
+    return ensemble
+
+def _resident_mb():
+    """Resident memory of this process in megabytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            resident = int(f.read().split()[1])
+        return resident * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # Not on Linux: peak RSS is the closest available measure
+        import resource
+        import sys
+        scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _measure_artifact(path, X, mmap_mode, warm_rows=1000):
+    """Load an artifact and predict X; runs in a fresh process."""
+    # Import the estimator libraries first so only the artifact is measured
+    import sklearn.ensemble
+    import sklearn.linear_model
+    import xgboost
+    rss_before = _resident_mb()
+    started = time.perf_counter()
+    artifact = joblib.load(path, mmap_mode=mmap_mode)
+    load_seconds = time.perf_counter() - started
+    # Memory-mapped pages only become resident once predictions touch them
+    artifact.predict(X[:warm_rows])
+    rss_mb = _resident_mb() - rss_before
+    return load_seconds, rss_mb, artifact.predict(X)
+
+def artifact_report(model_dir, X, y, mmap_mode='r'):
+    """
+    Compare the exported tree ensemble with the original model as serving loads them
+    Args:
+        model_dir: Directory holding both artifacts
+        X, y: Evaluation set, normally the test set
+        mmap_mode: Memory-map mode used by serving
+    Returns:
+        List of dicts with each artifact's file size, load time, resident memory
+        after loading and predicting 1000 rows, and MAE on y
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    y = np.asarray(y, dtype=np.float64).ravel()
+    rows = []
+    for name, file_name in [('original model', 'ride_time_estimator.joblib'),
+                            ('tree ensemble', 'ride_time_estimator_trees.joblib')]:
+        path = os.path.join(model_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        # A fresh process per artifact, so neither shares memory or caches with the other
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            load_seconds, rss_mb, predictions = pool.submit(_measure_artifact, path, X, mmap_mode).result()
+        rows.append({
+            'artifact': name,
+            'size_mb': os.path.getsize(path) / (1024 * 1024),
+            'load_seconds': load_seconds,
+            'rss_mb': rss_mb,
+            'mae': float(np.mean(np.abs(predictions - y)))
+        })
+    return rows
+
+def print_artifact_report(rows):
+    print(f"{'artifact':<18}{'size MB':>10}{'load s':>10}{'RSS MB':>10}{'MAE':>10}")
+    for row in rows:
+        print(f"{row['artifact']:<18}{row['size_mb']:>10.1f}{row['load_seconds']:>10.3f}"
+              f"{row['rss_mb']:>10.1f}{row['mae']:>10.3f}")
+
+def main():
+    """Export the saved model's trees from the command line."""
+    import pandas as pd
+    parser = argparse.ArgumentParser(description='Export the saved model as a flattened tree ensemble')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--data-dir', default='data/processed')
+    parser.add_argument('--prune-tolerance', type=float, default=0.0,
+                        help='Allowed relative test MAE increase from dropping trees and depth')
+    parser.add_argument('--report', action='store_true',
+                        help='Compare size, load time, memory and MAE with the original model')
+    args = parser.parse_args()
+
+    from model_registry import resolve_model_dir
+    model_dir = resolve_model_dir(args.model_dir)
+    model = joblib.load(os.path.join(model_dir, 'ride_time_estimator.joblib'))
+    with open(os.path.join(model_dir, 'model_metadata.json')) as f:
+        metadata = json.load(f)
+    X_test = pd.read_csv(f'{args.data_dir}/X_test.csv')
+    y_test = pd.read_csv(f'{args.data_dir}/y_test.csv').squeeze().to_numpy()
+
+    ensemble_path = export_for_serving(model, X_test, metadata, model_dir, y_test, args.prune_tolerance)
+    if ensemble_path is None:
+        print(f"{type(model).__name__} is not a tree ensemble, nothing exported")
+        return
+    print(f"Tree ensemble saved to {ensemble_path}")
+    if args.report:
+        print()
+        print_artifact_report(artifact_report(model_dir, X_test, y_test))
+
+if __name__ == "__main__":
+    # Run through the importable module so the pickled TreeEnsemble refers to
+    # tree_ensemble.TreeEnsemble rather than __main__.TreeEnsemble
+    from tree_ensemble import main
+    main()
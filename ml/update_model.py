@@ -0,0 +1,278 @@
+"""
+Incremental model updates from newly completed rides.
+
+Updates the saved model with new rides instead of retraining on all history:
+    XGBoost            - boosting continues from the current booster
+    Gradient Boosting  - warm start adds stages fitted to the new rides
+    Random Forest      - warm start adds trees grown on the new rides
+    Linear / Ridge     - exact least-squares update from accumulated
+                         sufficient statistics (X'X, X'y)
+
+The updated model is compared with the current one on a held-out slice of the
+new rides and on the saved test set. It is only written if neither RMSE gets
+worse by more than --max-regression.
+
+Usage:
+    python update_model.py data/new_rides.ndjson
+    python update_model.py data/new_rides --rounds 50 --max-regression 0.02
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from xgboost import XGBRegressor
+
+from column_store import is_column_store, load_frame, load_matrix
+from feature_spec import load_feature_spec
+from generate_ride_data import haversine_distance
+from model_registry import publish_version, resolve_model_dir, stage_version
+from od_table import build_for_saved_model as build_od_table
+from preprocess_data import create_final_feature_set, encode_categorical_features, extract_time_features, hash_split
+from tree_ensemble import export_for_serving
+
+# Fields every new ride must have; distance_km is computed when missing
+REQUIRED_FIELDS = [
+    'source_lat', 'source_lng', 'dest_lat', 'dest_lng',
+    'pickup_time', 'ride_type', 'num_riders', 'duration_minutes'
+]
+
+# Rows of the saved test set used by the validation gate
+REFERENCE_ROWS = 10000
+
+def load_new_rides(path):
+    """Load completed rides from NDJSON, CSV or a column store directory"""
+    if is_column_store(path):
+        df = load_frame(path)
+    elif path.endswith(('.ndjson', '.jsonl')):
+        df = pd.read_json(path, lines=True)
+    else:
+        df = pd.read_csv(path)
+
+    missing = [field for field in REQUIRED_FIELDS if field not in df.columns]
+    if missing:
+        raise ValueError(f"New rides are missing fields: {', '.join(missing)}")
+    df['pickup_time'] = pd.to_datetime(df['pickup_time'])
+    if 'distance_km' not in df.columns:
+        df['distance_km'] = np.vectorize(haversine_distance)(
+            df['source_lat'], df['source_lng'], df['dest_lat'], df['dest_lng']
+        )
+    return df.reset_index(drop=True)
+
+def rides_to_features(df, spec):
+    """Build the model's feature matrix and target from ride rows"""
+    df = encode_categorical_features(extract_time_features(df))
+    return create_final_feature_set(df, spec)
+
+class LeastSquaresStats:
+    """Sufficient statistics of a least-squares fit, so updates with new rows are exact."""
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.sum_x = np.zeros(n_features)
+        self.sum_y = 0.0
+        self.xtx = np.zeros((n_features, n_features))
+        self.xty = np.zeros(n_features)
+        self.model_timestamp = None
+
+    def update(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.n += len(y)
+        self.sum_x += X.sum(axis=0)
+        self.sum_y += y.sum()
+        self.xtx += X.T @ X
+        self.xty += X.T @ y
+
+    def solve(self, alpha=0.0):
+        """Return (coef, intercept) of the fit over all rows seen, like LinearRegression/Ridge."""
+        mean_x = self.sum_x / self.n
+        mean_y = self.sum_y / self.n
+        # Centered normal equations; the intercept is not penalized
+        xtx = self.xtx - self.n * np.outer(mean_x, mean_x)
+        xty = self.xty - self.n * mean_x * mean_y
+        if alpha:
+            coef = np.linalg.solve(xtx + alpha * np.eye(len(xty)), xty)
+        else:
+            # Minimum-norm solution, as the one-hot columns are collinear
+            coef = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+        return coef, mean_y - mean_x @ coef
+
+def load_linear_stats(model_dir, metadata, n_features, data_dir='data/processed'):
+    """Load the saved least-squares statistics, or compute them from the training data"""
+    stats_path = os.path.join(model_dir, 'linear_stats.joblib')
+    if os.path.exists(stats_path):
+        stats = joblib.load(stats_path)
+        if stats.model_timestamp == metadata.get('timestamp'):
+            return stats
+
+    # One pass over the data the current model was trained on
+    from train_model import load_processed_data
+    print("Computing least-squares statistics from the training data...")
+    X_train, _, y_train, _, _ = load_processed_data(data_dir)
+    stats = LeastSquaresStats(n_features)
+    stats.update(X_train, y_train)
+    return stats
+
+def update_model(model, X, y, rounds=20, stats=None):
+    """
+    Return an updated copy of model that has also learned from X, y
+    Args:
+        model: Fitted model loaded from ride_time_estimator.joblib
+        X, y: Features and targets of the new rides
+        rounds: Boosting rounds (or Random Forest trees) to add
+        stats: LeastSquaresStats of the training data, for linear models
+    Returns:
+        Updated model; the original is not modified
+    """
+    if isinstance(model, XGBRegressor):
+        updated = XGBRegressor(**model.get_params())
+        updated.set_params(n_estimators=rounds)
+        updated.fit(X, y, xgb_model=model.get_booster())
+    elif isinstance(model, (GradientBoostingRegressor, RandomForestRegressor)):
+        updated = copy.deepcopy(model)
+        updated.set_params(warm_start=True, n_estimators=model.n_estimators + rounds)
+        updated.fit(X, y)
+        updated.set_params(warm_start=False)
+    elif isinstance(model, (LinearRegression, Ridge)):
+        stats.update(X, y)
+        updated = copy.deepcopy(model)
+        updated.coef_, updated.intercept_ = stats.solve(getattr(model, 'alpha', 0.0))
+    else:
+        raise TypeError(f"Incremental updates are not supported for {type(model).__name__}")
+    return updated
+
+def _rmse(model, X, y):
+    return float(np.sqrt(mean_squared_error(y, model.predict(X))))
+
+def validation_gate(current, candidate, checks, max_regression=0.05):
+    """
+    Compare the candidate with the current model on each check set
+    Args:
+        current: Model currently being served
+        candidate: Updated model
+        checks: List of (name, X, y) evaluation sets
+        max_regression: Allowed relative RMSE increase on any set
+    Returns:
+        (passed, list of (name, current RMSE, candidate RMSE))
+    """
+    report = []
+    passed = True
+    for name, X, y in checks:
+        before = _rmse(current, X, y)
+        after = _rmse(candidate, X, y)
+        report.append((name, before, after))
+        if after > before * (1 + max_regression):
+            passed = False
+    return passed, report
+
+def load_reference_set(spec, data_dir='data/processed', max_rows=REFERENCE_ROWS):
+    """Load up to max_rows of the saved test set, or None if there is none"""
+    from train_model import processed_data_format
+    if not os.path.exists(f'{data_dir}/feature_names.csv'):
+        return None
+    if processed_data_format(data_dir) == 'npy':
+        X, _ = load_matrix(f'{data_dir}/X_test', columns=spec.columns)
+        y = load_frame(f'{data_dir}/y_test').squeeze().to_numpy()
+        return pd.DataFrame(X[:max_rows], columns=spec.columns), y[:max_rows]
+    X = pd.read_csv(f'{data_dir}/X_test.csv', nrows=max_rows)
+    y = pd.read_csv(f'{data_dir}/y_test.csv', nrows=max_rows).squeeze().to_numpy()
+    return X, y
+
+def publish(model, metadata, X_check, model_dir='models', stats=None):
+    """
+    Publish the updated model and its derived serving artifacts as a new version
+    Returns:
+        Path of the published version directory
+    """
+    version, staging_dir = stage_version(model_dir)
+    shutil.copy(os.path.join(resolve_model_dir(model_dir), 'feature_spec.joblib'), staging_dir)
+    joblib.dump(model, os.path.join(staging_dir, 'ride_time_estimator.joblib'))
+    with open(os.path.join(staging_dir, 'model_metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    if stats is not None:
+        stats.model_timestamp = metadata['timestamp']
+        joblib.dump(stats, os.path.join(staging_dir, 'linear_stats.joblib'))
+
+    export_for_serving(model, X_check, metadata, staging_dir)
+    build_od_table(staging_dir)
+    return publish_version(model_dir, version, staging_dir)
+
+def update_from_rides(rides_path, model_dir='models', data_dir='data/processed', rounds=20,
+                      holdout=0.2, max_regression=0.05, dry_run=False):
+    """Update the saved model with new rides; returns True if a new model was written"""
+    print("Loading current model...")
+    current_dir = resolve_model_dir(model_dir)
+    model = joblib.load(os.path.join(current_dir, 'ride_time_estimator.joblib'))
+    spec = load_feature_spec(os.path.join(current_dir, 'feature_spec.joblib'))
+    with open(os.path.join(current_dir, 'model_metadata.json')) as f:
+        metadata = json.load(f)
+
+    print(f"Loading new rides from {rides_path}...")
+    X, y = rides_to_features(load_new_rides(rides_path), spec)
+    is_holdout = hash_split(np.arange(len(X)), test_size=holdout)
+    X_update, y_update = X[~is_holdout], y[~is_holdout]
+    print(f"Updating {metadata.get('model_name')} with {len(X_update)} rides "
+          f"({int(is_holdout.sum())} held out)...")
+
+    stats = None
+    if isinstance(model, (LinearRegression, Ridge)):
+        stats = load_linear_stats(current_dir, metadata, spec.n_features, data_dir)
+    candidate = update_model(model, X_update, y_update, rounds, stats)
+
+    checks = [('new rides (held out)', X[is_holdout], y[is_holdout])]
+    reference = load_reference_set(spec, data_dir)
+    if reference is not None:
+        checks.append(('saved test set', *reference))
+    passed, report = validation_gate(model, candidate, checks, max_regression)
+
+    print("\nValidation (RMSE):")
+    for name, before, after in report:
+        print(f"{name}: {before:.3f} -> {after:.3f} ({after / before - 1:+.1%})")
+    if not passed:
+        print(f"\nUpdate rejected: RMSE increased by more than {max_regression:.0%}")
+        return False
+    if dry_run:
+        print("\nValidation passed (dry run, nothing written)")
+        return False
+
+    # Report metrics on the last check set, the saved test set when available
+    _, X_eval, y_eval = checks[-1]
+    y_pred = candidate.predict(X_eval)
+    new_metadata = {
+        'model_name': metadata.get('model_name'),
+        'metrics': {
+            'MAE': mean_absolute_error(y_eval, y_pred),
+            'RMSE': float(np.sqrt(mean_squared_error(y_eval, y_pred))),
+            'R2': r2_score(y_eval, y_pred)
+        },
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'updated_from': metadata.get('timestamp'),
+        'update_rows': int(len(X_update))
+    }
+    version_dir = publish(candidate, new_metadata, X_eval, model_dir, stats)
+    print(f"\nUpdated model published to {version_dir}")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the saved model with newly completed rides')
+    parser.add_argument('rides', help='NDJSON or CSV file, or column store directory, of completed rides')
+    parser.add_argument('--model-dir', default='models')
+    parser.add_argument('--data-dir', default='data/processed', help='Processed data used for validation')
+    parser.add_argument('--rounds', type=int, default=20, help='Boosting rounds or forest trees to add')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of new rides held out for validation')
+    parser.add_argument('--max-regression', type=float, default=0.05,
+                        help='Reject the update if RMSE grows by more than this fraction')
+    parser.add_argument('--dry-run', action='store_true', help='Validate without writing the model')
+    args = parser.parse_args()
+
+    update_from_rides(args.rides, args.model_dir, args.data_dir, args.rounds,
+                      args.holdout, args.max_regression, args.dry_run)